@@ -47,6 +47,8 @@ class BaseBarFeed(feed.BaseFeed):
         super(BaseBarFeed, self).__init__(maxLen)
         self.__frequency = frequency
         self.__useAdjustedValues = False
+        self.__useColumnarDataSeries = False
+        self.__storageDir = None
         self.__defaultInstrument = None
         self.__currentBars = None
         self.__lastBars = {}
@@ -65,6 +67,23 @@ class BaseBarFeed(feed.BaseFeed):
         for instrument in self.getRegisteredInstruments():
             self[instrument].setUseAdjustedValues(useAdjusted)
 
+    def setUseColumnarDataSeries(self, useColumnar, storageDir=None):
+        """Set to True to hold bars in :class:`pyalgotrade.dataseries.bards.ColumnarBarDataSeries` instances.
+
+        :param useColumnar: True to use columnar dataseries.
+        :type useColumnar: boolean.
+        :param storageDir: If set, columnar dataseries are unbounded and kept in memory mapped temporary files created in
+            this directory.
+        :type storageDir: string.
+
+        .. note::
+            Dataseries for instruments already registered are rebuilt, so this should be called before the feed
+            starts and before building indicators on top of its dataseries.
+        """
+        self.__useColumnarDataSeries = useColumnar
+        self.__storageDir = storageDir
+        feed.BaseFeed.reset(self)
+
     # Return the datetime for the current bars.
     @abc.abstractmethod
     def getCurrentDateTime(self):
@@ -86,7 +105,10 @@ class BaseBarFeed(feed.BaseFeed):
         raise NotImplementedError()
 
     def createDataSeries(self, key, maxLen):
-        ret = bards.BarDataSeries(maxLen)
+        if self.__useColumnarDataSeries:
+            ret = bards.ColumnarBarDataSeries(maxLen, self.__storageDir)
+        else:
+            ret = bards.BarDataSeries(maxLen)
         ret.setUseAdjustedValues(self.__useAdjustedValues)
         return ret
 
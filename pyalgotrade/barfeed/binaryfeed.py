@@ -0,0 +1,396 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import bisect
+import collections
+import itertools
+import os
+import struct
+
+import numpy as np
+import pytz
+
+from pyalgotrade import bar
+from pyalgotrade.barfeed import dbfeed
+from pyalgotrade.barfeed import streamingbf
+from pyalgotrade.utils import dt
+from pyalgotrade import utils
+
+
+# Bar files have bars for a single instrument and frequency. They start with a 64 byte header followed by one fixed
+# width record per bar, sorted by timestamp. Everything is little-endian.
+MAGIC = "PYATBARS"
+VERSION = 1
+# Magic, version, frequency, flags and the instrument, padded with zeros.
+HEADER = struct.Struct("<8sIiI44s")
+
+# Header flags.
+HAVE_ADJ_CLOSE = 1
+# Set if datetimes had timezone information. Timestamps are always microseconds since the epoch, and naive datetimes
+# are stored as if they were in UTC.
+TIMEZONE_AWARE = 2
+
+# Missing volumes and adjusted closes are stored as NaN.
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("adjClose", "<f8"),
+])
+
+
+# Returns the frequency, the flags and the instrument in a bar file header.
+def read_header(f):
+    data = f.read(HEADER.size)
+    if len(data) != HEADER.size:
+        raise Exception("Invalid bar file header")
+    magic, version, frequency, flags, instrument = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise Exception("Invalid bar file header")
+    if version != VERSION:
+        raise Exception("Unsupported bar file version %d" % (version))
+    return frequency, flags, instrument.rstrip("\0")
+
+
+def write_header(f, frequency, flags, instrument):
+    if len(instrument) > 44:
+        raise Exception("Instrument names can't be longer than 44 bytes")
+    f.write(HEADER.pack(MAGIC, VERSION, frequency, flags, instrument))
+
+
+def get_record_count(path):
+    return (os.path.getsize(path) - HEADER.size) / RECORD_DTYPE.itemsize
+
+
+class BarFileWriter(object):
+    """Writes bars for a single instrument and frequency to a bar file. If the file already exists, bars are appended
+    to it.
+
+    :param path: The path to the file.
+    :type path: string.
+    :param instrument: Instrument identifier.
+    :type instrument: string.
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param bufferSize: The number of bars to buffer before writing them to the file.
+    :type bufferSize: int.
+
+    .. note::
+        * Bars must be written in ascending datetime order.
+        * Call :meth:`close` once done writing bars.
+    """
+
+    def __init__(self, path, instrument, frequency, bufferSize=10000):
+        self.__instrument = instrument
+        self.__frequency = frequency
+        self.__bufferSize = bufferSize
+        self.__records = []
+        self.__lastTimestamp = None
+        self.__flags = 0
+        self.__count = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.__file = open(path, "r+b")
+            fileFrequency, self.__flags, fileInstrument = read_header(self.__file)
+            if fileFrequency != frequency or fileInstrument != instrument:
+                raise Exception("%s has bars for %s with frequency %d" % (path, fileInstrument, fileFrequency))
+            self.__count = get_record_count(path)
+            if self.__count:
+                self.__file.seek(HEADER.size + (self.__count - 1) * RECORD_DTYPE.itemsize)
+                self.__lastTimestamp = np.fromfile(self.__file, dtype=RECORD_DTYPE, count=1)["timestamp"].item(0)
+            self.__file.seek(HEADER.size + self.__count * RECORD_DTYPE.itemsize)
+        else:
+            self.__file = open(path, "wb")
+            write_header(self.__file, frequency, self.__flags, instrument)
+
+    def writeBar(self, bar_):
+        dateTime = bar_.getDateTime()
+        timezoneAware = not dt.datetime_is_naive(dateTime)
+        if self.__count == 0:
+            if timezoneAware:
+                self.__flags |= TIMEZONE_AWARE
+        elif timezoneAware != bool(self.__flags & TIMEZONE_AWARE):
+            raise Exception("Naive and timezone aware datetimes can't be mixed")
+
+        timestamp = dt.datetime_to_microseconds(dateTime)
+        if self.__lastTimestamp is not None and timestamp <= self.__lastTimestamp:
+            raise Exception("Bars must be written in ascending order. %s is not after the previous bar" % (dateTime))
+
+        adjClose = bar_.getAdjClose()
+        if adjClose is not None:
+            self.__flags |= HAVE_ADJ_CLOSE
+        self.__records.append((
+            timestamp, bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), utils.to_float(bar_.getVolume()),
+            utils.to_float(adjClose)
+        ))
+        self.__lastTimestamp = timestamp
+        self.__count += 1
+        if len(self.__records) >= self.__bufferSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.__records):
+            np.array(self.__records, dtype=RECORD_DTYPE).tofile(self.__file)
+            self.__records = []
+        # Update the flags in the header.
+        self.__file.seek(0)
+        write_header(self.__file, self.__frequency, self.__flags, self.__instrument)
+        self.__file.seek(0, os.SEEK_END)
+        self.__file.flush()
+
+    def close(self):
+        self.flush()
+        self.__file.close()
+
+
+# A sequence with the timestamps in a records array, to bisect it without reading every timestamp.
+class TimestampSequence(object):
+    def __init__(self, records):
+        self.__records = records
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __getitem__(self, pos):
+        return self.__records[pos]["timestamp"]
+
+
+# Reads the bars in a bar file in chunks. Records are memory mapped, so only the chunks being read are loaded.
+# Fields are read straight from the mapped records, but a bar still gets built for every record.
+class BarFileReader(object):
+    def __init__(self, path, timezone=None, fromDateTime=None, toDateTime=None, chunkSize=1000):
+        with open(path, "rb") as f:
+            self.__frequency, self.__flags, self.__instrument = read_header(f)
+        self.__path = path
+        self.__timezone = timezone
+        self.__chunkSize = chunkSize
+        self.__records = self.__mapRecords()
+
+        timestamps = TimestampSequence(self.__records)
+        self.__begin = 0
+        self.__end = len(self.__records)
+        if fromDateTime is not None:
+            self.__begin = bisect.bisect_left(timestamps, dt.datetime_to_microseconds(fromDateTime))
+        if toDateTime is not None:
+            self.__end = bisect.bisect_right(timestamps, dt.datetime_to_microseconds(toDateTime))
+        self.reset()
+
+    def __mapRecords(self):
+        if get_record_count(self.__path):
+            ret = np.memmap(self.__path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size)
+        else:
+            ret = np.empty(0, dtype=RECORD_DTYPE)
+        return ret
+
+    def getFrequency(self):
+        return self.__frequency
+
+    def getInstrument(self):
+        return self.__instrument
+
+    def barsHaveAdjClose(self):
+        return bool(self.__flags & HAVE_ADJ_CLOSE)
+
+    def reset(self):
+        self.__nextPos = self.__begin
+        # A deque of (timestamp, bar) tuples.
+        self.__buffer = collections.deque()
+
+    def __readChunk(self):
+        # The file is mapped again if bars are read after the reader was closed.
+        if self.__records is None:
+            self.__records = self.__mapRecords()
+        # A view over the mapped records, so nothing is copied until fields are converted to Python values below.
+        records = self.__records[self.__nextPos:min(self.__nextPos + self.__chunkSize, self.__end)]
+        self.__nextPos += len(records)
+
+        # Build the datetimes, and get the timestamps to use to merge instruments.
+        timestamps = records["timestamp"]
+        if self.__flags & TIMEZONE_AWARE:
+            tzInfo = self.__timezone
+            if tzInfo is None:
+                tzInfo = pytz.utc
+            dateTimes = dt.microseconds_to_datetimes(timestamps, tzInfo)
+        elif self.__timezone is not None:
+            timestamps = dt.localize_microseconds(timestamps, self.__timezone)
+            dateTimes = dt.microseconds_to_datetimes(timestamps, self.__timezone)
+        else:
+            dateTimes = dt.microseconds_to_datetimes(timestamps)
+
+        frequency = self.__frequency
+        for timestamp, dateTime, open_, high, low, close, volume, adjClose in itertools.izip(
+            timestamps.tolist(), dateTimes, records["open"].tolist(), records["high"].tolist(),
+            records["low"].tolist(), records["close"].tolist(), records["volume"].tolist(), records["adjClose"].tolist()
+        ):
+            self.__buffer.append((timestamp, bar.BasicBar(
+                dateTime, open_, high, low, close, utils.to_value(volume), utils.to_value(adjClose), frequency
+            )))
+
+    # Returns the (timestamp, bar) tuple for the next bar, or None if there are no more bars.
+    def peek(self):
+        if len(self.__buffer) == 0 and self.__nextPos < self.__end:
+            self.__readChunk()
+        if len(self.__buffer):
+            return self.__buffer[0]
+        return None
+
+    def pop(self):
+        if len(self.__buffer) == 0:
+            self.__readChunk()
+        return self.__buffer.popleft()
+
+    def close(self):
+        # Drop the reference to the memory map so the file gets unmapped.
+        self.__records = None
+
+
+class Database(dbfeed.Database):
+    """A :class:`pyalgotrade.barfeed.dbfeed.Database` that keeps bars in a directory, with one bar file for every
+    instrument and frequency. Use it to convert bars from other feeds, for example with
+    :meth:`pyalgotrade.barfeed.dbfeed.Database.addBarsFromFeed`.
+
+    :param directory: The directory with the bar files.
+    :type directory: string.
+
+    .. note::
+        * Bars must be added in ascending datetime order. Bars for a given instrument and frequency are appended to
+          the ones already in the file.
+        * Bars are written once :meth:`pyalgotrade.barfeed.dbfeed.Database.addBarSequence` or
+          :meth:`pyalgotrade.barfeed.dbfeed.Database.addBarsFromFeed` return. Bars added one at a time, with
+          :meth:`addBar`, are buffered until :meth:`disconnect` is called, so call it once done adding bars.
+    """
+
+    def __init__(self, directory):
+        self.__directory = directory
+        self.__writers = {}
+
+    def getFilePath(self, instrument, frequency):
+        """Returns the path to the bar file for a given instrument and frequency."""
+        return os.path.join(self.__directory, "%s-%d.bars" % (instrument, frequency))
+
+    def addBar(self, instrument, bar, frequency):
+        writer = self.__writers.get((instrument, frequency))
+        if writer is None:
+            writer = BarFileWriter(self.getFilePath(instrument, frequency), instrument, frequency)
+            self.__writers[(instrument, frequency)] = writer
+        writer.writeBar(bar)
+
+    def addBarSequence(self, instrument, bars, frequency):
+        super(Database, self).addBarSequence(instrument, bars, frequency)
+        self.__flush()
+
+    def addBarsFromFeed(self, feed):
+        super(Database, self).addBarsFromFeed(feed)
+        self.__flush()
+
+    def __flush(self):
+        for writer in self.__writers.itervalues():
+            writer.flush()
+
+    def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
+        path = self.getFilePath(instrument, frequency)
+        writer = self.__writers.get((instrument, frequency))
+        if writer is not None:
+            writer.flush()
+        if not os.path.exists(path):
+            return []
+
+        reader = BarFileReader(path, timezone, fromDateTime, toDateTime)
+        ret = []
+        while reader.peek() is not None:
+            ret.append(reader.pop()[1])
+        return ret
+
+    def disconnect(self):
+        for writer in self.__writers.itervalues():
+            writer.close()
+        self.__writers = {}
+
+
+class Feed(streamingbf.BarFeed):
+    """A :class:`pyalgotrade.barfeed.BarFeed` that loads bars from bar files, like the ones written by
+    :class:`BarFileWriter` or :class:`Database`. Files are memory mapped and bars are built as they are consumed, so
+    opening a file takes the same time regardless of its size. Records don't need to be parsed, but a
+    :class:`pyalgotrade.bar.BasicBar` is still built for every one of them, so this is not free.
+
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The default timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * Bars that were written with timezone information are loaded in UTC, or converted to the timezone if one
+          was set. Naive bars are localized if a timezone was set.
+        * Prices and volumes are loaded as floats.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None):
+        super(Feed, self).__init__(frequency, maxLen)
+
+        self.__timezone = timezone
+        self.__haveAdjClose = False
+
+    def barsHaveAdjClose(self):
+        return self.__haveAdjClose
+
+    def addBarsFromFile(self, path, instrument=None, timezone=None, fromDateTime=None, toDateTime=None):
+        """Loads bars from a bar file.
+        The instrument gets registered in the bar feed.
+
+        :param path: The path to the file.
+        :type path: string.
+        :param instrument: Instrument identifier. If None, the one in the file is used.
+        :type instrument: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is greater than or equal to fromDateTime are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is lower than or equal to toDateTime are loaded.
+        :type toDateTime: datetime.datetime.
+
+        .. note::
+            fromDateTime and toDateTime are compared with the datetimes stored in the file, and naive ones are treated
+            as UTC.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+
+        reader = BarFileReader(path, timezone, fromDateTime, toDateTime)
+        if reader.getFrequency() != self.getFrequency():
+            raise Exception("%s has bars with frequency %d" % (path, reader.getFrequency()))
+        if instrument is None:
+            instrument = reader.getInstrument()
+        if self._getReader(instrument) is not None:
+            raise Exception("Bars for %s were already added" % (instrument))
+
+        if reader.barsHaveAdjClose():
+            self.__haveAdjClose = True
+        elif self.__haveAdjClose:
+            raise Exception("Previous bars had adjusted close and these ones don't have.")
+
+        self._addReader(instrument, reader)
@@ -0,0 +1,259 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+# Converts the bars parsed from CSV files to numpy columns and back. This is used to cache bars, so files don't need to
+# be parsed again until they change, and to transfer bars parsed in other processes.
+
+import hashlib
+import itertools
+import json
+import operator
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pytz
+
+from pyalgotrade.utils import dt
+from pyalgotrade import utils
+
+# Bump this if the cache file layout changes.
+CACHE_VERSION = 2
+
+FLOAT_COLUMNS = ["open", "high", "low", "close", "volume", "adjClose"]
+
+
+def get_cache_path(cacheDir, path, rowParser, barFilter):
+    """Returns the path to the cache file for the bars loaded from a CSV file, or None if they can't be cached.
+    The file size and modification time are part of the key, so the cache file changes when the CSV file does."""
+    parserKey = rowParser.getCacheKey()
+    if parserKey is None:
+        return None
+    filterKey = None
+    if barFilter is not None:
+        filterKey = barFilter.getCacheKey()
+        if filterKey is None:
+            return None
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = repr((CACHE_VERSION, path, stat.st_size, stat.st_mtime, parserKey, filterKey))
+    fileName = "%s-%s.npz" % (os.path.basename(path), hashlib.sha1(key).hexdigest()[:16])
+    return os.path.join(cacheDir, fileName)
+
+
+# Kinds of values in extra columns. Values can be floats or strings, like the ones that csvutils.float_or_string
+# returns, or missing.
+MISSING = 0
+FLOAT = 1
+STRING = 2
+
+
+# Returns arrays with the kind of every value, the float values and the string values in an extra column, or None if
+# there are values that are not floats nor strings.
+def save_extra_column(values):
+    types = set(map(type, values))
+    if types <= set([float, int, long]):
+        return np.repeat(np.int8(FLOAT), len(values)), np.array(values, dtype=np.float64), np.array([], dtype=np.str_)
+    if types == set([str]):
+        return np.repeat(np.int8(STRING), len(values)), np.array([], dtype=np.float64), np.array(values, dtype=np.str_)
+    if not types <= set([float, int, long, str, type(None)]):
+        return None
+
+    kinds = np.zeros(len(values), dtype=np.int8)
+    floats = np.empty(len(values), dtype=np.float64)
+    floats.fill(np.nan)
+    strings = [""] * len(values)
+    for pos, value in enumerate(values):
+        if isinstance(value, str):
+            kinds[pos] = STRING
+            strings[pos] = value
+        elif value is not None:
+            kinds[pos] = FLOAT
+            floats[pos] = value
+    return kinds, floats, np.array(strings, dtype=np.str_)
+
+
+def load_extra_column(kinds, floats, strings):
+    if np.all(kinds == FLOAT):
+        return floats.tolist()
+    if np.all(kinds == STRING):
+        return strings.tolist()
+    ret = []
+    for kind, floatValue, stringValue in zip(kinds.tolist(), floats.tolist(), strings.tolist()):
+        if kind == FLOAT:
+            ret.append(floatValue)
+        elif kind == STRING:
+            ret.append(stringValue)
+        else:
+            ret.append(None)
+    return ret
+
+
+# Returns a list with the values in a float array, with None instead of NaN.
+def load_float_column(values):
+    missing = np.isnan(values)
+    if missing.all():
+        return [None] * len(values)
+    ret = values.tolist()
+    for pos in np.flatnonzero(missing).tolist():
+        ret[pos] = None
+    return ret
+
+
+# Returns a list with a dict of extra values for every bar.
+def load_extra_values(names, columns, size):
+    if len(names) == 0:
+        return [{} for i in xrange(size)]
+    rows = zip(*columns)
+    if any(None in values for values in columns):
+        return [dict((name, value) for name, value in zip(names, row) if value is not None) for row in rows]
+    return [dict(zip(names, row)) for row in rows]
+
+
+def bars_to_columns(bars, rowParser):
+    """Returns a dict with numpy arrays for the bars parsed from a CSV file, or None if the bars can't be converted,
+    for example if extra columns have values that are not floats nor strings, if naive and timezone aware datetimes
+    are mixed, if datetimes are not localized with a pytz timezone, or if the row parser state can't be saved as
+    JSON."""
+    size = len(bars)
+    dateTimes = map(operator.methodcaller("getDateTime"), bars)
+    tzInfo = None
+    if size:
+        tzInfo = dateTimes[0].tzinfo
+    if any((dateTime.tzinfo is None) != (tzInfo is None) for dateTime in dateTimes):
+        return None
+    # The timezone is saved by name.
+    timeZone = None
+    if tzInfo is not None:
+        timeZone = getattr(tzInfo, "zone", None)
+        if timeZone is None:
+            return None
+
+    def get_column(getterName, dtype, converter=None):
+        values = itertools.imap(operator.methodcaller(getterName), bars)
+        if converter is not None:
+            values = itertools.imap(converter, values)
+        return np.fromiter(values, dtype=dtype, count=size)
+
+    columns = {
+        "timestamps": np.fromiter(itertools.imap(dt.datetime_to_microseconds, dateTimes), dtype=np.int64, count=size),
+        "open": get_column("getOpen", np.float64),
+        "high": get_column("getHigh", np.float64),
+        "low": get_column("getLow", np.float64),
+        "close": get_column("getClose", np.float64),
+        "volume": get_column("getVolume", np.float64, utils.to_float),
+        "adjClose": get_column("getAdjClose", np.float64, utils.to_float),
+        "frequency": get_column("getFrequency", np.int64),
+    }
+
+    extraValues = map(operator.methodcaller("getExtraColumns"), bars)
+    extraNames = sorted(set().union(*extraValues))
+    for i, name in enumerate(extraNames):
+        extraColumn = save_extra_column([values.get(name) for values in extraValues])
+        if extraColumn is None:
+            return None
+        columns["extra_kinds_%d" % i], columns["extra_floats_%d" % i], columns["extra_strings_%d" % i] = extraColumn
+
+    # The timezone, extra column names and parser state are saved as a JSON string, so loading a cache file never needs
+    # to unpickle anything.
+    metadata = {
+        "timezone": timeZone,
+        "extra": extraNames,
+        "state": rowParser.getCacheState(),
+    }
+    try:
+        metadata = json.dumps(metadata)
+    except (TypeError, ValueError):
+        return None
+    columns["metadata"] = np.frombuffer(metadata, dtype=np.uint8)
+    return columns
+
+
+def save_columns(cachePath, columns):
+    # Write to a temporary file first so a partially written cache file is never loaded.
+    cacheDir = os.path.dirname(cachePath)
+    fd, tmpPath = tempfile.mkstemp(suffix=".npz", dir=cacheDir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **columns)
+        os.rename(tmpPath, cachePath)
+    except Exception:
+        os.remove(tmpPath)
+        raise
+
+
+def save_bars(cachePath, bars, rowParser):
+    """Saves the bars parsed from a CSV file. Returns False if the bars can't be saved."""
+    columns = bars_to_columns(bars, rowParser)
+    if columns is None:
+        return False
+    save_columns(cachePath, columns)
+    return True
+
+
+def columns_to_bars(columns, rowParser):
+    """Returns the bars held in columns built with :func:`bars_to_columns`."""
+    metadata = json.loads(columns["metadata"].tostring())
+    tzInfo = None
+    if metadata["timezone"] is not None:
+        tzInfo = pytz.timezone(metadata["timezone"])
+    # JSON strings are loaded as unicode.
+    extraNames = map(str, metadata["extra"])
+    dateTimes = dt.microseconds_to_datetimes(columns["timestamps"], tzInfo)
+    open_ = columns["open"].tolist()
+    high = columns["high"].tolist()
+    low = columns["low"].tolist()
+    close = columns["close"].tolist()
+    volume = load_float_column(columns["volume"])
+    adjClose = load_float_column(columns["adjClose"])
+    frequency = columns["frequency"].tolist()
+    extra = load_extra_values(
+        extraNames,
+        [
+            load_extra_column(
+                columns["extra_kinds_%d" % i], columns["extra_floats_%d" % i], columns["extra_strings_%d" % i]
+            )
+            for i in xrange(len(extraNames))
+        ],
+        len(dateTimes)
+    )
+
+    ret = map(rowParser.buildCachedBar, dateTimes, open_, high, low, close, volume, adjClose, frequency, extra)
+    rowParser.setCacheState(metadata["state"])
+    return ret
+
+
+def load_bars(cachePath, rowParser):
+    """Returns the bars saved in a cache file, or None if there is no cache file or it can't be loaded."""
+    if not os.path.exists(cachePath):
+        return None
+
+    try:
+        with np.load(cachePath, allow_pickle=False) as columns:
+            return columns_to_bars(columns, rowParser)
+    except (IOError, ValueError, KeyError, zipfile.BadZipfile):
+        # The cache file is truncated or corrupt. Remove it so bars get parsed and cached again.
+        try:
+            os.remove(cachePath)
+        except OSError:
+            pass
+        return None
@@ -20,10 +20,19 @@
 
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
+from pyalgotrade import utils
 from pyalgotrade.barfeed import membf
+from pyalgotrade.barfeed import sharedmembf
+from pyalgotrade.barfeed import csvcache
+from pyalgotrade.barfeed import streamingbf
 from pyalgotrade import bar
 
+import collections
 import datetime
+import itertools
+import multiprocessing
+import os
+import numpy as np
 import pytz
 
 
@@ -38,18 +47,49 @@ class RowParser(object):
     def getDelimiter(self):
         raise NotImplementedError()
 
+    # Return a string with every setting, and any state, that affects how bars get parsed, to cache the bars parsed
+    # from CSV files. Bars are not cached if this returns None.
+    def getCacheKey(self):
+        return None
+
+    # Return any state that changes while parsing, to be restored with setCacheState when bars are loaded from the
+    # cache. The state is saved as JSON, so it can only hold numbers, strings, booleans, lists, dicts and None.
+    def getCacheState(self):
+        return None
+
+    def setCacheState(self, state):
+        pass
+
+    # Build a bar loaded from the cache.
+    def buildCachedBar(self, dateTime, open_, high, low, close, volume, adjClose, frequency, extra):
+        return bar.BasicBar(dateTime, open_, high, low, close, volume, adjClose, frequency, extra)
+
 
 # Interface for bar filters.
 class BarFilter(object):
     def includeBar(self, bar_):
         raise NotImplementedError()
 
+    # Return a string with every setting that affects which bars get included, to cache the bars parsed from CSV
+    # files. Bars are not cached if this returns None.
+    def getCacheKey(self):
+        return None
+
 
 class DateRangeFilter(BarFilter):
     def __init__(self, fromDate=None, toDate=None):
         self.__fromDate = fromDate
         self.__toDate = toDate
 
+    def _getDateRangeCacheKey(self):
+        return "%s(%s, %s)" % (type(self).__name__, self.__fromDate, self.__toDate)
+
+    def getCacheKey(self):
+        # Subclasses may include bars differently, so they have to override this for their bars to be cached.
+        if type(self) is not DateRangeFilter:
+            return None
+        return self._getDateRangeCacheKey()
+
     def includeBar(self, bar_):
         if self.__toDate and bar_.getDateTime() > self.__toDate:
             return False
@@ -70,6 +110,11 @@ class USEquitiesRTH(DateRangeFilter):
         self.__fromTime = datetime.time(9, 30, 0)
         self.__toTime = datetime.time(16, 0, 0)
 
+    def getCacheKey(self):
+        if type(self) is not USEquitiesRTH:
+            return None
+        return self._getDateRangeCacheKey()
+
     def includeBar(self, bar_):
         ret = super(USEquitiesRTH, self).includeBar(bar_)
         if ret:
@@ -87,16 +132,37 @@ class USEquitiesRTH(DateRangeFilter):
         return ret
 
 
-class BarFeed(membf.BarFeed):
-    """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
+def parse_bars(path, rowParser, barFilter):
+    ret = []
+    reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
+    for row in reader:
+        bar_ = rowParser.parseBar(row)
+        if bar_ is not None and (barFilter is None or barFilter.includeBar(bar_)):
+            ret.append(bar_)
+    return ret
 
-    .. note::
-        This is a base class and should not be used directly.
-    """
 
-    def __init__(self, frequency, maxLen=None):
-        super(BarFeed, self).__init__(frequency, maxLen)
+# (path, rowParser, barFilter) tuples for the files to parse. This is set in worker processes only, by
+# init_parse_worker, so every pool gets its own jobs.
+worker_parse_jobs = None
+
+
+# Pool initializer. Workers are forked with the jobs as arguments, so row parsers and filters don't need to be pickled.
+def init_parse_worker(jobs):
+    global worker_parse_jobs
+    worker_parse_jobs = jobs
 
+
+# Parses a file in a worker process and returns the bars as columns, which are much cheaper to send back than bars.
+def parse_columns(jobIndex):
+    path, rowParser, barFilter = worker_parse_jobs[jobIndex]
+    return csvcache.bars_to_columns(parse_bars(path, rowParser, barFilter), rowParser), rowParser.getCacheKey()
+
+
+# The daily bar time and bar filter settings shared by the CSV bar feeds.
+# Feeds have to call _initSettings from their constructor.
+class SettingsMixin(object):
+    def _initSettings(self):
         self.__barFilter = None
         self.__dailyTime = datetime.time(0, 0, 0)
 
@@ -112,24 +178,201 @@ class BarFeed(membf.BarFeed):
     def setBarFilter(self, barFilter):
         self.__barFilter = barFilter
 
+
+# The settings shared by the bar feeds that load CSV files in the format described in GenericBarFeed.
+# Feeds have to call _initSettings and _initGenericFormat from their constructor.
+class GenericFormatMixin(SettingsMixin):
+    def _initGenericFormat(self, timezone):
+        self.__timezone = timezone
+        # Assume bars don't have adjusted close. This will be set to True after
+        # loading the first file if the adj_close column is there.
+        self.__haveAdjClose = False
+
+        self.__barClass = bar.BasicBar
+
+        self.__dateTimeFormat = "%Y-%m-%d %H:%M:%S"
+        self.__columnNames = {
+            "datetime": "Date Time",
+            "open": "Open",
+            "high": "High",
+            "low": "Low",
+            "close": "Close",
+            "volume": "Volume",
+            "adj_close": "Adj Close",
+        }
+        # self.__dateTimeFormat expects time to be set so there is no need to
+        # fix time.
+        self.setDailyBarTime(None)
+
+    def barsHaveAdjClose(self):
+        return self.__haveAdjClose
+
+    def setNoAdjClose(self):
+        self.__columnNames["adj_close"] = None
+        self.__haveAdjClose = False
+
+    def setColumnName(self, col, name):
+        self.__columnNames[col] = name
+
+    def setDateTimeFormat(self, dateTimeFormat):
+        self.__dateTimeFormat = dateTimeFormat
+
+    def setBarClass(self, barClass):
+        self.__barClass = barClass
+
+    def _getTimezone(self):
+        return self.__timezone
+
+    def _getColumnNames(self):
+        return self.__columnNames
+
+    def _getDateTimeFormat(self):
+        return self.__dateTimeFormat
+
+    def _getBarClass(self):
+        return self.__barClass
+
+    # Records if the bars just loaded have adjusted close values, which has to be the same for every file.
+    def _setBarsHaveAdjClose(self, haveAdjClose):
+        if haveAdjClose:
+            self.__haveAdjClose = True
+        elif self.__haveAdjClose:
+            raise Exception("Previous bars had adjusted close and these ones don't have.")
+
+    def _createGenericRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return GenericRowParser(
+            self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(),
+            timezone, self.__barClass
+        )
+
+
+class BarFeed(SettingsMixin, membf.BarFeed):
+    """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed`.
+
+    .. note::
+        This is a base class and should not be used directly.
+    """
+
+    def __init__(self, frequency, maxLen=None):
+        super(BarFeed, self).__init__(frequency, maxLen)
+        self._initSettings()
+
+        self.__cacheDir = None
+        # Columns parsed in worker processes for (instrument, path) pairs, with the cache key of the row parser used.
+        self.__parsedColumns = {}
+
+    def getCacheDir(self):
+        return self.__cacheDir
+
+    def setCacheDir(self, cacheDir):
+        """Set a directory to cache the bars parsed from CSV files, so the next time the same files are loaded
+        bars are read from the cache instead of parsing the files again. Cache files are keyed by the file path, size
+        and modification time, and by the settings used to parse the bars.
+
+        :param cacheDir: The directory to store the cache files in, or None to disable the cache. Using the same
+            directory that has the CSV files is ok.
+        :type cacheDir: string.
+        """
+        self.__cacheDir = cacheDir
+
+    # Subclasses should override this to return the row parser for a file, so files can be parsed in parallel by
+    # addBarsFromCSVFiles. If this returns None files are parsed one after the other.
+    def _createRowParser(self, timezone=None):
+        return None
+
+    def __getCachePath(self, path, rowParser):
+        ret = None
+        if self.__cacheDir is not None:
+            ret = csvcache.get_cache_path(self.__cacheDir, path, rowParser, self.getBarFilter())
+        return ret
+
     def addBarsFromCSV(self, instrument, path, rowParser):
-        # Load the csv file
-        loadedBars = []
-        reader = csvutils.FastDictReader(open(path, "r"), fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter())
-        for row in reader:
-            bar_ = rowParser.parseBar(row)
-            if bar_ is not None and (self.__barFilter is None or self.__barFilter.includeBar(bar_)):
-                loadedBars.append(bar_)
+        loadedBars = None
+        cachePath = self.__getCachePath(path, rowParser)
+        if cachePath is not None:
+            loadedBars = csvcache.load_bars(cachePath, rowParser)
+
+        if loadedBars is None:
+            columns, parserKey = self.__parsedColumns.pop((instrument, path), (None, None))
+            if columns is not None and parserKey == rowParser.getCacheKey():
+                loadedBars = csvcache.columns_to_bars(columns, rowParser)
+                if cachePath is not None:
+                    csvcache.save_columns(cachePath, columns)
+            else:
+                loadedBars = parse_bars(path, rowParser, self.getBarFilter())
+                if cachePath is not None:
+                    csvcache.save_bars(cachePath, loadedBars, rowParser)
 
         self.addBarsFromSequence(instrument, loadedBars)
 
+    def addBarsFromCSVFiles(self, files, timezone=None, processes=None):
+        """Loads bars for many instruments from CSV formatted files, parsing them in a pool of processes.
+        Instruments get registered in the bar feed in the same order that files would be loaded sequentially.
+
+        :param files: A dict that maps instruments to file paths, or a sequence of (instrument, path) tuples to load
+            more than one file per instrument. Dicts are loaded in instrument order.
+        :type files: dict or list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param processes: The number of worker processes to use. If None then as many processes as CPUs are used.
+        :type processes: int.
+
+        .. note::
+            * Files are parsed in parallel only on platforms that support forking processes, and if the feed
+              supports it. Otherwise, or if bars can't be transferred from the workers, files are parsed one after
+              the other.
+            * Files that are already in the cache are loaded from there.
+        """
+
+        if isinstance(files, dict):
+            files = sorted(files.items())
+        else:
+            files = list(files)
+        assert(processes is None or processes > 0)
+
+        jobs = []
+        jobFiles = []
+        if hasattr(os, "fork") and processes != 1:
+            for instrument, path in files:
+                rowParser = self._createRowParser(timezone)
+                if rowParser is None:
+                    break
+                cachePath = self.__getCachePath(path, rowParser)
+                if cachePath is None or not os.path.exists(cachePath):
+                    jobs.append((path, rowParser, self.getBarFilter()))
+                    jobFiles.append((instrument, path))
+
+        if len(jobs) > 1:
+            pool = multiprocessing.Pool(processes, initializer=init_parse_worker, initargs=(jobs,))
+            try:
+                results = pool.map(parse_columns, range(len(jobs)), chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            self.__parsedColumns = dict(zip(jobFiles, results))
+
+        try:
+            for instrument, path in files:
+                self.addBarsFromCSV(instrument=instrument, path=path, timezone=timezone)
+        finally:
+            self.__parsedColumns = {}
+
 
 class GenericRowParser(RowParser):
     def __init__(self, columnNames, dateTimeFormat, dailyBarTime, frequency, timezone, barClass=bar.BasicBar):
-        self.__dateTimeFormat = dateTimeFormat
+        self.__parseDateTime = dt.get_datetime_parser(dateTimeFormat)
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
-        self.__timezone = timezone
+        self.__localizer = None
+        if timezone:
+            self.__localizer = dt.Localizer(timezone)
+        self.__cacheKey = repr((
+            type(self).__name__, sorted(columnNames.items()), dateTimeFormat, str(dailyBarTime), frequency,
+            str(timezone), "%s.%s" % (barClass.__module__, barClass.__name__)
+        ))
         self.__haveAdjClose = False
         self.__barClass = barClass
         # Column names.
@@ -143,13 +386,13 @@ class GenericRowParser(RowParser):
         self.__columnNames = columnNames
 
     def _parseDate(self, dateString):
-        ret = datetime.datetime.strptime(dateString, self.__dateTimeFormat)
+        ret = self.__parseDateTime(dateString)
 
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer is not None:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def barsHaveAdjClose(self):
@@ -162,6 +405,21 @@ class GenericRowParser(RowParser):
     def getDelimiter(self):
         return ","
 
+    def getCacheKey(self):
+        # Subclasses may parse bars differently, so they have to override this for their bars to be cached.
+        if type(self) is not GenericRowParser:
+            return None
+        return self.__cacheKey
+
+    def getCacheState(self):
+        return self.__haveAdjClose
+
+    def setCacheState(self, state):
+        self.__haveAdjClose = state
+
+    def buildCachedBar(self, dateTime, open_, high, low, close, volume, adjClose, frequency, extra):
+        return self.__barClass(dateTime, open_, high, low, close, volume, adjClose, frequency, extra=extra)
+
     def parseBar(self, csvRowDict):
         dateTime = self._parseDate(csvRowDict[self.__dateTimeColName])
         open_ = float(csvRowDict[self.__openColName])
@@ -187,7 +445,7 @@ class GenericRowParser(RowParser):
         )
 
 
-class GenericBarFeed(BarFeed):
+class GenericBarFeed(GenericFormatMixin, BarFeed):
     """A BarFeed that loads bars from CSV files that have the following format:
     ::
 
@@ -213,43 +471,474 @@ class GenericBarFeed(BarFeed):
 
     def __init__(self, frequency, timezone=None, maxLen=None):
         super(GenericBarFeed, self).__init__(frequency, maxLen)
+        self._initGenericFormat(timezone)
 
-        self.__timezone = timezone
-        # Assume bars don't have adjusted close. This will be set to True after
-        # loading the first file if the adj_close column is there.
-        self.__haveAdjClose = False
+    def _createRowParser(self, timezone=None):
+        return self._createGenericRowParser(timezone)
 
-        self.__barClass = bar.BasicBar
+    def addBarsFromCSV(self, instrument, path, timezone=None):
+        """Loads bars for a given instrument from a CSV formatted file.
+        The instrument gets registered in the bar feed.
 
-        self.__dateTimeFormat = "%Y-%m-%d %H:%M:%S"
-        self.__columnNames = {
-            "datetime": "Date Time",
-            "open": "Open",
-            "high": "High",
-            "low": "Low",
-            "close": "Close",
-            "volume": "Volume",
-            "adj_close": "Adj Close",
-        }
-        # self.__dateTimeFormat expects time to be set so there is no need to
-        # fix time.
-        self.setDailyBarTime(None)
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        """
 
-    def barsHaveAdjClose(self):
-        return self.__haveAdjClose
+        rowParser = self._createRowParser(timezone)
+        super(GenericBarFeed, self).addBarsFromCSV(instrument, path, rowParser)
+        self._setBarsHaveAdjClose(rowParser.barsHaveAdjClose())
+
+
+# Reads the bars for a single instrument from one or more CSV files, one file after the other, holding at most
+# bufferSize bars in memory.
+class BarReader(object):
+    def __init__(self, instrument, bufferSize):
+        self.__instrument = instrument
+        self.__bufferSize = bufferSize
+        # A list of (path, rowParser, barFilter) tuples.
+        self.__files = []
+        self.__nextFile = 0
+        self.__file = None
+        self.__reader = None
+        self.__rowParser = None
+        self.__barFilter = None
+        # A deque of (timestamp, bar) tuples.
+        self.__buffer = collections.deque()
+        self.__lastTimestamp = None
+        self.__lastDateTime = None
+
+    def addFile(self, path, rowParser, barFilter):
+        self.__files.append((path, rowParser, barFilter))
+
+    def reset(self):
+        self.close()
+        self.__nextFile = 0
+        self.__buffer.clear()
+        self.__lastTimestamp = None
+        self.__lastDateTime = None
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = None
+        self.__reader = None
+
+    def __openNextFile(self):
+        path, self.__rowParser, self.__barFilter = self.__files[self.__nextFile]
+        self.__nextFile += 1
+        self.__file = open(path, "r")
+        self.__reader = csvutils.FastDictReader(
+            self.__file, fieldnames=self.__rowParser.getFieldNames(), delimiter=self.__rowParser.getDelimiter()
+        )
 
-    def setNoAdjClose(self):
-        self.__columnNames["adj_close"] = None
-        self.__haveAdjClose = False
+    def __fillBuffer(self):
+        while len(self.__buffer) == 0 and (self.__reader is not None or self.__nextFile < len(self.__files)):
+            if self.__reader is None:
+                self.__openNextFile()
+            rowParser = self.__rowParser
+            barFilter = self.__barFilter
+            rows = 0
+            for row in itertools.islice(self.__reader, self.__bufferSize):
+                rows += 1
+                bar_ = rowParser.parseBar(row)
+                if bar_ is not None and (barFilter is None or barFilter.includeBar(bar_)):
+                    self.__append(bar_)
+            if rows < self.__bufferSize:
+                self.close()
+
+    def __append(self, bar_):
+        dateTime = bar_.getDateTime()
+        timestamp = dt.datetime_to_microseconds(dateTime)
+        if self.__lastTimestamp is not None:
+            if timestamp == self.__lastTimestamp:
+                raise Exception("Duplicate bars found for %s on %s" % ([self.__instrument], dateTime))
+            elif timestamp < self.__lastTimestamp:
+                raise Exception("Bars for %s are not sorted. %s comes after %s" % (
+                    self.__instrument, dateTime, self.__lastDateTime
+                ))
+        self.__buffer.append((timestamp, bar_))
+        self.__lastTimestamp = timestamp
+        self.__lastDateTime = dateTime
+
+    # Returns the (timestamp, bar) tuple for the next bar, or None if there are no more bars.
+    def peek(self):
+        if len(self.__buffer) == 0:
+            self.__fillBuffer()
+        if len(self.__buffer):
+            return self.__buffer[0]
+        return None
 
-    def setColumnName(self, col, name):
-        self.__columnNames[col] = name
+    def pop(self):
+        if len(self.__buffer) == 0:
+            self.__fillBuffer()
+        return self.__buffer.popleft()
 
-    def setDateTimeFormat(self, dateTimeFormat):
-        self.__dateTimeFormat = dateTimeFormat
+
+class StreamingBarFeed(SettingsMixin, streamingbf.BarFeed):
+    """Base class for CSV file based :class:`pyalgotrade.barfeed.BarFeed` that read bars from files as they are
+    consumed, instead of loading them in memory when they are added. Instruments are merged by datetime on the fly.
+
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param bufferSize: The maximum number of bars to read ahead for every instrument.
+    :type bufferSize: int.
+
+    .. note::
+        * This is a base class and should not be used directly.
+        * Bars in every file must be sorted by datetime, and files for the same instrument must be added in
+          chronological order.
+        * The bar filter set when a file is added is the one used for that file.
+    """
+
+    def __init__(self, frequency, maxLen=None, bufferSize=1000):
+        super(StreamingBarFeed, self).__init__(frequency, maxLen)
+
+        if bufferSize <= 0:
+            raise Exception("Invalid buffer size")
+        self.__bufferSize = bufferSize
+        self._initSettings()
+
+    def addBarsFromCSV(self, instrument, path, rowParser):
+        reader = self._getReader(instrument)
+        if reader is None:
+            reader = BarReader(instrument, self.__bufferSize)
+        self._addReader(instrument, reader)
+        reader.addFile(path, rowParser, self.getBarFilter())
+
+
+class GenericStreamingBarFeed(GenericFormatMixin, StreamingBarFeed):
+    """A BarFeed that reads bars from CSV files with the same format as :class:`GenericBarFeed`, as they are consumed.
+
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The default timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param bufferSize: The maximum number of bars to read ahead for every instrument.
+    :type bufferSize: int.
+
+    .. note::
+        * The CSV file **must** have the column names in the first row.
+        * It is ok if the **Adj Close** column is empty. Since files are not read upfront, the first row in every file
+          is used to check if bars have adjusted close values.
+        * Bars in every file must be sorted by datetime, and files for the same instrument must be added in
+          chronological order.
+        * When working with multiple instruments:
+
+         * If all the instruments loaded are in the same timezone, then the timezone parameter may not be specified.
+         * If any of the instruments loaded are in different timezones, then the timezone parameter should be set.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None, bufferSize=1000):
+        super(GenericStreamingBarFeed, self).__init__(frequency, maxLen, bufferSize)
+        self._initGenericFormat(timezone)
+
+    # Parses the first row in a file to check if bars have adjusted close values.
+    def __firstBarHasAdjClose(self, path, rowParser):
+        with open(path, "r") as f:
+            reader = csvutils.FastDictReader(
+                f, fieldnames=rowParser.getFieldNames(), delimiter=rowParser.getDelimiter()
+            )
+            for row in reader:
+                return rowParser.parseBar(row).getAdjClose() is not None
+        return False
+
+    def addBarsFromCSV(self, instrument, path, timezone=None):
+        """Adds a CSV formatted file to read bars for a given instrument from.
+        The instrument gets registered in the bar feed.
+
+        :param instrument: Instrument identifier.
+        :type instrument: string.
+        :param path: The path to the CSV file.
+        :type path: string.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        """
+
+        rowParser = self._createGenericRowParser(timezone)
+        self._setBarsHaveAdjClose(self.__firstBarHasAdjClose(path, rowParser))
+
+        super(GenericStreamingBarFeed, self).addBarsFromCSV(instrument, path, rowParser)
+
+
+# Returns a float array for a column, with empty values as NaN.
+def parse_float_column(values):
+    try:
+        ret = np.array(values, dtype=np.float64)
+    except ValueError:
+        ret = np.array([value if len(value) > 0 else "nan" for value in values], dtype=np.float64)
+    return ret
+
+
+# Checks the same conditions that bar.BasicBar does, for all the bars at once.
+def check_ohlc(timestamps, open_, high, low, close, tzInfo):
+    checks = [
+        (high < low, "high < low on %s"),
+        (high < open_, "high < open on %s"),
+        (high < close, "high < close on %s"),
+        (low > open_, "low > open on %s"),
+        (low > close, "low > close on %s"),
+    ]
+    invalid = np.zeros(len(timestamps), dtype=np.bool_)
+    for mask, message in checks:
+        invalid |= mask
+    if invalid.any():
+        pos = np.argmax(invalid)
+        for mask, message in checks:
+            if mask[pos]:
+                raise Exception(message % (dt.microseconds_to_datetime(timestamps.item(pos), tzInfo)))
+
+
+# Returns a copy of values with one item per position in the timeline, and missing values everywhere else.
+def align_column(values, positions, size, missing):
+    ret = np.empty(size, dtype=values.dtype)
+    ret.fill(missing)
+    ret[positions] = values
+    return ret
+
+
+def is_sorted(timestamps):
+    return bool(np.all(timestamps[1:] >= timestamps[:-1]))
+
+
+# Merges the columns loaded for a single instrument, sorted by timestamp, and keeps bars with the same timestamp in
+# the order they were loaded.
+def merge_columns(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    extra = {}
+    for name in set(name for columns in chunks for name in columns.getExtraColumns()):
+        extra[name] = np.concatenate([
+            columns.getExtraColumns().get(name, np.empty(len(columns)) * np.nan) for columns in chunks
+        ])
+    ret = InstrumentColumns(
+        np.concatenate([columns.getTimestamps() for columns in chunks]),
+        dict(
+            (name, np.concatenate([columns.getFloatColumns()[name] for columns in chunks]))
+            for name in sharedmembf.FLOAT_COLUMNS
+        ),
+        extra
+    )
+    if not is_sorted(ret.getTimestamps()):
+        ret = ret.take(np.argsort(ret.getTimestamps(), kind="mergesort"))
+    return ret
+
+
+# Columns loaded for a single instrument, sorted by timestamp.
+class InstrumentColumns(object):
+    def __init__(self, timestamps, floats, extra):
+        self.__timestamps = timestamps
+        self.__floats = floats
+        self.__extra = extra
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def getTimestamps(self):
+        return self.__timestamps
+
+    def getFloatColumns(self):
+        return self.__floats
+
+    def getExtraColumns(self):
+        return self.__extra
+
+    def take(self, indices):
+        return InstrumentColumns(
+            self.__timestamps[indices],
+            dict((name, values[indices]) for name, values in self.__floats.iteritems()),
+            dict((name, values[indices]) for name, values in self.__extra.iteritems())
+        )
+
+    # Returns the columns with one value per timestamp in the timeline, as expected by the store.
+    def align(self, timeline, frequency):
+        size = len(timeline)
+        positions = np.searchsorted(timeline, self.__timestamps)
+        return AlignedColumns(
+            dict((name, align_column(values, positions, size, np.nan)) for name, values in self.__floats.iteritems()),
+            dict((name, align_column(values, positions, size, np.nan)) for name, values in self.__extra.iteritems()),
+            align_column(np.ones(len(positions), dtype=np.int_) * frequency, positions, size, 0),
+            align_column(np.ones(len(positions), dtype=np.int8), positions, size, 0)
+        )
+
+
+# Columns for a single instrument aligned to the store timeline.
+class AlignedColumns(object):
+    def __init__(self, floats, extra, frequency, present):
+        self.__floats = floats
+        self.__extra = extra
+        self.__frequency = frequency
+        self.__present = present
+
+    def getFloatColumns(self):
+        return self.__floats
+
+    def getExtraColumns(self):
+        return self.__extra
+
+    def getFrequency(self):
+        return self.__frequency
+
+    def getPresent(self):
+        return self.__present
+
+
+class GenericColumnarBarFeed(GenericFormatMixin, sharedmembf.ColumnarBarFeed):
+    """A BarFeed that loads bars from CSV files with the same format as :class:`GenericBarFeed`, reading whole
+    columns at once. Datetimes are parsed and bars are checked in bulk, and the bars are held in a
+    :class:`pyalgotrade.barfeed.sharedmembf.ColumnarBarStore` that gets built when the feed starts.
+
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param timezone: The default timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        * The CSV file **must** have the column names in the first row.
+        * It is ok if the **Adj Close** column is empty.
+        * Prices and volumes are loaded as floats, and extra columns must be numeric.
+        * Datetime formats made of %Y, %m, %d, %H, %M and %S only, with fixed width values, are the fastest to parse.
+        * Bars can't be added once the feed started.
+        * When working with multiple instruments:
+
+         * If all the instruments loaded are in the same timezone, then the timezone parameter may not be specified.
+         * If any of the instruments loaded are in different timezones, then the timezone parameter should be set.
+    """
+
+    def __init__(self, frequency, timezone=None, maxLen=None):
+        super(GenericColumnarBarFeed, self).__init__(frequency, maxLen)
+        self._initSettings()
+        self._initGenericFormat(timezone)
+
+        self.__started = False
+        self.__columns = {}
+        self.__tzInfo = None
 
     def setBarClass(self, barClass):
-        self.__barClass = barClass
+        super(GenericColumnarBarFeed, self).setBarClass(barClass)
+        self._setBarClass(barClass)
+
+    def start(self):
+        if not self.__started:
+            self.__buildStore()
+            self.__started = True
+        super(GenericColumnarBarFeed, self).start()
+
+    def __buildStore(self):
+        allColumns = {}
+        for instrument, chunks in self.__columns.iteritems():
+            columns = merge_columns(chunks)
+            # Check for duplicate bars.
+            timestamps = columns.getTimestamps()
+            duplicates = np.flatnonzero(timestamps[1:] == timestamps[:-1])
+            if len(duplicates):
+                raise Exception("Duplicate bars found for %s on %s" % (
+                    [instrument], dt.microseconds_to_datetime(timestamps.item(duplicates[0]), self.__tzInfo)
+                ))
+            allColumns[instrument] = columns
+
+        timeline = np.unique(np.concatenate(
+            [instrumentColumns.getTimestamps() for instrumentColumns in allColumns.itervalues()] +
+            [np.empty(0, dtype=np.int64)]
+        ))
+        alignedColumns = {}
+        for instrument, instrumentColumns in allColumns.iteritems():
+            alignedColumns[instrument] = instrumentColumns.align(timeline, self.getFrequency())
+        store = sharedmembf.ColumnarBarStore(
+            self.getFrequency(), self.barsHaveAdjClose(), self.getRegisteredInstruments(), timeline, alignedColumns,
+            self.__tzInfo
+        )
+        self.__columns = {}
+        self._setStore(store)
+
+    def __setTimezone(self, timezone):
+        if len(self.__columns) == 0:
+            self.__tzInfo = timezone
+        elif (timezone is None) != (self.__tzInfo is None):
+            raise Exception("Naive and timezone aware datetimes can't be mixed")
+
+    def __loadColumns(self, path, timezone):
+        with open(path, "r") as f:
+            columns = csvutils.read_columns(f)
+        columnNames = self._getColumnNames()
+
+        # Parse datetimes.
+        timestamps = dt.parse_datetimes(columns[columnNames["datetime"]], self._getDateTimeFormat())
+        dailyTime = self.getDailyBarTime()
+        if dailyTime is not None:
+            dayLen = 86400 * 1000000
+            timeOfDay = (dailyTime.hour * 3600 + dailyTime.minute * 60 + dailyTime.second)
+            timestamps = timestamps // dayLen * dayLen + timeOfDay * 1000000 + dailyTime.microsecond
+        if timezone:
+            timestamps = dt.localize_microseconds(timestamps, timezone)
+
+        # Parse prices and volumes.
+        floats = {}
+        for name, col in [("open", "open"), ("high", "high"), ("low", "low"), ("close", "close"), ("volume", "volume")]:
+            floats[name] = np.array(columns[columnNames[col]], dtype=np.float64)
+        haveAdjClose = False
+        adjCloseColName = columnNames["adj_close"]
+        if adjCloseColName is not None and adjCloseColName in columns and any(columns[adjCloseColName]):
+            floats["adjClose"] = parse_float_column(columns[adjCloseColName])
+            haveAdjClose = True
+        else:
+            floats["adjClose"] = np.empty(len(timestamps)) * np.nan
+        check_ohlc(timestamps, floats["open"], floats["high"], floats["low"], floats["close"], timezone)
+
+        # Process extra columns.
+        extra = {}
+        for name, values in columns.iteritems():
+            if name not in columnNames.values():
+                try:
+                    extra[name] = parse_float_column(values)
+                except ValueError:
+                    raise Exception("Only numeric extra columns are supported. %s has a non numeric value" % (name))
+
+        ret = InstrumentColumns(timestamps, floats, extra)
+        barFilter = self.getBarFilter()
+        if barFilter is not None:
+            ret = ret.take(np.fromiter(
+                (barFilter.includeBar(bar_) for bar_ in self.__buildBars(ret, timezone)),
+                dtype=np.bool_, count=len(ret)
+            ))
+        if not is_sorted(ret.getTimestamps()):
+            ret = ret.take(np.argsort(ret.getTimestamps(), kind="mergesort"))
+        return ret, haveAdjClose
+
+    # Builds the bars for the bar filter.
+    def __buildBars(self, columns, timezone):
+        floats = columns.getFloatColumns()
+        extra = columns.getExtraColumns()
+        barClass = self._getBarClass()
+        for pos, timestamp in enumerate(columns.getTimestamps().tolist()):
+            extraValues = {}
+            for name, values in extra.iteritems():
+                value = utils.to_value(values.item(pos))
+                if value is not None:
+                    extraValues[name] = value
+            yield barClass(
+                dt.microseconds_to_datetime(timestamp, timezone),
+                floats["open"].item(pos),
+                floats["high"].item(pos),
+                floats["low"].item(pos),
+                floats["close"].item(pos),
+                floats["volume"].item(pos),
+                utils.to_value(floats["adjClose"].item(pos)),
+                self.getFrequency(),
+                extraValues
+            )
 
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
@@ -263,17 +952,15 @@ class GenericBarFeed(BarFeed):
         :type timezone: A pytz timezone.
         """
 
-        if timezone is None:
-            timezone = self.__timezone
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
 
-        rowParser = GenericRowParser(
-            self.__columnNames, self.__dateTimeFormat, self.getDailyBarTime(), self.getFrequency(),
-            timezone, self.__barClass
-        )
+        if timezone is None:
+            timezone = self._getTimezone()
+        self.__setTimezone(timezone)
 
-        super(GenericBarFeed, self).addBarsFromCSV(instrument, path, rowParser)
+        columns, haveAdjClose = self.__loadColumns(path, timezone)
+        self._setBarsHaveAdjClose(haveAdjClose)
 
-        if rowParser.barsHaveAdjClose():
-            self.__haveAdjClose = True
-        elif self.__haveAdjClose:
-            raise Exception("Previous bars had adjusted close and these ones don't have.")
+        self.__columns.setdefault(instrument, []).append(columns)
+        self.registerInstrument(instrument)
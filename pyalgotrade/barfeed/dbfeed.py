@@ -25,6 +25,10 @@ class Database(object):
             bar = bars.getBar(instrument)
             self.addBar(instrument, bar, frequency)
 
+    def addBarSequence(self, instrument, bars, frequency):
+        for bar in bars:
+            self.addBar(instrument, bar, frequency)
+
     def addBarsFromFeed(self, feed):
         for dateTime, bars in feed:
             if bars:
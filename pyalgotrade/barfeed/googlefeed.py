@@ -59,8 +59,11 @@ class RowParser(csvfeed.RowParser):
     def __init__(self, dailyBarTime, frequency, timezone=None, sanitize=False):
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
-        self.__timezone = timezone
+        self.__localizer = None
+        if timezone:
+            self.__localizer = dt.Localizer(timezone)
         self.__sanitize = sanitize
+        self.__cacheKey = repr((type(self).__name__, str(dailyBarTime), frequency, str(timezone), sanitize))
 
     def __parseDate(self, dateString):
         ret = parse_date(dateString)
@@ -68,8 +71,8 @@ class RowParser(csvfeed.RowParser):
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer is not None:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -79,6 +82,11 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ","
 
+    def getCacheKey(self):
+        if type(self) is not RowParser:
+            return None
+        return self.__cacheKey
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDate(csvRowDict["Date"])
         close = float(csvRowDict["Close"])
@@ -129,6 +137,12 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return False
 
+    def _createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
+
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -141,8 +155,5 @@ class Feed(csvfeed.BarFeed):
         :type timezone: A pytz timezone.
         """
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars)
+        rowParser = self._createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
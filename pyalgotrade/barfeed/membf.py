@@ -18,9 +18,24 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import heapq
+import itertools
+import operator
+import sys
+
 from pyalgotrade import barfeed
 from pyalgotrade import bar
-from pyalgotrade import utils
+from pyalgotrade.utils import dt
+
+
+def is_sorted(values):
+    return all(itertools.imap(operator.le, values, itertools.islice(values, 1, None)))
+
+
+# Sorts bars using their timestamps. The sort is stable so bars with the same timestamp keep their order.
+def sort_bars(bars, timestamps):
+    positions = sorted(xrange(len(bars)), key=timestamps.__getitem__)
+    return [bars[i] for i in positions], [timestamps[i] for i in positions]
 
 
 # A non real-time BarFeed responsible for:
@@ -35,15 +50,31 @@ class BarFeed(barfeed.BaseBarFeed):
         super(BarFeed, self).__init__(frequency, maxLen)
 
         self.__bars = {}
+        # The bar datetimes as microseconds since the epoch, used to align the bars.
+        self.__timestamps = {}
         self.__nextPos = {}
+        # A heap with the timestamps for the next bar of every instrument, and the instruments for each of those
+        # timestamps. These are built on demand and discarded whenever bars are added or the feed is reset.
+        self.__nextTimestamps = None
+        self.__nextInstruments = None
+        # A list of (timestamp, bar.Bars) tuples with all the bars merged, only used with a compiled timeline. This is built once and
+        # replayed every time the feed is reset.
+        self.__useTimeline = False
+        self.__timeline = None
+        self.__timelinePos = 0
         self.__started = False
         self.__currDateTime = None
+        self.__currTimestamp = None
 
     def reset(self):
         self.__nextPos = {}
         for instrument in self.__bars.keys():
             self.__nextPos.setdefault(instrument, 0)
+        self.__nextTimestamps = None
+        self.__nextInstruments = None
+        self.__timelinePos = 0
         self.__currDateTime = None
+        self.__currTimestamp = None
         super(BarFeed, self).reset()
 
     def getCurrentDateTime(self):
@@ -52,6 +83,8 @@ class BarFeed(barfeed.BaseBarFeed):
     def start(self):
         super(BarFeed, self).start()
         self.__started = True
+        if self.__useTimeline:
+            self.__getTimeline()
 
     def stop(self):
         pass
@@ -59,59 +92,176 @@ class BarFeed(barfeed.BaseBarFeed):
     def join(self):
         pass
 
+    def setUseCompiledTimeline(self, useTimeline):
+        """Set to True to merge all the bars once, when the feed starts, and replay them every time the feed is reset.
+        This saves merging instruments and building :class:`pyalgotrade.bar.Bars` on every run, at the cost of
+        holding a :class:`pyalgotrade.bar.Bars` for every datetime in memory.
+        Use :meth:`getCompiledTimelineMemoryUsage` to check how much memory that takes.
+
+        :param useTimeline: True to use a compiled timeline.
+        :type useTimeline: boolean.
+
+        .. note::
+            This has to be called before the feed starts.
+        """
+        if self.__started:
+            raise Exception("Can't change the timeline mode once you started consuming bars")
+        self.__useTimeline = useTimeline
+        self.__timeline = None
+
+    def getCompiledTimelineMemoryUsage(self):
+        """Returns an estimate of the number of bytes used by the compiled timeline, not including the bars
+        themselves since those are held by the feed anyway, or None if the timeline was not compiled yet."""
+        if self.__timeline is None:
+            return None
+
+        ret = sys.getsizeof(self.__timeline)
+        for item in self.__timeline:
+            ret += sys.getsizeof(item) + sys.getsizeof(item[0]) + sys.getsizeof(item[1])
+            for value in vars(item[1]).itervalues():
+                ret += sys.getsizeof(value)
+        return ret
+
     def addBarsFromSequence(self, instrument, bars):
         if self.__started:
             raise Exception("Can't add more bars once you started consuming bars")
 
-        self.__bars.setdefault(instrument, [])
         self.__nextPos.setdefault(instrument, 0)
+        self.__nextTimestamps = None
+        self.__nextInstruments = None
+        self.__timeline = None
 
-        # Add and sort the bars
-        self.__bars[instrument].extend(bars)
-        barCmp = lambda x, y: cmp(x.getDateTime(), y.getDateTime())
-        self.__bars[instrument].sort(barCmp)
+        bars = list(bars)
+        timestamps = [dt.datetime_to_microseconds(bar_.getDateTime()) for bar_ in bars]
+        if not is_sorted(timestamps):
+            bars, timestamps = sort_bars(bars, timestamps)
+
+        # Add the bars and sort them only if they don't go after the ones already added.
+        currentBars = self.__bars.setdefault(instrument, [])
+        currentTimestamps = self.__timestamps.setdefault(instrument, [])
+        if len(currentTimestamps) and len(timestamps) and currentTimestamps[-1] > timestamps[0]:
+            # Both sequences are sorted so this is just a merge.
+            bars, timestamps = sort_bars(currentBars + bars, currentTimestamps + timestamps)
+            self.__bars[instrument] = bars
+            self.__timestamps[instrument] = timestamps
+        else:
+            currentBars.extend(bars)
+            currentTimestamps.extend(timestamps)
 
         self.registerInstrument(instrument)
 
+    def __scheduleNextBar(self, instrument):
+        nextPos = self.__nextPos[instrument]
+        timestamps = self.__timestamps[instrument]
+        if nextPos < len(timestamps):
+            timestamp = timestamps[nextPos]
+            instruments = self.__nextInstruments.get(timestamp)
+            if instruments is None:
+                self.__nextInstruments[timestamp] = [instrument]
+                heapq.heappush(self.__nextTimestamps, timestamp)
+            else:
+                instruments.append(instrument)
+
+    def __getNextTimestamps(self):
+        if self.__nextTimestamps is None:
+            self.__nextTimestamps = []
+            self.__nextInstruments = {}
+            for instrument in self.__timestamps.iterkeys():
+                self.__scheduleNextBar(instrument)
+        return self.__nextTimestamps
+
+    def __getTimeline(self):
+        if self.__timeline is None:
+            timeline = []
+            prevTimestamp = None
+            while len(self.__getNextTimestamps()):
+                timestamp, bars = self.__mergeNextBars()
+                if timestamp == prevTimestamp:
+                    raise Exception("Duplicate bars found for %s on %s" % (bars.keys(), timeline[-1][1].getDateTime()))
+                timeline.append((timestamp, bar.Bars(bars)))
+                prevTimestamp = timestamp
+            self.__timeline = timeline
+        return self.__timeline
+
     def eof(self):
-        ret = True
-        # Check if there is at least one more bar to return.
-        for instrument, bars in self.__bars.iteritems():
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = False
-                break
+        if self.__useTimeline:
+            return self.__timelinePos >= len(self.__getTimeline())
+        return len(self.__getNextTimestamps()) == 0
+
+    def peekTimestamp(self):
+        ret = None
+        if self.__useTimeline:
+            timeline = self.__getTimeline()
+            if self.__timelinePos < len(timeline):
+                ret = timeline[self.__timelinePos][0]
+        else:
+            nextTimestamps = self.__getNextTimestamps()
+            if len(nextTimestamps):
+                ret = nextTimestamps[0]
         return ret
 
     def peekDateTime(self):
         ret = None
-
-        for instrument, bars in self.__bars.iteritems():
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars):
-                ret = utils.safe_min(ret, bars[nextPos].getDateTime())
+        if self.__useTimeline:
+            timeline = self.__getTimeline()
+            if self.__timelinePos < len(timeline):
+                ret = timeline[self.__timelinePos][1].getDateTime()
+        else:
+            nextTimestamps = self.__getNextTimestamps()
+            if len(nextTimestamps):
+                instrument = self.__nextInstruments[nextTimestamps[0]][0]
+                ret = self.__bars[instrument][self.__nextPos[instrument]].getDateTime()
         return ret
 
     def getNextBars(self):
-        # All bars must have the same datetime. We will return all the ones with the smallest datetime.
-        smallestDateTime = self.peekDateTime()
+        if self.__useTimeline:
+            timeline = self.__getTimeline()
+            if self.__timelinePos >= len(timeline):
+                return None
+            smallestTimestamp, ret = timeline[self.__timelinePos]
+            self.__timelinePos += 1
+        else:
+            if len(self.__getNextTimestamps()) == 0:
+                return None
+            smallestTimestamp, ret = self.__mergeNextBars()
+            if self.__currTimestamp == smallestTimestamp:
+                raise Exception("Duplicate bars found for %s on %s" % (ret.keys(), self.__currDateTime))
+            ret = bar.Bars(ret)
 
-        if smallestDateTime is None:
-            return None
+        self.__currDateTime = ret.getDateTime()
+        self.__currTimestamp = smallestTimestamp
+        return ret
 
-        # Make a second pass to get all the bars that had the smallest datetime.
-        ret = {}
-        for instrument, bars in self.__bars.iteritems():
-            nextPos = self.__nextPos[instrument]
-            if nextPos < len(bars) and bars[nextPos].getDateTime() == smallestDateTime:
-                ret[instrument] = bars[nextPos]
-                self.__nextPos[instrument] += 1
+    # Returns the smallest timestamp and a dictionary with the bars for that timestamp.
+    def __mergeNextBars(self):
+        nextTimestamps = self.__getNextTimestamps()
 
-        if self.__currDateTime == smallestDateTime:
-            raise Exception("Duplicate bars found for %s on %s" % (ret.keys(), smallestDateTime))
+        # All bars must have the same datetime. We will return all the ones with the smallest datetime.
+        smallestTimestamp = heapq.heappop(nextTimestamps)
+        instruments = self.__nextInstruments.pop(smallestTimestamp)
+        ret = {}
+        allBars = self.__bars
+        allTimestamps = self.__timestamps
+        allNextPos = self.__nextPos
+        nextInstruments = self.__nextInstruments
+        for instrument in instruments:
+            nextPos = allNextPos[instrument]
+            ret[instrument] = allBars[instrument][nextPos]
+            nextPos += 1
+            allNextPos[instrument] = nextPos
 
-        self.__currDateTime = smallestDateTime
-        return bar.Bars(ret)
+            # Schedule the next bar for the instrument. This is __scheduleNextBar inlined since it's called for every
+            # bar. If the next bar is a duplicate it will be returned on the next call.
+            timestamps = allTimestamps[instrument]
+            if nextPos < len(timestamps):
+                timestamp = timestamps[nextPos]
+                nextTimestampInstruments = nextInstruments.get(timestamp)
+                if nextTimestampInstruments is None:
+                    nextInstruments[timestamp] = [instrument]
+                    heapq.heappush(nextTimestamps, timestamp)
+                else:
+                    nextTimestampInstruments.append(instrument)
+        return smallestTimestamp, ret
 
     def loadAll(self):
         for dateTime, bars in self:
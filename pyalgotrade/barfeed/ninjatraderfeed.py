@@ -62,14 +62,18 @@ class RowParser(csvfeed.RowParser):
     def __init__(self, frequency, dailyBarTime, timezone=None):
         self.__frequency = frequency
         self.__dailyBarTime = dailyBarTime
-        self.__timezone = timezone
+        self.__parseDate = dt.get_datetime_parser("%Y%m%d")
+        self.__localizer = None
+        if timezone:
+            self.__localizer = dt.Localizer(timezone)
+        self.__cacheKey = repr((type(self).__name__, frequency, str(dailyBarTime), str(timezone)))
 
     def __parseDateTime(self, dateTime):
         ret = None
         if self.__frequency == pyalgotrade.bar.Frequency.MINUTE:
             ret = parse_datetime(dateTime)
         elif self.__frequency == pyalgotrade.bar.Frequency.DAY:
-            ret = datetime.datetime.strptime(dateTime, "%Y%m%d")
+            ret = self.__parseDate(dateTime)
             # Time on CSV files is empty. If told to set one, do it.
             if self.__dailyBarTime is not None:
                 ret = datetime.datetime.combine(ret, self.__dailyBarTime)
@@ -80,8 +84,8 @@ class RowParser(csvfeed.RowParser):
         ret = pytz.utc.localize(ret)
 
         # Localize bars if a market session was set.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer is not None:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -90,6 +94,11 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ";"
 
+    def getCacheKey(self):
+        if type(self) is not RowParser:
+            return None
+        return self.__cacheKey
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDateTime(csvRowDict["Date Time"])
         close = float(csvRowDict["Close"])
@@ -127,6 +136,12 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return False
 
+    def _createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -142,8 +157,5 @@ class Feed(csvfeed.BarFeed):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(self.getFrequency(), self.getDailyBarTime(), timezone)
+        rowParser = self._createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
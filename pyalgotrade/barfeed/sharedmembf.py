@@ -0,0 +1,340 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import array
+import mmap
+
+import numpy as np
+
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+from pyalgotrade.utils import dt
+from pyalgotrade import utils
+
+
+# The float columns held for every instrument.
+FLOAT_COLUMNS = ["open", "high", "low", "close", "volume", "adjClose"]
+
+
+# Returns a numpy view of values, that can be either a numpy array or an array.array with items of the given type.
+def as_array(values, dtype):
+    if isinstance(values, np.ndarray):
+        return values
+    return np.frombuffer(values, dtype=dtype)
+
+
+# Columns for a single instrument while the store is being built.
+class ColumnsBuilder(object):
+    def __init__(self, size):
+        self.__floats = dict((name, array.array("d", [np.nan]) * size) for name in FLOAT_COLUMNS)
+        self.__frequency = array.array("l", [0]) * size
+        self.__present = array.array("b", [0]) * size
+        self.__extra = {}
+        self.__size = size
+
+    def append(self, bar_):
+        self.__floats["open"].append(utils.to_float(bar_.getOpen()))
+        self.__floats["high"].append(utils.to_float(bar_.getHigh()))
+        self.__floats["low"].append(utils.to_float(bar_.getLow()))
+        self.__floats["close"].append(utils.to_float(bar_.getClose()))
+        self.__floats["volume"].append(utils.to_float(bar_.getVolume()))
+        self.__floats["adjClose"].append(utils.to_float(bar_.getAdjClose()))
+        self.__frequency.append(bar_.getFrequency())
+        self.__present.append(1)
+        for name, value in bar_.getExtraColumns().iteritems():
+            if name not in self.__extra:
+                self.__extra[name] = array.array("d", [np.nan]) * self.__size
+            try:
+                self.__extra[name].append(utils.to_float(value))
+            except (TypeError, ValueError):
+                raise Exception("Only numeric extra columns can be shared. %s has a non numeric value" % (name))
+        self.__size += 1
+        for values in self.__extra.itervalues():
+            if len(values) < self.__size:
+                values.append(np.nan)
+
+    def appendMissing(self):
+        for values in self.__floats.itervalues():
+            values.append(np.nan)
+        for values in self.__extra.itervalues():
+            values.append(np.nan)
+        self.__frequency.append(0)
+        self.__present.append(0)
+        self.__size += 1
+
+    def getFloatColumns(self):
+        return self.__floats
+
+    def getExtraColumns(self):
+        return self.__extra
+
+    def getFrequency(self):
+        return self.__frequency
+
+    def getPresent(self):
+        return self.__present
+
+
+class ColumnarBarStore(object):
+    """A read-only store with bars held in columns in a single shared memory block. Processes forked after building
+    the store (like :func:`pyalgotrade.optimizer.local.run` workers) access that same memory block without copying it,
+    so they all share one copy of the bars.
+
+    :param frequency: The frequency of the bars.
+    :param barsHaveAdjClose: True if the bars have adjusted close values.
+    :type barsHaveAdjClose: boolean.
+    :param instruments: The instruments.
+    :type instruments: list.
+    :param timestamps: The datetimes for all the bars, as microseconds since the epoch (UTC), in ascending order.
+    :param columns: A map of instrument to columns, with one value for each timestamp, like :class:`ColumnsBuilder`.
+    :type columns: map.
+    :param tzInfo: The timezone used to build datetimes, or None to build naive datetimes.
+
+    .. note::
+        * Use :class:`SharedBarStore` to build a store from a :class:`pyalgotrade.barfeed.BaseBarFeed`.
+        * Prices, volumes and extra columns are returned as floats, and extra columns must be numeric.
+        * The memory block is anonymous so it can't be shared with processes that are not forked from this one.
+    """
+
+    def __init__(self, frequency, barsHaveAdjClose, instruments, timestamps, columns, tzInfo):
+        self.__frequency = frequency
+        self.__barsHaveAdjClose = barsHaveAdjClose
+        self.__instruments = instruments
+        self.__tzInfo = tzInfo
+        self.__build(timestamps, columns)
+
+    def __build(self, timestamps, builders):
+        size = len(timestamps)
+        # Every column takes at most 8 bytes per row. The presence columns go last so the others remain aligned.
+        columnCount = 1
+        for builder in builders.itervalues():
+            columnCount += len(FLOAT_COLUMNS) + len(builder.getExtraColumns()) + 2
+        self.__buffer = mmap.mmap(-1, max(1, columnCount * size * 8))
+        self.__offset = 0
+
+        self.__timestamps = self.__buildColumn(as_array(timestamps, np.float64), np.int64)
+        columns = {}
+        for instrument, builder in builders.iteritems():
+            floats = dict(
+                (name, self.__buildColumn(as_array(values, np.float64), np.float64))
+                for name, values in builder.getFloatColumns().iteritems()
+            )
+            extra = dict(
+                (name, self.__buildColumn(as_array(values, np.float64), np.float64))
+                for name, values in builder.getExtraColumns().iteritems()
+            )
+            frequency = self.__buildColumn(as_array(builder.getFrequency(), np.int_), np.int64)
+            columns[instrument] = (floats, extra, frequency)
+        self.__columns = {}
+        for instrument, builder in builders.iteritems():
+            present = self.__buildColumn(as_array(builder.getPresent(), np.int8), np.bool_)
+            self.__columns[instrument] = columns[instrument] + (present,)
+
+    # Copies values into the shared memory block and returns a read-only view.
+    def __buildColumn(self, values, dtype):
+        ret = np.frombuffer(self.__buffer, dtype=dtype, count=len(values), offset=self.__offset)
+        ret[:] = values
+        ret.flags.writeable = False
+        self.__offset += ret.nbytes
+        return ret
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def getFrequency(self):
+        return self.__frequency
+
+    def getInstruments(self):
+        return self.__instruments
+
+    def barsHaveAdjClose(self):
+        return self.__barsHaveAdjClose
+
+    def getTimestamp(self, pos):
+        return self.__timestamps.item(pos)
+
+    def getDateTime(self, pos):
+        return dt.microseconds_to_datetime(self.__timestamps.item(pos), self.__tzInfo)
+
+    def getBars(self, pos, barClass=bar.BasicBar):
+        """Returns a :class:`pyalgotrade.bar.Bars` with the bars at a given position."""
+        dateTime = self.getDateTime(pos)
+        ret = {}
+        for instrument, (floats, extra, frequency, present) in self.__columns.iteritems():
+            if present[pos]:
+                extraValues = {}
+                for name, values in extra.iteritems():
+                    value = utils.to_value(values.item(pos))
+                    if value is not None:
+                        extraValues[name] = value
+                ret[instrument] = barClass(
+                    dateTime,
+                    utils.to_value(floats["open"].item(pos)),
+                    utils.to_value(floats["high"].item(pos)),
+                    utils.to_value(floats["low"].item(pos)),
+                    utils.to_value(floats["close"].item(pos)),
+                    utils.to_value(floats["volume"].item(pos)),
+                    utils.to_value(floats["adjClose"].item(pos)),
+                    frequency.item(pos),
+                    extraValues
+                )
+        return bar.Bars(ret)
+
+
+class SharedBarStore(ColumnarBarStore):
+    """A :class:`ColumnarBarStore` with the bars from a :class:`pyalgotrade.barfeed.BaseBarFeed`.
+
+    :param barFeed: The bar feed to load the bars from. All the bars will be consumed.
+    :type barFeed: :class:`pyalgotrade.barfeed.BaseBarFeed`.
+
+    .. note::
+        * Prices, volumes and extra columns are returned as floats, and extra columns must be numeric.
+        * All datetimes have to be either naive or have timezone information. In the later case, datetimes are
+          rebuilt using the timezone from the first one.
+        * The memory block is anonymous so it can't be shared with processes that are not forked from this one.
+        * The store is dense. It takes 8 bytes for every datetime in the feed, plus 8 bytes for every float column,
+          extra column, frequency and presence flag of every instrument at every datetime, even where an instrument has
+          no bar. For example, 100 instruments with 8 columns each over 1 million datetimes take about 6.4GB. While the
+          store is being built, the columns are also held in temporary arrays, so peak memory is about twice that.
+    """
+
+    def __init__(self, barFeed):
+        timestamps = array.array("d")
+        builders = {}
+        tzInfo = None
+        firstDateTime = None
+        for dateTime, bars in barFeed:
+            if firstDateTime is None:
+                firstDateTime = dateTime
+                tzInfo = dateTime.tzinfo
+            elif (dateTime.tzinfo is None) != (tzInfo is None):
+                raise Exception("Naive and timezone aware datetimes can't be mixed")
+            timestamps.append(dt.datetime_to_microseconds(dateTime))
+            for instrument in bars.getInstruments():
+                if instrument not in builders:
+                    builders[instrument] = ColumnsBuilder(len(timestamps) - 1)
+            for instrument, builder in builders.iteritems():
+                bar_ = bars.getBar(instrument)
+                if bar_ is None:
+                    builder.appendMissing()
+                else:
+                    builder.append(bar_)
+        instruments = sorted(set(builders.keys() + barFeed.getRegisteredInstruments()))
+        super(SharedBarStore, self).__init__(
+            barFeed.getFrequency(), barFeed.barsHaveAdjClose(), instruments, timestamps, builders, tzInfo
+        )
+
+
+class ColumnarBarFeed(barfeed.BaseBarFeed):
+    """Base class for :class:`pyalgotrade.barfeed.BaseBarFeed` that return the bars held in a
+    :class:`ColumnarBarStore`.
+
+    :param frequency: The bars frequency. Valid values defined in :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+
+    .. note::
+        This is a base class and should not be used directly.
+    """
+
+    def __init__(self, frequency, maxLen=None):
+        super(ColumnarBarFeed, self).__init__(frequency, maxLen)
+        self.__store = None
+        self.__size = 0
+        self.__barClass = bar.BasicBar
+        self.__nextPos = 0
+        self.__currDateTime = None
+
+    # Sets the store with the bars. Subclasses that build the store on their own should call this before the feed
+    # is started.
+    def _setStore(self, store):
+        for instrument in store.getInstruments():
+            self.registerInstrument(instrument)
+        self.__store = store
+        self.__size = len(store)
+        self.__nextPos = 0
+
+    def _getStore(self):
+        return self.__store
+
+    def _setBarClass(self, barClass):
+        self.__barClass = barClass
+
+    def reset(self):
+        self.__nextPos = 0
+        self.__currDateTime = None
+        super(ColumnarBarFeed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def barsHaveAdjClose(self):
+        return self.__store is not None and self.__store.barsHaveAdjClose()
+
+    def start(self):
+        super(ColumnarBarFeed, self).start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def peekTimestamp(self):
+        ret = None
+        if self.__nextPos < self.__size:
+            ret = self.__store.getTimestamp(self.__nextPos)
+        return ret
+
+    def peekDateTime(self):
+        ret = None
+        if self.__nextPos < self.__size:
+            ret = self.__store.getDateTime(self.__nextPos)
+        return ret
+
+    def getNextBars(self):
+        ret = None
+        if self.__nextPos < self.__size:
+            ret = self.__store.getBars(self.__nextPos, self.__barClass)
+            self.__currDateTime = ret.getDateTime()
+            self.__nextPos += 1
+        return ret
+
+    def eof(self):
+        return self.__nextPos >= self.__size
+
+
+class BarFeed(ColumnarBarFeed):
+    """A :class:`pyalgotrade.barfeed.BaseBarFeed` that returns the bars held in a :class:`ColumnarBarStore`, like
+    a :class:`SharedBarStore`.
+
+    :param store: The store with the bars.
+    :type store: :class:`ColumnarBarStore`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded
+        from the opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    """
+
+    def __init__(self, store, maxLen=None):
+        super(BarFeed, self).__init__(store.getFrequency(), maxLen)
+        self._setStore(store)
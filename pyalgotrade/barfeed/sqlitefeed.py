@@ -20,13 +20,39 @@
 
 from pyalgotrade.barfeed import dbfeed
 from pyalgotrade.barfeed import membf
+from pyalgotrade import barfeed
 from pyalgotrade import bar
 from pyalgotrade.utils import dt
 
+import itertools
 import sqlite3
 import os
 
 
+# Databases created before schemas were versioned have version 0. Version 1 stores bars in a table clustered by
+# (instrument_id, frequency, timestamp) and adds an index sorted by timestamp to merge instruments. The index only has
+# the keys, since including every column would duplicate the table and make inserts slower.
+SCHEMA_VERSION = 1
+
+CREATE_BAR_TABLE_SQL = "create table %s (" \
+    "instrument_id integer references instrument (instrument_id)" \
+    ", frequency integer not null" \
+    ", timestamp integer not null" \
+    ", open real not null" \
+    ", high real not null" \
+    ", low real not null" \
+    ", close real not null" \
+    ", volume real not null" \
+    ", adj_close real" \
+    ", primary key (instrument_id, frequency, timestamp)) without rowid"
+
+CREATE_BAR_INDEX_SQL = "create index bar_by_timestamp on bar (frequency, timestamp, instrument_id)"
+
+INSERT_BAR_SQL = "insert or replace into bar" \
+    " (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close)" \
+    " values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
 def normalize_instrument(instrument):
     return instrument.upper()
 
@@ -34,8 +60,14 @@ def normalize_instrument(instrument):
 # SQLite DB.
 # Timestamps are stored in UTC.
 class Database(dbfeed.Database):
-    def __init__(self, dbFilePath):
+    # The number of bars to commit in a single transaction when adding bars in bulk.
+    DEFAULT_BATCH_SIZE = 10000
+    # The maximum number of bytes to memory map when read optimizations are enabled.
+    DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, dbFilePath, batchSize=DEFAULT_BATCH_SIZE):
         self.__instrumentIds = {}
+        self.__batchSize = batchSize
 
         # If the file doesn't exist, we'll create it and initialize it.
         initialize = False
@@ -45,6 +77,11 @@ class Database(dbfeed.Database):
         self.__connection.isolation_level = None  # To do auto-commit
         if initialize:
             self.createSchema()
+        self.__loadInstrumentIds()
+
+    def __loadInstrumentIds(self):
+        for instrumentId, name in self.__connection.execute("select instrument_id, name from instrument"):
+            self.__instrumentIds[name] = instrumentId
 
     def __findInstrumentId(self, instrument):
         cursor = self.__connection.cursor()
@@ -60,6 +97,15 @@ class Database(dbfeed.Database):
         ret = self.__connection.execute("insert into instrument (name) values (?)", [instrument])
         return ret.lastrowid
 
+    def __getInstrumentId(self, instrument):
+        ret = self.__instrumentIds.get(instrument, None)
+        if ret is None:
+            # It may have been added using a different connection.
+            ret = self.__findInstrumentId(instrument)
+            if ret is not None:
+                self.__instrumentIds[instrument] = ret
+        return ret
+
     def __getOrCreateInstrument(self, instrument):
         # Try to get the instrument id from the cache.
         ret = self.__instrumentIds.get(instrument, None)
@@ -80,49 +126,110 @@ class Database(dbfeed.Database):
             "instrument_id integer primary key autoincrement"
             ", name text unique not null)")
 
-        self.__connection.execute(
-            "create table bar ("
-            "instrument_id integer references instrument (instrument_id)"
-            ", frequency integer not null"
-            ", timestamp integer not null"
-            ", open real not null"
-            ", high real not null"
-            ", low real not null"
-            ", close real not null"
-            ", volume real not null"
-            ", adj_close real"
-            ", primary key (instrument_id, frequency, timestamp))")
+        self.__connection.execute(CREATE_BAR_TABLE_SQL % ("bar"))
+        self.__connection.execute(CREATE_BAR_INDEX_SQL)
+        self.__connection.execute("pragma user_version = %d" % (SCHEMA_VERSION))
 
-    def addBar(self, instrument, bar, frequency):
-        instrument = normalize_instrument(instrument)
-        instrumentId = self.__getOrCreateInstrument(instrument)
-        timeStamp = dt.datetime_to_timestamp(bar.getDateTime())
+    def getSchemaVersion(self):
+        return self.__connection.execute("pragma user_version").fetchone()[0]
+
+    def upgradeSchema(self):
+        """Upgrades a database created with a previous version of the schema. Bars are copied to the new tables, so
+        this may take a while for large databases, and the file is vacuumed afterwards."""
+        if self.getSchemaVersion() >= SCHEMA_VERSION:
+            return
 
+        self.__connection.execute("begin")
         try:
-            sql = "insert into bar (instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close) values (?, ?, ?, ?, ?, ?, ?, ?, ?)"
-            params = [instrumentId, frequency, timeStamp, bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose()]
-            self.__connection.execute(sql, params)
-        except sqlite3.IntegrityError:
-            sql = "update bar set open = ?, high = ?, low = ?, close = ?, volume = ?, adj_close = ?" \
-                " where instrument_id = ? and frequency = ? and timestamp = ?"
-            params = [bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(), bar.getVolume(), bar.getAdjClose(), instrumentId, frequency, timeStamp]
-            self.__connection.execute(sql, params)
+            self.__connection.execute(CREATE_BAR_TABLE_SQL % ("bar_upgrade"))
+            self.__connection.execute(
+                "insert into bar_upgrade"
+                " select instrument_id, frequency, timestamp, open, high, low, close, volume, adj_close from bar")
+            self.__connection.execute("drop table bar")
+            self.__connection.execute("alter table bar_upgrade rename to bar")
+            self.__connection.execute(CREATE_BAR_INDEX_SQL)
+            self.__connection.execute("pragma user_version = %d" % (SCHEMA_VERSION))
+            self.__connection.execute("commit")
+        except Exception:
+            self.__connection.execute("rollback")
+            raise
+        self.__connection.execute("vacuum")
+
+    def enableReadOptimizations(self, mmapSize=DEFAULT_MMAP_SIZE):
+        """Sets pragmas that speed up backtesting over large databases: write-ahead logging, so readers and writers
+        don't block each other, no syncing to disk, and memory mapped I/O.
+
+        .. note::
+            * Write-ahead logging is saved in the database file, and remains enabled for other connections.
+            * Without syncing to disk, the database may get corrupted if the machine crashes while writing.
+        """
+        self.__connection.execute("pragma journal_mode = wal")
+        self.__connection.execute("pragma synchronous = off")
+        self.__connection.execute("pragma mmap_size = %d" % (mmapSize))
+
+    def getBatchSize(self):
+        return self.__batchSize
+
+    def setBatchSize(self, batchSize):
+        if batchSize <= 0:
+            raise Exception("Invalid batch size")
+        self.__batchSize = batchSize
+
+    def __getRow(self, instrument, bar, frequency):
+        instrumentId = self.__getOrCreateInstrument(normalize_instrument(instrument))
+        timeStamp = dt.datetime_to_timestamp(bar.getDateTime())
+        return (
+            instrumentId, frequency, timeStamp, bar.getOpen(), bar.getHigh(), bar.getLow(), bar.getClose(),
+            bar.getVolume(), bar.getAdjClose()
+        )
+
+    # Inserts rows in transactions of up to batchSize rows. Rows for bars that are already in the database replace them.
+    def __addRows(self, rows):
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.__batchSize))
+            if len(batch) == 0:
+                break
+            self.__connection.execute("begin")
+            try:
+                self.__connection.executemany(INSERT_BAR_SQL, batch)
+                self.__connection.execute("commit")
+            except Exception:
+                self.__connection.execute("rollback")
+                raise
+
+    def addBar(self, instrument, bar, frequency):
+        self.__connection.execute(INSERT_BAR_SQL, self.__getRow(instrument, bar, frequency))
+
+    def addBarSequence(self, instrument, bars, frequency):
+        self.__addRows(self.__getRow(instrument, bar, frequency) for bar in bars)
+
+    def addBars(self, bars, frequency):
+        self.__addRows(self.__getRow(instrument, bars[instrument], frequency) for instrument in bars.getInstruments())
+
+    def addBarsFromFeed(self, feed):
+        frequency = feed.getFrequency()
+        self.__addRows(
+            self.__getRow(instrument, bars[instrument], frequency)
+            for dateTime, bars in feed if bars for instrument in bars.getInstruments()
+        )
 
     def getBars(self, instrument, frequency, timezone=None, fromDateTime=None, toDateTime=None):
-        instrument = normalize_instrument(instrument)
-        sql = "select bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume, bar.adj_close, bar.frequency" \
-            " from bar join instrument on (bar.instrument_id = instrument.instrument_id)" \
-            " where instrument.name = ? and bar.frequency = ?"
-        args = [instrument, frequency]
+        instrumentId = self.__getInstrumentId(normalize_instrument(instrument))
+        if instrumentId is None:
+            return []
+        sql = "select timestamp, open, high, low, close, volume, adj_close, frequency" \
+            " from bar where instrument_id = ? and frequency = ?"
+        args = [instrumentId, frequency]
 
         if fromDateTime is not None:
-            sql += " and bar.timestamp >= ?"
+            sql += " and timestamp >= ?"
             args.append(dt.datetime_to_timestamp(fromDateTime))
         if toDateTime is not None:
-            sql += " and bar.timestamp <= ?"
+            sql += " and timestamp <= ?"
             args.append(dt.datetime_to_timestamp(toDateTime))
 
-        sql += " order by bar.timestamp asc"
+        sql += " order by timestamp asc"
         cursor = self.__connection.cursor()
         cursor.execute(sql, args)
         ret = []
@@ -134,6 +241,56 @@ class Database(dbfeed.Database):
         cursor.close()
         return ret
 
+    def iterBars(self, instruments, frequency, timezone=None, fromDateTime=None, toDateTime=None, fetchSize=1000):
+        """Returns an iterator over the bars for many instruments, merged by datetime. Every item is a dict that maps
+        the instruments to the bars with the same datetime. Bars are loaded with a single query and fetched fetchSize
+        rows at a time."""
+        names = {}
+        for instrument in instruments:
+            instrumentId = self.__getInstrumentId(normalize_instrument(instrument))
+            if instrumentId is not None:
+                names[instrumentId] = instrument
+        if len(names) == 0:
+            return
+
+        sql = "select timestamp, instrument_id, open, high, low, close, volume, adj_close, frequency" \
+            " from bar where instrument_id in (%s) and frequency = ?" % (", ".join(["?"] * len(names)))
+        args = names.keys() + [frequency]
+
+        if fromDateTime is not None:
+            sql += " and timestamp >= ?"
+            args.append(dt.datetime_to_timestamp(fromDateTime))
+        if toDateTime is not None:
+            sql += " and timestamp <= ?"
+            args.append(dt.datetime_to_timestamp(toDateTime))
+
+        sql += " order by timestamp asc, instrument_id asc"
+        cursor = self.__connection.cursor()
+        try:
+            cursor.execute(sql, args)
+            timeStamp = None
+            dateTime = None
+            bars = {}
+            while True:
+                rows = cursor.fetchmany(fetchSize)
+                if len(rows) == 0:
+                    break
+                for row in rows:
+                    # Rows with the same timestamp share the datetime.
+                    if row[0] != timeStamp:
+                        if len(bars):
+                            yield bars
+                            bars = {}
+                        timeStamp = row[0]
+                        dateTime = dt.timestamp_to_datetime(timeStamp)
+                        if timezone:
+                            dateTime = dt.localize(dateTime, timezone)
+                    bars[names[row[1]]] = bar.BasicBar(dateTime, row[2], row[3], row[4], row[5], row[6], row[7], row[8])
+            if len(bars):
+                yield bars
+        finally:
+            cursor.close()
+
     def disconnect(self):
         self.__connection.close()
         self.__connection = None
@@ -154,3 +311,114 @@ class Feed(membf.BarFeed):
     def loadBars(self, instrument, timezone=None, fromDateTime=None, toDateTime=None):
         bars = self.__db.getBars(instrument, self.getFrequency(), timezone, fromDateTime, toDateTime)
         self.addBarsFromSequence(instrument, bars)
+
+
+class StreamingFeed(barfeed.BaseBarFeed):
+    """A :class:`pyalgotrade.barfeed.BarFeed` that reads bars for many instruments from a SQLite database as they are
+    consumed. Bars are loaded with a single query sorted by datetime, so only a few rows are held in memory at a time.
+
+    :param dbFilePath: The path to the SQLite database.
+    :type dbFilePath: string.
+    :param frequency: The frequency of the bars. Check :class:`pyalgotrade.bar.Frequency`.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param fetchSize: The number of rows to fetch from the database at a time.
+    :type fetchSize: int.
+    """
+
+    def __init__(self, dbFilePath, frequency, maxLen=None, fetchSize=1000):
+        super(StreamingFeed, self).__init__(frequency, maxLen)
+
+        if fetchSize <= 0:
+            raise Exception("Invalid fetch size")
+        self.__db = Database(dbFilePath)
+        self.__fetchSize = fetchSize
+        self.__query = None
+        # The iterator over the bars in the database and the next bars. These are built on demand and discarded whenever
+        # the feed is reset.
+        self.__barsIter = None
+        self.__nextBars = None
+        self.__currDateTime = None
+
+    def barsHaveAdjClose(self):
+        return True
+
+    def getDatabase(self):
+        return self.__db
+
+    def loadBars(self, instruments, timezone=None, fromDateTime=None, toDateTime=None):
+        """Sets the instruments to load bars for. The instruments get registered in the bar feed.
+
+        :param instruments: Instrument identifiers.
+        :type instruments: list.
+        :param timezone: The timezone to use to localize bars. Check :mod:`pyalgotrade.marketsession`.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is greater than or equal to fromDateTime are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is lower than or equal to toDateTime are loaded.
+        :type toDateTime: datetime.datetime.
+        """
+
+        if self.__query is not None:
+            raise Exception("Bars were already loaded")
+        self.__query = (list(instruments), timezone, fromDateTime, toDateTime)
+        for instrument in instruments:
+            self.registerInstrument(instrument)
+
+    def reset(self):
+        self.__barsIter = None
+        self.__nextBars = None
+        self.__currDateTime = None
+        super(StreamingFeed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        super(StreamingFeed, self).start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def __peekBars(self):
+        if self.__barsIter is None:
+            if self.__query is None:
+                self.__barsIter = iter([])
+            else:
+                instruments, timezone, fromDateTime, toDateTime = self.__query
+                self.__barsIter = self.__db.iterBars(
+                    instruments, self.getFrequency(), timezone, fromDateTime, toDateTime, self.__fetchSize
+                )
+            self.__nextBars = next(self.__barsIter, None)
+        return self.__nextBars
+
+    def eof(self):
+        return self.__peekBars() is None
+
+    def peekDateTime(self):
+        ret = None
+        nextBars = self.__peekBars()
+        if nextBars is not None:
+            ret = nextBars.itervalues().next().getDateTime()
+        return ret
+
+    def getNextBars(self):
+        nextBars = self.__peekBars()
+        if nextBars is None:
+            return None
+
+        self.__nextBars = next(self.__barsIter, None)
+        ret = bar.Bars(nextBars)
+        self.__currDateTime = ret.getDateTime()
+        return ret
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
@@ -0,0 +1,130 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import heapq
+
+from pyalgotrade import barfeed
+from pyalgotrade import bar
+
+
+# A non real-time BarFeed that merges, by datetime, the bars read from one reader per instrument.
+# Readers must have the following methods:
+# * peek(): Returns the (timestamp, bar) tuple for the next bar, or None if there are no more bars.
+# * pop(): Consumes and returns the (timestamp, bar) tuple for the next bar.
+# * reset(): Starts reading bars from the beginning.
+# * close(): Releases any resources held by the reader.
+class BarFeed(barfeed.BaseBarFeed):
+    def __init__(self, frequency, maxLen=None):
+        super(BarFeed, self).__init__(frequency, maxLen)
+
+        self.__readers = {}
+        # A heap with the timestamps for the next bar of every instrument, and the instruments for each of those
+        # timestamps. These are built on demand and discarded whenever the feed is reset.
+        self.__nextTimestamps = None
+        self.__nextInstruments = None
+        self.__started = False
+        self.__currDateTime = None
+
+    def _getReader(self, instrument):
+        return self.__readers.get(instrument)
+
+    def _addReader(self, instrument, reader):
+        if self.__started:
+            raise Exception("Can't add more bars once you started consuming bars")
+        self.__readers[instrument] = reader
+        self.registerInstrument(instrument)
+
+    def reset(self):
+        for reader in self.__readers.itervalues():
+            reader.reset()
+        self.__nextTimestamps = None
+        self.__nextInstruments = None
+        self.__currDateTime = None
+        super(BarFeed, self).reset()
+
+    def getCurrentDateTime(self):
+        return self.__currDateTime
+
+    def start(self):
+        super(BarFeed, self).start()
+        self.__started = True
+
+    def stop(self):
+        for reader in self.__readers.itervalues():
+            reader.close()
+
+    def join(self):
+        pass
+
+    def __scheduleNextBar(self, instrument):
+        nextBar = self.__readers[instrument].peek()
+        if nextBar is not None:
+            timestamp = nextBar[0]
+            instruments = self.__nextInstruments.get(timestamp)
+            if instruments is None:
+                self.__nextInstruments[timestamp] = [instrument]
+                heapq.heappush(self.__nextTimestamps, timestamp)
+            else:
+                instruments.append(instrument)
+
+    def __getNextTimestamps(self):
+        if self.__nextTimestamps is None:
+            self.__nextTimestamps = []
+            self.__nextInstruments = {}
+            for instrument in self.__readers.iterkeys():
+                self.__scheduleNextBar(instrument)
+        return self.__nextTimestamps
+
+    def eof(self):
+        return len(self.__getNextTimestamps()) == 0
+
+    def peekTimestamp(self):
+        ret = None
+        nextTimestamps = self.__getNextTimestamps()
+        if len(nextTimestamps):
+            ret = nextTimestamps[0]
+        return ret
+
+    def peekDateTime(self):
+        ret = None
+        nextTimestamps = self.__getNextTimestamps()
+        if len(nextTimestamps):
+            instrument = self.__nextInstruments[nextTimestamps[0]][0]
+            ret = self.__readers[instrument].peek()[1].getDateTime()
+        return ret
+
+    def getNextBars(self):
+        nextTimestamps = self.__getNextTimestamps()
+        if len(nextTimestamps) == 0:
+            return None
+
+        # All bars must have the same datetime. We will return all the ones with the smallest datetime.
+        smallestTimestamp = heapq.heappop(nextTimestamps)
+        bars = {}
+        for instrument in self.__nextInstruments.pop(smallestTimestamp):
+            bars[instrument] = self.__readers[instrument].pop()[1]
+            self.__scheduleNextBar(instrument)
+        ret = bar.Bars(bars)
+        self.__currDateTime = ret.getDateTime()
+        return ret
+
+    def loadAll(self):
+        for dateTime, bars in self:
+            pass
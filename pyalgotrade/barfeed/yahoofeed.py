@@ -50,9 +50,15 @@ class RowParser(csvfeed.RowParser):
     def __init__(self, dailyBarTime, frequency, timezone=None, sanitize=False, barClass=bar.BasicBar):
         self.__dailyBarTime = dailyBarTime
         self.__frequency = frequency
-        self.__timezone = timezone
+        self.__localizer = None
+        if timezone:
+            self.__localizer = dt.Localizer(timezone)
         self.__sanitize = sanitize
         self.__barClass = barClass
+        self.__cacheKey = repr((
+            type(self).__name__, str(dailyBarTime), frequency, str(timezone), sanitize,
+            "%s.%s" % (barClass.__module__, barClass.__name__)
+        ))
 
     def __parseDate(self, dateString):
         ret = parse_date(dateString)
@@ -60,8 +66,8 @@ class RowParser(csvfeed.RowParser):
         if self.__dailyBarTime is not None:
             ret = datetime.datetime.combine(ret, self.__dailyBarTime)
         # Localize the datetime if a timezone was given.
-        if self.__timezone:
-            ret = dt.localize(ret, self.__timezone)
+        if self.__localizer is not None:
+            ret = self.__localizer.localize(ret)
         return ret
 
     def getFieldNames(self):
@@ -71,6 +77,14 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ","
 
+    def getCacheKey(self):
+        if type(self) is not RowParser:
+            return None
+        return self.__cacheKey
+
+    def buildCachedBar(self, dateTime, open_, high, low, close, volume, adjClose, frequency, extra):
+        return self.__barClass(dateTime, open_, high, low, close, volume, adjClose, frequency)
+
     def parseBar(self, csvRowDict):
         dateTime = self.__parseDate(csvRowDict["Date"])
         close = float(csvRowDict["Close"])
@@ -128,6 +142,14 @@ class Feed(csvfeed.BarFeed):
     def barsHaveAdjClose(self):
         return True
 
+    def _createRowParser(self, timezone=None):
+        if timezone is None:
+            timezone = self.__timezone
+
+        return RowParser(
+            self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
+        )
+
     def addBarsFromCSV(self, instrument, path, timezone=None):
         """Loads bars for a given instrument from a CSV formatted file.
         The instrument gets registered in the bar feed.
@@ -143,10 +165,5 @@ class Feed(csvfeed.BarFeed):
         if isinstance(timezone, int):
             raise Exception("timezone as an int parameter is not supported anymore. Please use a pytz timezone instead.")
 
-        if timezone is None:
-            timezone = self.__timezone
-
-        rowParser = RowParser(
-            self.getDailyBarTime(), self.getFrequency(), timezone, self.__sanitizeBars, self.__barClass
-        )
+        rowParser = self._createRowParser(timezone)
         super(Feed, self).addBarsFromCSV(instrument, path, rowParser)
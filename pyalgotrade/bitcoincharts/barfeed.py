@@ -25,6 +25,8 @@ from pyalgotrade.utils import dt
 
 import datetime
 
+import pytz
+
 
 def to_utc_if_naive(dateTime):
     if dateTime is not None and dt.datetime_is_naive(dateTime):
@@ -90,6 +92,12 @@ class UnixTimeFix(object):
         self.__lastDateTime = None
         self.__nextFix = 1
 
+    def getState(self):
+        return (self.__lastDateTime, self.__nextFix)
+
+    def setState(self, state):
+        self.__lastDateTime, self.__nextFix = state
+
     def fixDateTime(self, dateTime):
         ret = dateTime
         if dateTime == self.__lastDateTime:
@@ -127,6 +135,28 @@ class RowParser(csvfeed.RowParser):
     def getDelimiter(self):
         return ","
 
+    def getCacheKey(self):
+        if type(self) is not RowParser:
+            return None
+        # Bars depend on the datetime fixes done for the previous file.
+        return repr((type(self).__name__, str(self.__timezone), self.__unixTimeFix.getState()))
+
+    def getCacheState(self):
+        # The state has to be saved as JSON, so the datetime is saved as the number of microseconds since the epoch.
+        lastDateTime, nextFix = self.__unixTimeFix.getState()
+        if lastDateTime is not None:
+            lastDateTime = dt.datetime_to_microseconds(lastDateTime)
+        return [lastDateTime, nextFix]
+
+    def setCacheState(self, state):
+        lastDateTime, nextFix = state
+        if lastDateTime is not None:
+            lastDateTime = dt.microseconds_to_datetime(lastDateTime, pytz.utc)
+        self.__unixTimeFix.setState((lastDateTime, nextFix))
+
+    def buildCachedBar(self, dateTime, open_, high, low, close, volume, adjClose, frequency, extra):
+        return TradeBar(dateTime, close, volume)
+
 
 class CSVTradeFeed(csvfeed.BarFeed):
     """A BarFeed that builds bars from a Historic Trade Data CSV file as described in http://www.bitcoincharts.com/about/markets-api/.
@@ -186,3 +216,74 @@ class CSVTradeFeed(csvfeed.BarFeed):
             super(CSVTradeFeed, self).addBarsFromCSV(instrument, path, rowParser)
         finally:
             self.setBarFilter(prevBarFilter)
+
+
+class StreamingCSVTradeFeed(csvfeed.StreamingBarFeed):
+    """A BarFeed that reads bars from Historic Trade Data CSV files as described in
+    http://www.bitcoincharts.com/about/markets-api/, as they are consumed. Use this instead of :class:`CSVTradeFeed`
+    for files that are too big to load in memory.
+
+    :param timezone: An optional default timezone to use to localize bars. By default bars are loaded in UTC.
+    :type timezone: A pytz timezone.
+    :param maxLen: The maximum number of values that the :class:`pyalgotrade.dataseries.bards.BarDataSeries` will hold.
+        If not None, it must be greater than 0.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param bufferSize: The maximum number of trades to read ahead for every instrument.
+    :type bufferSize: int.
+
+    .. note::
+        * A :class:`pyalgotrade.bar.Bar` instance will be created for every trade, so open, high, low and close values will all be the same.
+        * Files must be sorted with the **unixtime** column in ascending order, and files for the same instrument
+          must be added in chronological order.
+    """
+
+    def __init__(self, timezone=None, maxLen=None, bufferSize=1000):
+        super(StreamingCSVTradeFeed, self).__init__(barfeed.Frequency.TRADE, maxLen, bufferSize)
+        self.__timezone = timezone
+        # Trades for different instruments are read interleaved, so each one needs its own fix.
+        self.__unixTimeFixes = {}
+
+    def barsHaveAdjClose(self):
+        return False
+
+    def reset(self):
+        for unixTimeFix in self.__unixTimeFixes.itervalues():
+            unixTimeFix.setState(UnixTimeFix().getState())
+        super(StreamingCSVTradeFeed, self).reset()
+
+    def addBarsFromCSV(self, path, instrument="BTC", timezone=None, fromDateTime=None, toDateTime=None):
+        """Adds a trades CSV formatted file to read bars from.
+
+        :param path: The path to the file.
+        :type path: string.
+        :param instrument: The instrument identifier.
+        :type instrument: string.
+        :param timezone: An optional timezone to use to localize bars. By default bars are loaded in UTC.
+        :type timezone: A pytz timezone.
+        :param fromDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is greater than or equal to fromDateTime are loaded.
+        :type fromDateTime: datetime.datetime.
+        :param toDateTime: An optional datetime to use to filter bars to load.
+            If supplied only those bars whose datetime is lower than or equal to toDateTime are loaded.
+        :type toDateTime: datetime.datetime.
+
+        .. note::
+            * Every file that you load bars from must have trades in the same currency.
+            * If fromDateTime or toDateTime are naive, they are treated as UTC.
+        """
+
+        if timezone is None:
+            timezone = self.__timezone
+        unixTimeFix = self.__unixTimeFixes.setdefault(instrument, UnixTimeFix())
+        rowParser = RowParser(unixTimeFix, timezone)
+
+        # Save the barfilter to restore it later.
+        prevBarFilter = self.getBarFilter()
+        try:
+            if fromDateTime or toDateTime:
+                self.setBarFilter(csvfeed.DateRangeFilter(to_utc_if_naive(fromDateTime), to_utc_if_naive(toDateTime)))
+            super(StreamingCSVTradeFeed, self).addBarsFromCSV(instrument, path, rowParser)
+        finally:
+            self.setBarFilter(prevBarFilter)
@@ -23,6 +23,7 @@ import time
 import Queue
 
 from pyalgotrade import broker
+from pyalgotrade import dispatcher
 from pyalgotrade.bitstamp import httpclient
 from pyalgotrade.bitstamp import common
 
@@ -51,7 +52,7 @@ class TradeMonitor(threading.Thread):
         super(TradeMonitor, self).__init__()
         self.__lastTradeId = -1
         self.__httpClient = httpClient
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.NotifyingQueue()
         self.__stop = False
 
     def _getNewTrades(self):
@@ -123,13 +124,12 @@ class LiveBroker(broker.Broker):
           * Sell limit order
     """
 
-    QUEUE_TIMEOUT = 0.01
-
     def __init__(self, clientId, key, secret):
         super(LiveBroker, self).__init__()
         self.__stop = False
         self.__httpClient = self.buildHTTPClient(clientId, key, secret)
         self.__tradeMonitor = TradeMonitor(self.__httpClient)
+        self.__dispatcher = None
         self.__cash = 0
         self.__shares = {}
         self.__activeOrders = {}
@@ -238,7 +238,7 @@ class LiveBroker(broker.Broker):
 
         # Dispatch events from the trade monitor.
         try:
-            eventType, eventData = self.__tradeMonitor.getQueue().get(True, LiveBroker.QUEUE_TIMEOUT)
+            eventType, eventData = self.__tradeMonitor.getQueue().get(False)
 
             if eventType == TradeMonitor.ON_USER_TRADE:
                 self._onUserTrades(eventData)
@@ -251,6 +251,13 @@ class LiveBroker(broker.Broker):
         # Return None since this is a realtime subject.
         return None
 
+    def onDispatcherRegistered(self, dispatcher):
+        self.__dispatcher = dispatcher
+        self.__tradeMonitor.getQueue().setDispatcher(dispatcher)
+
+    def wakesUpDispatcher(self):
+        return True
+
     # END observer.Subject interface
 
     # BEGIN broker.Broker interface
@@ -287,6 +294,9 @@ class LiveBroker(broker.Broker):
             # IMPORTANT: Do not emit an event for this switch because when using the position interface
             # the order is not yet mapped to the position and Position.onOrderUpdated will get called.
             order.switchState(broker.Order.State.SUBMITTED)
+            # Wake up the dispatcher so the order gets accepted right away.
+            if self.__dispatcher is not None:
+                self.__dispatcher.wakeUp()
         else:
             raise Exception("The order was already processed")
 
@@ -23,6 +23,7 @@ import time
 import Queue
 
 from pyalgotrade import bar
+from pyalgotrade import dispatcher
 from pyalgotrade import barfeed
 from pyalgotrade import observer
 from pyalgotrade.bitstamp import common
@@ -118,6 +119,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         self.__enableReconnection = True
         self.__stopped = False
         self.__orderBookUpdateEvent = observer.Event()
+        self.__dispatcher = None
 
     # Factory method for testing purposes.
     def buildWebSocketClientThread(self):
@@ -136,6 +138,9 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         try:
             # Start the thread that runs the client.
             self.__thread = self.buildWebSocketClientThread()
+            queue = self.__thread.getQueue()
+            if isinstance(queue, dispatcher.NotifyingQueue):
+                queue.setDispatcher(self.__dispatcher)
             self.__thread.start()
         except Exception, e:
             self.__initializationOk = False
@@ -143,7 +148,7 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
 
         # Wait for initialization to complete.
         while self.__initializationOk is None and self.__thread.is_alive():
-            self.__dispatchImpl([wsclient.WebSocketClient.ON_CONNECTED])
+            self.__dispatchImpl([wsclient.WebSocketClient.ON_CONNECTED], True)
 
         if self.__initializationOk:
             common.logger.info("Initialization ok.")
@@ -165,10 +170,10 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         else:
             self.__stopped = True
 
-    def __dispatchImpl(self, eventFilter):
+    def __dispatchImpl(self, eventFilter, block):
         ret = False
         try:
-            eventType, eventData = self.__thread.getQueue().get(True, LiveTradeFeed.QUEUE_TIMEOUT)
+            eventType, eventData = self.__thread.getQueue().get(block, LiveTradeFeed.QUEUE_TIMEOUT)
             if eventFilter is not None and eventType not in eventFilter:
                 return False
 
@@ -229,7 +234,8 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
         # Note that we may return True even if we didn't dispatch any Bar
         # event.
         ret = False
-        if self.__dispatchImpl(None):
+        # No need to block waiting for events if the dispatcher gets woken up when they arrive.
+        if self.__dispatchImpl(None, not self.wakesUpDispatcher()):
             ret = True
         if super(LiveTradeFeed, self).dispatch():
             ret = True
@@ -253,6 +259,12 @@ class LiveTradeFeed(barfeed.BaseBarFeed):
     def eof(self):
         return self.__stopped
 
+    def onDispatcherRegistered(self, dispatcher):
+        self.__dispatcher = dispatcher
+
+    def wakesUpDispatcher(self):
+        return self.__thread is not None and isinstance(self.__thread.getQueue(), dispatcher.NotifyingQueue)
+
     def getOrderBookUpdateEvent(self):
         """
         Returns the event that will be emitted when the orderbook gets updated.
@@ -20,8 +20,8 @@
 
 import datetime
 import threading
-import Queue
 
+from pyalgotrade import dispatcher
 from pyalgotrade.websocket import pusher
 from pyalgotrade.bitstamp import common
 
@@ -103,7 +103,7 @@ class WebSocketClient(pusher.WebSocketClient):
 
     def __init__(self):
         super(WebSocketClient, self).__init__(WebSocketClient.PUSHER_APP_KEY, 5)
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.NotifyingQueue()
 
     def getQueue(self):
         return self.__queue
@@ -469,6 +469,10 @@ class Broker(broker.Broker):
         # All events were already emitted while handling barfeed events.
         pass
 
+    def isPassive(self):
+        # All events are emitted while handling barfeed events.
+        return True
+
     def peekDateTime(self):
         return None
 
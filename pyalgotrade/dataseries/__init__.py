@@ -19,12 +19,22 @@
 """
 
 import abc
+import bisect
+
+import numpy as np
 
 from pyalgotrade import observer
 from pyalgotrade.utils import collections
+from pyalgotrade.utils import dt
 
 DEFAULT_MAX_LEN = 1024
 
+# Values and datetimes are kept in numpy arrays only for dataseries that can hold at least this many values. Appending
+# to a full numpy ring buffer is O(1), while appending to a full list is O(maxLen), but every value has to be converted
+# when it is appended and when it is read, and getting a single item from a list is several times faster. Below this
+# length lists are faster appending values and feeding indicators. Check tools/benchmarks/dataseries_storage.py.
+TYPED_STORAGE_MIN_LEN = 16384
+
 
 def get_checked_max_len(maxLen):
     if maxLen is None:
@@ -34,6 +44,68 @@ def get_checked_max_len(maxLen):
     return maxLen
 
 
+def read_only(values):
+    values.flags.writeable = False
+    return values
+
+
+# Returns the deques to hold the values and the datetimes for a dataseries.
+def build_deques(maxLen, storageDir):
+    if storageDir is None and maxLen < TYPED_STORAGE_MIN_LEN:
+        values = collections.ListDeque(maxLen)
+        dateTimes = collections.ListDeque(maxLen)
+    else:
+        # Values and datetimes share a single file.
+        memMapFile = None
+        if storageDir is not None:
+            memMapFile = collections.MemMapFile(storageDir)
+        values = collections.AdaptiveDeque(collections.FloatDeque(maxLen, memMapFile))
+        dateTimes = collections.AdaptiveDeque(collections.DateTimeDeque(maxLen, memMapFile))
+    return values, dateTimes
+
+
+# Returns a numpy.array with the datetimes as numpy.datetime64 in UTC. None values are NaT.
+def datetimes_to_numpy(dateTimes):
+    ret = np.empty(len(dateTimes), dtype=np.int64)
+    for i, dateTime in enumerate(dateTimes):
+        if dateTime is None:
+            ret[i] = collections.DateTimeDeque.NONE
+        else:
+            ret[i] = dt.datetime_to_microseconds(dateTime)
+    return ret.view("datetime64[us]")
+
+
+# Returns the values in a numpy.array using a typed deque if possible, so the values are not copied.
+def deque_to_numpy(values, start, end):
+    ret = values.asarray()
+    if ret is not None:
+        ret = read_only(ret[start:end])
+    return ret
+
+
+# Like deque_to_numpy but for deques holding datetimes.
+def datetime_deque_to_numpy(dateTimes, start, end):
+    ret = deque_to_numpy(dateTimes, start, end)
+    if ret is not None:
+        ret = ret.view("datetime64[us]")
+    return ret
+
+
+# Returns the position where dateTime would be inserted in a deque holding sorted datetimes, like numpy.searchsorted.
+def datetime_deque_search(dateTimes, dateTime, side):
+    if side not in ("left", "right"):
+        raise Exception("Invalid side")
+
+    timestamps = dateTimes.asarray()
+    if timestamps is not None:
+        ret = int(np.searchsorted(timestamps, dt.datetime_to_microseconds(dateTime), side=side))
+    elif side == "left":
+        ret = bisect.bisect_left(dateTimes, dateTime)
+    else:
+        ret = bisect.bisect_right(dateTimes, dateTime)
+    return ret
+
+
 # It is important to inherit object to get __getitem__ to work properly.
 # Check http://code.activestate.com/lists/python-list/621258/
 class DataSeries(object):
@@ -74,6 +146,39 @@ class DataSeries(object):
         """Returns a list of :class:`datetime.datetime` associated with each value."""
         raise NotImplementedError()
 
+    def asarray(self, start=None, end=None):
+        """Returns a read-only numpy.array of float64 with the values in a given range. None values are returned as NaN.
+        Values must be numeric.
+
+        :param start: The first position, like when slicing a list. If None, values are returned from the beginning.
+        :type start: int.
+        :param end: The last position (not included), like when slicing a list. If None, values are returned up to the
+            end.
+        :type end: int.
+
+        .. note::
+            Whenever possible the values are not copied, and the array returned is a view that may be changed when new
+            values are added.
+        """
+        # numpy converts None values to NaN by itself, so there is no need to go over the values in Python.
+        return read_only(np.array(self[start:end], dtype=np.float64))
+
+    def getDateTimesAsArray(self, start=None, end=None):
+        """Returns a read-only numpy.array of numpy.datetime64, in UTC and with microsecond precision, with the datetimes
+        in a given range. None values are returned as NaT and naive datetimes are considered to be in UTC.
+
+        :param start: The first position, like when slicing a list. If None, datetimes are returned from the beginning.
+        :type start: int.
+        :param end: The last position (not included), like when slicing a list. If None, datetimes are returned up to
+            the end.
+        :type end: int.
+
+        .. note::
+            Whenever possible the datetimes are not copied, and the array returned is a view that may be changed when
+            new values are added.
+        """
+        return read_only(datetimes_to_numpy(self.getDateTimes()[start:end]))
+
 
 class SequenceDataSeries(DataSeries):
     """A DataSeries that holds values in a sequence in memory.
@@ -82,15 +187,25 @@ class SequenceDataSeries(DataSeries):
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
         opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
     :type maxLen: int.
+    :param storageDir: If set, the dataseries is unbounded (maxLen is ignored) and values and datetimes are kept in
+        memory mapped temporary files created in this directory. Recent values stay in memory while older ones are
+        paged out to disk as needed.
+    :type storageDir: string.
+
+    .. note::
+        If storageDir is set, or if maxLen is at least dataseries.TYPED_STORAGE_MIN_LEN, numeric values and datetimes
+        are kept in numpy arrays while possible. Once a value (or datetime) that can't be stored that way gets appended,
+        the values (or datetimes) are moved to an array of objects, which is held in memory even if storageDir is set.
+        Shorter dataseries hold values in lists, which are faster to index.
     """
 
-    def __init__(self, maxLen=None):
+    def __init__(self, maxLen=None, storageDir=None):
         super(SequenceDataSeries, self).__init__()
         maxLen = get_checked_max_len(maxLen)
 
         self.__newValueEvent = observer.Event()
-        self.__values = collections.ListDeque(maxLen)
-        self.__dateTimes = collections.ListDeque(maxLen)
+        self.__values, self.__dateTimes = build_deques(maxLen, storageDir)
+        self.__lastDateTime = None
 
     def __len__(self):
         return len(self.__values)
@@ -100,11 +215,13 @@ class SequenceDataSeries(DataSeries):
 
     def setMaxLen(self, maxLen):
         """Sets the maximum number of values to hold and resizes accordingly if necessary."""
+        if self.getMaxLen() is None:
+            raise Exception("Dataseries backed by files are unbounded and can't be resized")
         self.__values.resize(maxLen)
         self.__dateTimes.resize(maxLen)
 
     def getMaxLen(self):
-        """Returns the maximum number of values to hold."""
+        """Returns the maximum number of values to hold, or None if the dataseries is unbounded."""
         return self.__values.getMaxLen()
 
     # Event handler receives:
@@ -132,14 +249,77 @@ class SequenceDataSeries(DataSeries):
             If dateTime is not None, it must be greater than the last one.
         """
 
-        if dateTime is not None and len(self.__dateTimes) != 0 and self.__dateTimes[-1] >= dateTime:
+        if dateTime is not None and self.__lastDateTime is not None and self.__lastDateTime >= dateTime:
             raise Exception("Invalid datetime. It must be bigger than that last one")
 
-        assert(len(self.__values) == len(self.__dateTimes))
         self.__dateTimes.append(dateTime)
         self.__values.append(value)
+        if dateTime is not None:
+            self.__lastDateTime = dateTime
 
-        self.getNewValueEvent().emit(self, dateTime, value)
+        # Most dataseries have no subscribers, so skip emitting in that case.
+        newValueEvent = self.getNewValueEvent()
+        if newValueEvent.hasSubscribers():
+            newValueEvent.emit(self, dateTime, value)
 
     def getDateTimes(self):
         return self.__dateTimes.data()
+
+    def getIndexAt(self, dateTime, side="left"):
+        """Returns the position where a datetime would be inserted to keep datetimes sorted, like
+        :func:`numpy.searchsorted`. This is a binary search, so it takes O(log n).
+
+        :param dateTime: The datetime to look for.
+        :type dateTime: :class:`datetime.datetime`.
+        :param side: If "left", the position of the first datetime that is greater than or equal to dateTime is
+            returned. If "right", the position of the first datetime that is greater than dateTime is returned.
+        :type side: string.
+
+        .. note::
+            If there are no such datetimes, the length of the dataseries is returned.
+        """
+        return datetime_deque_search(self.__dateTimes, dateTime, side)
+
+    def valueAt(self, dateTime, asof=True):
+        """Returns the value for a given datetime, or None if there is no such value.
+
+        :param dateTime: The datetime to look for.
+        :type dateTime: :class:`datetime.datetime`.
+        :param asof: If True, the value for the last datetime that is lower than or equal to dateTime is returned.
+            If False, the value is returned only if there is one for that exact datetime.
+        :type asof: boolean.
+        """
+        ret = None
+        end = self.getIndexAt(dateTime, "right")
+        # If asof is False, there has to be at least one datetime equal to dateTime.
+        if end > 0 and (asof or self.getIndexAt(dateTime, "left") < end):
+            ret = self[end - 1]
+        return ret
+
+    def sliceByDate(self, fromDateTime=None, toDateTime=None):
+        """Returns a list with the values whose datetimes are within a given range.
+
+        :param fromDateTime: The first datetime (included). If None, values are returned from the beginning.
+        :type fromDateTime: :class:`datetime.datetime`.
+        :param toDateTime: The last datetime (included). If None, values are returned up to the end.
+        :type toDateTime: :class:`datetime.datetime`.
+        """
+        start = None
+        end = None
+        if fromDateTime is not None:
+            start = self.getIndexAt(fromDateTime, "left")
+        if toDateTime is not None:
+            end = self.getIndexAt(toDateTime, "right")
+        return self[start:end]
+
+    def asarray(self, start=None, end=None):
+        ret = deque_to_numpy(self.__values, start, end)
+        if ret is None:
+            ret = super(SequenceDataSeries, self).asarray(start, end)
+        return ret
+
+    def getDateTimesAsArray(self, start=None, end=None):
+        ret = datetime_deque_to_numpy(self.__dateTimes, start, end)
+        if ret is None:
+            ret = super(SequenceDataSeries, self).getDateTimesAsArray(start, end)
+        return ret
@@ -18,6 +18,8 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import bisect
+
 from pyalgotrade import dataseries
 
 
@@ -51,17 +53,13 @@ class Syncer(object):
         sourceDS2.getNewValueEvent().subscribe(self.__onNewValue2)
         # Source dataseries will keep a reference to self and that will prevent from getting this destroyed.
 
-    # Scan backwards for the position of dateTime in ds.
+    # Binary search for the position of dateTime in values, which are sorted by datetime.
     def __findPosForDateTime(self, values, dateTime):
         ret = None
-        i = len(values) - 1
-        while i >= 0:
-            if values[i][0] == dateTime:
-                ret = i
-                break
-            elif values[i][0] < dateTime:
-                break
-            i -= 1
+        # (dateTime,) sorts before any (dateTime, value) tuple, so this is the first position for dateTime.
+        i = bisect.bisect_left(values, (dateTime,))
+        if i < len(values) and values[i][0] == dateTime:
+            ret = i
         return ret
 
     def __onNewValue1(self, dataSeries, dateTime, value):
@@ -19,6 +19,9 @@
 """
 
 from pyalgotrade import dataseries
+from pyalgotrade import observer
+from pyalgotrade import bar
+from pyalgotrade.utils import collections
 
 
 class BarDataSeries(dataseries.SequenceDataSeries):
@@ -107,3 +110,275 @@ class BarDataSeries(dataseries.SequenceDataSeries):
     def getExtraDataSeries(self, name):
         """Returns a :class:`pyalgotrade.dataseries.DataSeries` for an extra column."""
         return self.__getOrCreateExtraDS(name)
+
+
+class ColumnDataSeries(dataseries.DataSeries):
+    """A read only :class:`pyalgotrade.dataseries.DataSeries` over one of the columns of a
+    :class:`ColumnarBarDataSeries`. Values are not copied.
+
+    .. note::
+        This class should not be instantiated directly.
+    """
+
+    def __init__(self, barDataSeries, values):
+        super(ColumnDataSeries, self).__init__()
+        self.__barDataSeries = barDataSeries
+        self.__values = values
+        self.__newValueEvent = observer.Event()
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, key):
+        return self.__values[key]
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold."""
+        return self.__values.getMaxLen()
+
+    def getNewValueEvent(self):
+        return self.__newValueEvent
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self.__values):
+            ret = self.__values[pos]
+        return ret
+
+    def getDateTimes(self):
+        return self.__barDataSeries.getDateTimes()
+
+    def asarray(self, start=None, end=None):
+        ret = dataseries.deque_to_numpy(self.__values, start, end)
+        if ret is None:
+            ret = super(ColumnDataSeries, self).asarray(start, end)
+        return ret
+
+    def getDateTimesAsArray(self, start=None, end=None):
+        return self.__barDataSeries.getDateTimesAsArray(start, end)
+
+
+class ColumnarBarDataSeries(BarDataSeries):
+    """A :class:`BarDataSeries` that holds the bar values in columns instead of holding :class:`pyalgotrade.bar.Bar`
+    instances. The open, high, low, close, volume, adjusted close and extra values are kept in parallel columns that
+    share a single datetime column, and the :class:`pyalgotrade.bar.BasicBar` instances are only built when the
+    dataseries is indexed.
+
+    :param maxLen: The maximum number of values to hold.
+        Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
+        opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
+    :type maxLen: int.
+    :param storageDir: If set, the dataseries is unbounded (maxLen is ignored) and the columns are kept in memory
+        mapped temporary files created in this directory.
+    :type storageDir: string.
+
+    .. note::
+        * The dataseries returned by getOpenDataSeries(), getCloseDataSeries(), etc. are views over the columns.
+        * Bars are rebuilt as :class:`pyalgotrade.bar.BasicBar` instances, so any other
+          :class:`pyalgotrade.bar.Bar` subclass, and identity, is lost. The last bar appended is the only exception.
+    """
+
+    def __init__(self, maxLen=None, storageDir=None):
+        # BarDataSeries.__init__ is not called on purpose since it would allocate storage for the bars and for every
+        # column that would never be used. Every method in SequenceDataSeries and BarDataSeries that depends on that
+        # storage is overridden.
+        dataseries.DataSeries.__init__(self)
+        maxLen = dataseries.get_checked_max_len(maxLen)
+
+        self.__newValueEvent = observer.Event()
+        self.__storageDir = storageDir
+        # All the columns built upfront share a single file.
+        self.__memMapFile = self.__buildMemMapFile()
+        self.__dateTimes = collections.AdaptiveDeque(collections.DateTimeDeque(maxLen, self.__memMapFile))
+        self.__open = self.__buildColumn(0)
+        self.__high = self.__buildColumn(0)
+        self.__low = self.__buildColumn(0)
+        self.__close = self.__buildColumn(0)
+        self.__volume = self.__buildColumn(0)
+        self.__adjClose = self.__buildColumn(0)
+        self.__frequency = self.__buildColumn(0)
+        self.__openDS = ColumnDataSeries(self, self.__open)
+        self.__highDS = ColumnDataSeries(self, self.__high)
+        self.__lowDS = ColumnDataSeries(self, self.__low)
+        self.__closeDS = ColumnDataSeries(self, self.__close)
+        self.__volumeDS = ColumnDataSeries(self, self.__volume)
+        self.__adjCloseDS = ColumnDataSeries(self, self.__adjClose)
+        self.__extraColumns = {}
+        self.__extraDS = {}
+        self.__lastBar = None
+        self.__lastDateTime = None
+        self.__useAdjustedValues = False
+
+    def __buildMemMapFile(self):
+        ret = None
+        if self.__storageDir is not None:
+            ret = collections.MemMapFile(self.__storageDir)
+        return ret
+
+    def __buildColumn(self, size):
+        memMapFile = self.__memMapFile
+        # Columns can't be added to the shared file once bars were appended, so these get a file of their own.
+        if size:
+            memMapFile = self.__buildMemMapFile()
+        ret = collections.AdaptiveDeque(collections.FloatDeque(self.__dateTimes.getMaxLen(), memMapFile))
+        # Values are missing for bars appended before the column was built.
+        for i in xrange(size):
+            ret.append(None)
+        return ret
+
+    def __getOrCreateExtraDS(self, name):
+        ret = self.__extraDS.get(name)
+        if ret is None:
+            values = self.__buildColumn(len(self))
+            ret = ColumnDataSeries(self, values)
+            self.__extraColumns[name] = values
+            self.__extraDS[name] = ret
+        return ret
+
+    def __len__(self):
+        return len(self.__dateTimes)
+
+    def __buildBar(self, pos):
+        extra = {}
+        for name, values in self.__extraColumns.iteritems():
+            value = values[pos]
+            if value is not None:
+                extra[name] = value
+        ret = bar.BasicBar(
+            self.__dateTimes[pos],
+            self.__open[pos],
+            self.__high[pos],
+            self.__low[pos],
+            self.__close[pos],
+            self.__volume[pos],
+            self.__adjClose[pos],
+            self.__frequency[pos],
+            extra
+        )
+        ret.setUseAdjustedValue(self.__useAdjustedValues)
+        return ret
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.__getitem__(pos) for pos in xrange(*key.indices(len(self)))]
+        # Raise IndexError for invalid positions, just like a list.
+        self.__dateTimes[key]
+        if key < 0:
+            key += len(self)
+        if key == len(self) - 1:
+            return self.__lastBar
+        return self.__buildBar(key)
+
+    def setMaxLen(self, maxLen):
+        """Sets the maximum number of values to hold and resizes accordingly if necessary."""
+        if self.getMaxLen() is None:
+            raise Exception("Dataseries backed by files are unbounded and can't be resized")
+        for values in [
+            self.__dateTimes, self.__open, self.__high, self.__low, self.__close, self.__volume, self.__adjClose,
+            self.__frequency
+        ] + self.__extraColumns.values():
+            values.resize(maxLen)
+
+    def getMaxLen(self):
+        """Returns the maximum number of values to hold, or None if the dataseries is unbounded."""
+        return self.__dateTimes.getMaxLen()
+
+    def getNewValueEvent(self):
+        return self.__newValueEvent
+
+    def getValueAbsolute(self, pos):
+        ret = None
+        if pos >= 0 and pos < len(self):
+            ret = self[pos]
+        return ret
+
+    def getDateTimes(self):
+        return self.__dateTimes.data()
+
+    def getIndexAt(self, dateTime, side="left"):
+        return dataseries.datetime_deque_search(self.__dateTimes, dateTime, side)
+
+    def asarray(self, start=None, end=None):
+        # Bars are not numeric, so this behaves like BarDataSeries.asarray.
+        return dataseries.DataSeries.asarray(self, start, end)
+
+    def getDateTimesAsArray(self, start=None, end=None):
+        ret = dataseries.datetime_deque_to_numpy(self.__dateTimes, start, end)
+        if ret is None:
+            ret = dataseries.DataSeries.getDateTimesAsArray(self, start, end)
+        return ret
+
+    def setUseAdjustedValues(self, useAdjusted):
+        self.__useAdjustedValues = useAdjusted
+
+    def append(self, bar):
+        self.appendWithDateTime(bar.getDateTime(), bar)
+
+    def appendWithDateTime(self, dateTime, bar):
+        assert(dateTime is not None)
+        assert(bar is not None)
+        bar.setUseAdjustedValue(self.__useAdjustedValues)
+
+        if self.__lastDateTime is not None and self.__lastDateTime >= dateTime:
+            raise Exception("Invalid datetime. It must be bigger than that last one")
+
+        extra = bar.getExtraColumns()
+        for name in extra.iterkeys():
+            self.__getOrCreateExtraDS(name)
+
+        self.__dateTimes.append(dateTime)
+        self.__lastDateTime = dateTime
+        self.__lastBar = bar
+        columns = [
+            (self.__open, self.__openDS, bar.getOpen()),
+            (self.__close, self.__closeDS, bar.getClose()),
+            (self.__high, self.__highDS, bar.getHigh()),
+            (self.__low, self.__lowDS, bar.getLow()),
+            (self.__volume, self.__volumeDS, bar.getVolume()),
+            (self.__adjClose, self.__adjCloseDS, bar.getAdjClose()),
+        ]
+        for name, value in extra.iteritems():
+            columns.append((self.__extraColumns[name], self.__extraDS[name], value))
+        self.__frequency.append(bar.getFrequency())
+        for values, ds, value in columns:
+            values.append(value)
+        # Extra columns that are missing in this bar get None so all columns stay aligned.
+        for name, values in self.__extraColumns.iteritems():
+            if name not in extra:
+                values.append(None)
+
+        # All columns are appended before emitting any event, since bars are built from every column. Events are
+        # emitted in the same order as in BarDataSeries, and not for the extra columns missing in this bar.
+        if self.__newValueEvent.hasSubscribers():
+            self.__newValueEvent.emit(self, dateTime, bar)
+        for values, ds, value in columns:
+            newValueEvent = ds.getNewValueEvent()
+            if newValueEvent.hasSubscribers():
+                newValueEvent.emit(ds, dateTime, value)
+
+    def getOpenDataSeries(self):
+        return self.__openDS
+
+    def getCloseDataSeries(self):
+        return self.__closeDS
+
+    def getHighDataSeries(self):
+        return self.__highDS
+
+    def getLowDataSeries(self):
+        return self.__lowDS
+
+    def getVolumeDataSeries(self):
+        return self.__volumeDS
+
+    def getAdjCloseDataSeries(self):
+        return self.__adjCloseDS
+
+    def getPriceDataSeries(self):
+        if self.__useAdjustedValues:
+            return self.__adjCloseDS
+        else:
+            return self.__closeDS
+
+    def getExtraDataSeries(self, name):
+        return self.__getOrCreateExtraDS(name)
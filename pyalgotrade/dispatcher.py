@@ -18,19 +18,268 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
-from pyalgotrade import utils
+import errno
+import heapq
+import os
+import select
+import threading
+import time
+import Queue
+
 from pyalgotrade import observer
 from pyalgotrade import dispatchprio
 
 
+class SubjectMetrics(object):
+    """Dispatch metrics for a single subject.
+
+    .. note::
+        This class should not be instantiated directly. Use :meth:`Metrics.getSubjectMetrics` instead.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__dispatches = 0
+        self.__events = 0
+        self.__totalTime = 0
+        self.__maxTime = 0
+
+    def update(self, eventsDispatched, elapsed):
+        self.__dispatches += 1
+        if eventsDispatched:
+            self.__events += 1
+        self.__totalTime += elapsed
+        self.__maxTime = max(self.__maxTime, elapsed)
+
+    def getName(self):
+        """Returns the name of the subject, built from its class name."""
+        return self.__name
+
+    def getDispatchCount(self):
+        """Returns the number of times the subject was dispatched."""
+        return self.__dispatches
+
+    def getEventCount(self):
+        """Returns the number of times the subject dispatched events."""
+        return self.__events
+
+    def getIdleCount(self):
+        """Returns the number of times the subject was dispatched but had no events."""
+        return self.__dispatches - self.__events
+
+    def getTotalTime(self):
+        """Returns the cumulative wall time, in seconds, spent in the subject's dispatch method."""
+        return self.__totalTime
+
+    def getMaxTime(self):
+        """Returns the maximum wall time, in seconds, spent in a single call to the subject's dispatch method."""
+        return self.__maxTime
+
+
+class Metrics(object):
+    """Dispatch metrics collected by a :class:`Dispatcher` while running.
+
+    .. note::
+        This class should not be instantiated directly. Use :meth:`Dispatcher.getMetrics` instead.
+    """
+
+    def __init__(self):
+        self.__subjectMetrics = {}
+        self.__subjects = []
+        self.__iterations = 0
+        self.__idleIterations = 0
+        self.__beginTime = None
+        self.__endTime = None
+
+    def onBegin(self):
+        self.__beginTime = time.time()
+        self.__endTime = None
+
+    def onEnd(self):
+        self.__endTime = time.time()
+
+    def onIteration(self, eventsDispatched):
+        self.__iterations += 1
+        if not eventsDispatched:
+            self.__idleIterations += 1
+
+    def dispatchSubject(self, subject):
+        ret = self.getSubjectMetrics(subject)
+        if ret is None:
+            ret = SubjectMetrics("%s_%d" % (type(subject).__name__, len(self.__subjects) + 1))
+            self.__subjectMetrics[subject] = ret
+            self.__subjects.append(subject)
+
+        begin = time.time()
+        eventsDispatched = subject.dispatch() is True
+        ret.update(eventsDispatched, time.time() - begin)
+        return eventsDispatched
+
+    def getSubjectMetrics(self, subject):
+        """Returns a :class:`SubjectMetrics` for a given subject, or None if the subject was never dispatched."""
+        return self.__subjectMetrics.get(subject)
+
+    def getSubjects(self):
+        """Returns the subjects that were dispatched, in the order they were first dispatched."""
+        return self.__subjects
+
+    def getIterations(self):
+        """Returns the number of iterations in the dispatch loop."""
+        return self.__iterations
+
+    def getIdleIterations(self):
+        """Returns the number of iterations in the dispatch loop where no events were dispatched."""
+        return self.__idleIterations
+
+    def getWallTime(self):
+        """Returns the wall time, in seconds, of the dispatch loop."""
+        ret = 0
+        if self.__beginTime is not None:
+            endTime = self.__endTime
+            if endTime is None:
+                endTime = time.time()
+            ret = endTime - self.__beginTime
+        return ret
+
+    def getEventsPerSecond(self, subject=None):
+        """Returns the number of events dispatched per second of wall time.
+
+        :param subject: The subject to calculate the events per second for. If None, events from all subjects are
+            considered.
+        """
+        if subject is None:
+            events = sum([subjectMetrics.getEventCount() for subjectMetrics in self.__subjectMetrics.itervalues()])
+        else:
+            subjectMetrics = self.getSubjectMetrics(subject)
+            events = subjectMetrics.getEventCount() if subjectMetrics is not None else 0
+
+        ret = 0
+        wallTime = self.getWallTime()
+        if wallTime > 0:
+            ret = events / float(wallTime)
+        return ret
+
+    def getSummary(self):
+        """Returns a string with a summary of the metrics."""
+        lines = [
+            "Dispatcher: %.3f seconds, %d iterations (%d idle), %.1f events/sec" % (
+                self.getWallTime(), self.getIterations(), self.getIdleIterations(), self.getEventsPerSecond()
+            )
+        ]
+        for subject in self.__subjects:
+            subjectMetrics = self.__subjectMetrics[subject]
+            lines.append(
+                "%s: %d dispatches (%d idle), %.3f seconds total, %.6f seconds max, %.1f events/sec" % (
+                    subjectMetrics.getName(), subjectMetrics.getDispatchCount(), subjectMetrics.getIdleCount(),
+                    subjectMetrics.getTotalTime(), subjectMetrics.getMaxTime(), self.getEventsPerSecond(subject)
+                )
+            )
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.getSummary()
+
+
+# A Queue.Queue that wakes up a Dispatcher every time an item is put. Realtime subjects that get events from other
+# threads can use this so the dispatcher doesn't need to poll them.
+class NotifyingQueue(Queue.Queue):
+    def __init__(self, maxsize=0):
+        Queue.Queue.__init__(self, maxsize)
+        self.__dispatcher = None
+
+    def setDispatcher(self, dispatcher):
+        self.__dispatcher = dispatcher
+
+    def _put(self, item):
+        Queue.Queue._put(self, item)
+        dispatcher = self.__dispatcher
+        if dispatcher is not None:
+            dispatcher.wakeUp()
+
+
+# Used by the dispatcher to sleep until woken up from another thread. Waiting on a threading.Event with a timeout polls
+# in Python 2, so a pipe and select are used where available. The pipe is created the first time wait is called so
+# dispatchers that never sleep, like the ones used for backtesting, don't use file descriptors.
+class WakeUpSignal(object):
+    def __init__(self):
+        self.__signaled = False
+        self.__pipe = None
+        self.__event = None
+        if os.name != "posix":
+            self.__event = threading.Event()
+
+    def __del__(self):
+        if self.__pipe is not None:
+            os.close(self.__pipe[0])
+            os.close(self.__pipe[1])
+
+    def __createPipe(self):
+        import fcntl
+
+        ret = os.pipe()
+        for fd in ret:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        return ret
+
+    # This can be called from any thread.
+    def set(self):
+        if self.__event is not None:
+            self.__event.set()
+        elif not self.__signaled:
+            self.__signaled = True
+            pipe = self.__pipe
+            if pipe is not None:
+                try:
+                    os.write(pipe[1], "x")
+                except OSError, e:
+                    if e.errno != errno.EAGAIN:
+                        raise
+
+    # Waits until set gets called or the timeout expires.
+    def wait(self, timeout):
+        if self.__event is not None:
+            self.__event.wait(timeout)
+            self.__event.clear()
+            return
+
+        if self.__pipe is None:
+            self.__pipe = self.__createPipe()
+        if not self.__signaled:
+            select.select([self.__pipe[0]], [], [], timeout)
+        try:
+            while len(os.read(self.__pipe[0], 4096)):
+                pass
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+        self.__signaled = False
+
+
 # This class is responsible for dispatching events from multiple subjects, synchronizing them if necessary.
+# Non-realtime subjects are kept in a heap keyed by the timestamp of their next event, and they are pushed back after
+# dispatching. This assumes that the next event for a subject only changes when it gets dispatched.
+# Realtime subjects, those with no datetime for the next event, are checked every time. If all of them wake up the
+# dispatcher when new events are available, the dispatcher sleeps while idle instead of polling them.
 class Dispatcher(object):
+    # The maximum number of seconds to sleep while idle. The idle event gets emitted at least this often.
+    IDLE_WAIT_TIMEOUT = 0.1
+
     def __init__(self):
         self.__subjects = []
+        # The position of each subject in self.__subjects, used to dispatch in order.
+        self.__positions = {}
         self.__stop = False
+        self.__running = False
         self.__startEvent = observer.Event()
         self.__idleEvent = observer.Event()
         self.__currDateTime = None
+        # (timestamp, sequence number, subject) tuples for non-realtime subjects. The sequence number is there so
+        # subjects never get compared.
+        self.__scheduledSubjects = []
+        self.__sequenceNumber = 0
+        self.__realtimeSubjects = []
+        self.__metrics = None
+        self.__wakeUpSignal = WakeUpSignal()
 
     # Returns the current event datetime. It may be None for events from realtime subjects.
     def getCurrentDateTime(self):
@@ -44,10 +293,26 @@ class Dispatcher(object):
 
     def stop(self):
         self.__stop = True
+        self.wakeUp()
+
+    # Wakes up the dispatcher if it is sleeping because it was idle. This can be called from any thread.
+    def wakeUp(self):
+        self.__wakeUpSignal.set()
 
     def getSubjects(self):
         return self.__subjects
 
+    # Metrics are collected only when enabled, since timing every dispatch is not free.
+    def setMetricsEnabled(self, enabled):
+        if enabled:
+            self.__metrics = Metrics()
+        else:
+            self.__metrics = None
+
+    # Returns a Metrics instance or None if metrics are not enabled.
+    def getMetrics(self):
+        return self.__metrics
+
     def addSubject(self, subject):
         # Skip the subject if it was already added.
         if subject in self.__subjects:
@@ -64,39 +329,117 @@ class Dispatcher(object):
                     break
                 pos += 1
             self.__subjects.insert(pos, subject)
+        self.__positions = dict((s, pos) for pos, s in enumerate(self.__subjects))
 
         subject.onDispatcherRegistered(self)
+        if self.__running:
+            self.__schedule(subject)
+
+    # Puts a subject in the heap or in the realtime subjects list. Realtime subjects may have more events after hitting
+    # eof (for example, resampled feeds) so subjects only get dropped once they were dispatched as non-realtime.
+    def __schedule(self, subject, dispatched=False):
+        if subject.eof():
+            if not dispatched:
+                self.__realtimeSubjects.append(subject)
+            return
+
+        timestamp = subject.peekTimestamp()
+        if timestamp is None:
+            self.__realtimeSubjects.append(subject)
+        else:
+            heapq.heappush(self.__scheduledSubjects, (timestamp, self.__sequenceNumber, subject))
+            self.__sequenceNumber += 1
 
     # Return True if events were dispatched.
-    def __dispatchSubject(self, subject, currEventDateTime):
+    def __dispatchSubject(self, subject, currEventTimestamp):
         ret = False
-        # Dispatch if the datetime is currEventDateTime of if its a realtime subject.
-        if not subject.eof() and subject.peekDateTime() in (None, currEventDateTime):
-            ret = subject.dispatch() is True
+        # Dispatch if the datetime is currEventTimestamp of if its a realtime subject.
+        if not subject.eof() and subject.peekTimestamp() in (None, currEventTimestamp):
+            if self.__metrics is None:
+                ret = subject.dispatch() is True
+            else:
+                ret = self.__metrics.dispatchSubject(subject)
         return ret
 
     # Returns a tuple with booleans
     # 1: True if all subjects hit eof
     # 2: True if at least one subject dispatched events.
+    # 3: True if all subjects that are not passive will wake up the dispatcher when new events are available.
     def __dispatch(self):
-        smallestDateTime = None
+        # Subjects are synchronized using timestamps, which are cheaper to compare than datetimes.
+        smallestTimestamp = None
         eof = True
         eventsDispatched = False
+        canWait = True
+        subjectsToDispatch = []
 
-        # Scan for the lowest datetime.
-        for subject in self.__subjects:
+        # Realtime subjects are dispatched every time, unless they have a datetime for the next event now.
+        for subject in self.__realtimeSubjects[:]:
             if not subject.eof():
                 eof = False
-                smallestDateTime = utils.safe_min(smallestDateTime, subject.peekDateTime())
+                # Passive subjects, like backtesting brokers used for paper trading, only emit events while other
+                # subjects get dispatched, so they don't need to wake up the dispatcher.
+                if not subject.wakesUpDispatcher() and not subject.isPassive():
+                    canWait = False
+                if subject.peekTimestamp() is None:
+                    subjectsToDispatch.append(subject)
+                else:
+                    self.__realtimeSubjects.remove(subject)
+                    self.__schedule(subject)
 
-        # Dispatch realtime subjects and those subjects with the lowest datetime.
+        # Pop the non-realtime subjects with the lowest timestamp.
+        scheduledSubjects = []
+        if len(self.__scheduledSubjects):
+            eof = False
+            canWait = False
+            smallestTimestamp = self.__scheduledSubjects[0][0]
+            while len(self.__scheduledSubjects) and self.__scheduledSubjects[0][0] == smallestTimestamp:
+                scheduledSubjects.append(heapq.heappop(self.__scheduledSubjects)[2])
+            subjectsToDispatch.extend(scheduledSubjects)
+
+        # Dispatch realtime subjects and those subjects with the lowest timestamp.
         if not eof:
-            self.__currDateTime = smallestDateTime
+            if len(scheduledSubjects):
+                self.__currDateTime = scheduledSubjects[0].peekDateTime()
+            else:
+                self.__currDateTime = None
 
-            for subject in self.__subjects:
-                if self.__dispatchSubject(subject, smallestDateTime):
+            subjectsToDispatch.sort(key=lambda subject: self.__positions[subject])
+            for subject in subjectsToDispatch:
+                if self.__dispatchSubject(subject, smallestTimestamp):
                     eventsDispatched = True
-        return eof, eventsDispatched
+
+            for subject in scheduledSubjects:
+                self.__schedule(subject, True)
+        return eof, eventsDispatched, canWait
+
+    # Returns the subject to drive using __runSingleSubject, or None if there are realtime subjects or more than one
+    # subject that is not passive.
+    def __getSingleSubject(self):
+        ret = None
+        if self.__metrics is None and len(self.__scheduledSubjects) == 1:
+            ret = self.__scheduledSubjects[0][2]
+            for subject in self.__subjects:
+                if subject is not ret and not subject.isPassive():
+                    ret = None
+                    break
+        return ret
+
+    # A faster loop for the common backtesting scenario, where there is a single non-realtime subject and the rest are
+    # passive, like a bar feed and a backtesting broker. There is nothing to synchronize so the subject is dispatched
+    # until it hits eof. If subjects are added or the subject becomes realtime this returns and the regular loop
+    # takes over.
+    def __runSingleSubject(self, subject):
+        heapq.heappop(self.__scheduledSubjects)
+        subjectCount = len(self.__subjects)
+        while not self.__stop and len(self.__subjects) == subjectCount and not subject.eof():
+            dateTime = subject.peekDateTime()
+            if dateTime is None:
+                break
+            self.__currDateTime = dateTime
+            if subject.dispatch() is not True:
+                self.__idleEvent.emit()
+        self.__schedule(subject, True)
 
     def run(self):
         try:
@@ -105,13 +448,32 @@ class Dispatcher(object):
 
             self.__startEvent.emit()
 
+            self.__running = True
+            for subject in self.__subjects:
+                self.__schedule(subject)
+
+            singleSubject = self.__getSingleSubject()
+            if singleSubject is not None:
+                self.__runSingleSubject(singleSubject)
+
+            metrics = self.__metrics
+            if metrics is not None:
+                metrics.onBegin()
             while not self.__stop:
-                eof, eventsDispatched = self.__dispatch()
+                eof, eventsDispatched, canWait = self.__dispatch()
                 if eof:
                     self.__stop = True
-                elif not eventsDispatched:
-                    self.__idleEvent.emit()
+                else:
+                    if metrics is not None:
+                        metrics.onIteration(eventsDispatched)
+                    if not eventsDispatched:
+                        self.__idleEvent.emit()
+                        if canWait and not self.__stop:
+                            self.__wakeUpSignal.wait(Dispatcher.IDLE_WAIT_TIMEOUT)
         finally:
+            if self.__metrics is not None:
+                self.__metrics.onEnd()
+            self.__running = False
             for subject in self.__subjects:
                 subject.stop()
             for subject in self.__subjects:
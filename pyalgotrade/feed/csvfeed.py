@@ -19,7 +19,6 @@
 """
 
 import abc
-import datetime
 
 from pyalgotrade.utils import dt
 from pyalgotrade.utils import csvutils
@@ -98,19 +97,21 @@ class BaseFeed(memfeed.MemFeed):
 class BasicRowParser(RowParser):
     def __init__(self, dateTimeColumn, dateTimeFormat, converter, delimiter=",", timezone=None):
         self.__dateTimeColumn = dateTimeColumn
-        self.__dateTimeFormat = dateTimeFormat
+        self.__parseDateTime = dt.get_datetime_parser(dateTimeFormat)
         self.__converter = converter
         self.__delimiter = delimiter
-        self.__timezone = timezone
+        self.__localizer = None
+        if timezone is not None:
+            self.__localizer = dt.Localizer(timezone)
         self.__timeDelta = None
 
     def parseRow(self, csvRowDict):
-        dateTime = datetime.datetime.strptime(csvRowDict[self.__dateTimeColumn], self.__dateTimeFormat)
+        dateTime = self.__parseDateTime(csvRowDict[self.__dateTimeColumn])
         # Localize the datetime if a timezone was given.
-        if self.__timezone is not None:
+        if self.__localizer is not None:
             if self.__timeDelta is not None:
                 dateTime += self.__timeDelta
-            dateTime = dt.localize(dateTime, self.__timezone)
+            dateTime = self.__localizer.localize(dateTime)
         # Convert the values
         values = {}
         for key, value in csvRowDict.items():
@@ -21,47 +21,31 @@
 import abc
 
 from pyalgotrade import dispatchprio
+from pyalgotrade.utils import dt
 
 
 class Event(object):
     def __init__(self):
         self.__handlers = []
-        self.__toSubscribe = []
-        self.__toUnsubscribe = []
-        self.__emitting = False
-
-    def __applyChanges(self):
-        if len(self.__toSubscribe):
-            for handler in self.__toSubscribe:
-                if handler not in self.__handlers:
-                    self.__handlers.append(handler)
-            self.__toSubscribe = []
-
-        if len(self.__toUnsubscribe):
-            for handler in self.__toUnsubscribe:
-                self.__handlers.remove(handler)
-            self.__toUnsubscribe = []
+        # An immutable copy of the handlers that is rebuilt when subscriptions change. Since emit iterates over it,
+        # handlers subscribed or unsubscribed while emitting only take effect on the next emission.
+        self.__handlersToEmit = ()
 
     def subscribe(self, handler):
-        if self.__emitting:
-            self.__toSubscribe.append(handler)
-        elif handler not in self.__handlers:
+        if handler not in self.__handlers:
             self.__handlers.append(handler)
+            self.__handlersToEmit = tuple(self.__handlers)
 
     def unsubscribe(self, handler):
-        if self.__emitting:
-            self.__toUnsubscribe.append(handler)
-        else:
-            self.__handlers.remove(handler)
+        self.__handlers.remove(handler)
+        self.__handlersToEmit = tuple(self.__handlers)
+
+    def hasSubscribers(self):
+        return len(self.__handlersToEmit) > 0
 
     def emit(self, *args, **kwargs):
-        try:
-            self.__emitting = True
-            for handler in self.__handlers:
-                handler(*args, **kwargs)
-        finally:
-            self.__emitting = False
-            self.__applyChanges()
+        for handler in self.__handlersToEmit:
+            handler(*args, **kwargs)
 
 
 class Subject(object):
@@ -102,6 +86,26 @@ class Subject(object):
         # Return None since this is a realtime subject.
         raise NotImplementedError()
 
+    def peekTimestamp(self):
+        # Return the datetime for the next event as the number of microseconds since the epoch (UTC), or None for
+        # realtime subjects.
+        # The dispatcher uses this to synchronize subjects. Subjects that already hold timestamps should override this
+        # to avoid building datetimes.
+        ret = self.peekDateTime()
+        if ret is not None:
+            ret = dt.datetime_to_microseconds(ret)
+        return ret
+
+    def isPassive(self):
+        # Return True if this subject never dispatches events on its own, because all of its events are emitted while
+        # other subjects get dispatched. The dispatcher may skip dispatching passive subjects.
+        return False
+
+    def wakesUpDispatcher(self):
+        # Return True if this realtime subject calls Dispatcher.wakeUp (from any thread) whenever there are new events
+        # to dispatch. If all subjects do so, the dispatcher sleeps while idle instead of polling them.
+        return False
+
     def getDispatchPriority(self):
         # Returns a priority used to sort subjects within the dispatch queue.
         # The return value should never change once this subject is added to the dispatcher.
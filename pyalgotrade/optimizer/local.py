@@ -25,6 +25,7 @@ import random
 import socket
 import threading
 
+from pyalgotrade.barfeed import sharedmembf
 from pyalgotrade.optimizer import base
 from pyalgotrade.optimizer import server
 from pyalgotrade.optimizer import worker
@@ -42,8 +43,14 @@ class ServerThread(threading.Thread):
         self.__results = self.__server.serve()
 
 
-def worker_process(strategyClass, port, logLevel):
+def worker_process(strategyClass, port, logLevel, barStore=None):
     class Worker(worker.Worker):
+        def getBarFeedFactory(self):
+            # Use the bars in shared memory instead of getting a copy from the server.
+            if barStore is not None:
+                return lambda: sharedmembf.BarFeed(barStore)
+            return super(Worker, self).getBarFeedFactory()
+
         def runStrategy(self, barFeed, *args, **kwargs):
             strat = strategyClass(barFeed, *args, **kwargs)
             strat.run()
@@ -78,7 +85,19 @@ def wait_process(p):
         p.join(timeout)
 
 
-def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=logging.ERROR):
+# Returns a SharedBarStore with the bars from the feed, or None if the bars can't be shared. In that case the feed is
+# reset so the bars can be served as usual.
+def build_shared_bar_store(barFeed):
+    logger.info("Loading bars into shared memory")
+    try:
+        return sharedmembf.SharedBarStore(barFeed)
+    except Exception, e:
+        logger.warning("Bars can't be shared, they will be sent to every worker instead: %s" % (e))
+        barFeed.reset()
+        return None
+
+
+def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=logging.ERROR, useSharedMemory=False):
     """Executes many instances of a strategy in parallel and finds the parameters that yield the best results.
 
     :param strategyClass: The strategy class.
@@ -89,7 +108,17 @@ def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=l
     :param workerCount: The number of strategies to run in parallel. If None then as many workers as CPUs are used.
     :type workerCount: int.
     :param logLevel: The log level. Defaults to **logging.ERROR**.
+    :param useSharedMemory: True to load the bars once into a
+        :class:`pyalgotrade.barfeed.sharedmembf.SharedBarStore` shared by all workers, instead of sending a copy of the
+        bars to every worker. Only used where worker processes are forked. If the bars can't be shared, they are sent
+        to the workers as usual.
+    :type useSharedMemory: boolean.
     :rtype: A :class:`Results` instance with the best results found.
+
+    .. note::
+        With shared memory, workers get :class:`pyalgotrade.bar.BasicBar` instances with prices and volumes as floats,
+        regardless of the bars in the feed. Check :class:`pyalgotrade.barfeed.sharedmembf.SharedBarStore` for the
+        limitations and the memory it takes.
     """
 
     assert(workerCount is None or workerCount > 0)
@@ -104,6 +133,13 @@ def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=l
 
     # Build and start the server thread before the worker processes.
     # We'll manually stop the server once workers have finished.
+    # If worker processes are forked, bars can be loaded once into shared memory and every worker uses that same copy.
+    barStore = None
+    if useSharedMemory and hasattr(os, "fork"):
+        barStore = build_shared_bar_store(barFeed)
+        if barStore is not None:
+            barFeed = sharedmembf.BarFeed(barStore)
+
     paramSource = base.ParameterSource(strategyParameters)
     resultSinc = base.ResultSinc()
     srv = xmlrpcserver.Server(paramSource, resultSinc, barFeed, "localhost", port, False)
@@ -115,7 +151,7 @@ def run(strategyClass, barFeed, strategyParameters, workerCount=None, logLevel=l
         for i in range(workerCount):
             workers.append(multiprocessing.Process(
                 target=worker_process,
-                args=(strategyClass, port, logLevel))
+                args=(strategyClass, port, logLevel, barStore))
             )
 
         logger.info("Executing workers")
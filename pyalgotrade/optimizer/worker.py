@@ -81,13 +81,19 @@ class Worker(object):
         workerName = pickle.dumps(self.__workerName)
         call_and_retry_on_network_error(self.__server.pushJobResults, 10, jobId, result, parameters, workerName)
 
-    def __processJob(self, job, barsFreq, instruments, bars):
+    # Returns a function that builds a new feed, with the bars supplied by the server, every time it gets called.
+    def getBarFeedFactory(self):
+        instruments, bars = self.getInstrumentsAndBars()
+        barsFreq = self.getBarsFrequency()
+        return lambda: barfeed.OptimizerBarFeed(barsFreq, instruments, bars)
+
+    def __processJob(self, job, barFeedFactory):
         bestResult = None
         parameters = job.getNextParameters()
         bestParams = parameters
         while parameters is not None:
             # Wrap the bars into a feed.
-            feed = barfeed.OptimizerBarFeed(barsFreq, instruments, bars)
+            feed = barFeedFactory()
             # Run the strategy.
             self.getLogger().info("Running strategy with parameters %s" % (str(parameters)))
             result = None
@@ -113,13 +119,12 @@ class Worker(object):
         try:
             self.getLogger().info("Started running")
             # Get the instruments and bars.
-            instruments, bars = self.getInstrumentsAndBars()
-            barsFreq = self.getBarsFrequency()
+            barFeedFactory = self.getBarFeedFactory()
 
             # Process jobs
             job = self.getNextJob()
             while job is not None:
-                self.__processJob(job, barsFreq, instruments, bars)
+                self.__processJob(job, barFeedFactory)
                 job = self.getNextJob()
             self.getLogger().info("Finished running")
         except Exception, e:
@@ -90,6 +90,14 @@ class Server(SimpleXMLRPCServer.SimpleXMLRPCServer):
         self.register_function(self.pushJobResults, 'pushJobResults')
 
     def getInstrumentsAndBars(self):
+        # Bars are loaded when the first worker asks for them, since workers may get them in some other way.
+        if self.__instrumentsAndBars is None:
+            logger.info("Loading bars")
+            loadedBars = []
+            for dateTime, bars in self.__barFeed:
+                loadedBars.append(bars)
+            instruments = self.__barFeed.getRegisteredInstruments()
+            self.__instrumentsAndBars = pickle.dumps((instruments, loadedBars))
         return self.__instrumentsAndBars
 
     def getBarsFrequency(self):
@@ -145,13 +153,6 @@ class Server(SimpleXMLRPCServer.SimpleXMLRPCServer):
 
     def serve(self):
         try:
-            # Initialize instruments, bars and parameters.
-            logger.info("Loading bars")
-            loadedBars = []
-            for dateTime, bars in self.__barFeed:
-                loadedBars.append(bars)
-            instruments = self.__barFeed.getRegisteredInstruments()
-            self.__instrumentsAndBars = pickle.dumps((instruments, loadedBars))
             self.__barsFreq = self.__barFeed.getFrequency()
 
             if self.__autoStopThread:
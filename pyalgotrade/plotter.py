@@ -18,6 +18,7 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import bisect
 import collections
 
 import broker
@@ -36,21 +37,16 @@ def get_last_value(dataSeries):
     return ret
 
 
+# Returns a sorted list with the datetimes that are within fromDate and toDate (both included).
 def _filter_datetimes(dateTimes, fromDate=None, toDate=None):
-    class DateTimeFilter(object):
-        def __init__(self, fromDate=None, toDate=None):
-            self.__fromDate = fromDate
-            self.__toDate = toDate
-
-        def includeDateTime(self, dateTime):
-            if self.__toDate and dateTime > self.__toDate:
-                return False
-            if self.__fromDate and dateTime < self.__fromDate:
-                return False
-            return True
-
-    dateTimeFilter = DateTimeFilter(fromDate, toDate)
-    return filter(lambda x: dateTimeFilter.includeDateTime(x), dateTimes)
+    ret = sorted(dateTimes)
+    start = 0
+    end = len(ret)
+    if fromDate:
+        start = bisect.bisect_left(ret, fromDate)
+    if toDate:
+        end = bisect.bisect_right(ret, toDate)
+    return ret[start:end]
 
 
 def _post_plot_fun(subPlot, mplSubplot):
@@ -403,7 +399,6 @@ class StrategyPlotter(object):
 
     def __buildFigureImpl(self, fromDateTime=None, toDateTime=None, postPlotFun=_post_plot_fun):
         dateTimes = _filter_datetimes(self.__dateTimes, fromDateTime, toDateTime)
-        dateTimes.sort()
 
         subplots = []
         subplots.extend(self.__barSubplots.values())
@@ -46,7 +46,7 @@ class IntraDayRange(TimeRange):
         assert frequency > 1
         assert frequency < bar.Frequency.DAY
 
-        ts = int(dt.datetime_to_timestamp(dateTime))
+        ts = int(dt.datetime_to_microseconds(dateTime) / 1000000.0)
         slot = int(ts / frequency)
         slotTs = slot * frequency
         self.__begin = dt.timestamp_to_datetime(slotTs, not dt.datetime_is_naive(dateTime))
@@ -210,12 +210,15 @@ class Returns(stratanalyzer.StrategyAnalyzer):
         Once a bounded length is full, when new items are added, a corresponding number of items are discarded from the
         opposite end. If None then dataseries.DEFAULT_MAX_LEN is used.
     :type maxLen: int.
+    :param storageDir: If set, the dataseries are unbounded (maxLen is ignored) and kept in memory mapped temporary
+        files created in this directory.
+    :type storageDir: string.
     """
 
-    def __init__(self, maxLen=None):
+    def __init__(self, maxLen=None, storageDir=None):
         super(Returns, self).__init__()
-        self.__netReturns = dataseries.SequenceDataSeries(maxLen=maxLen)
-        self.__cumReturns = dataseries.SequenceDataSeries(maxLen=maxLen)
+        self.__netReturns = dataseries.SequenceDataSeries(maxLen=maxLen, storageDir=storageDir)
+        self.__cumReturns = dataseries.SequenceDataSeries(maxLen=maxLen, storageDir=storageDir)
 
     def beforeAttach(self, strat):
         # Get or create a shared ReturnsAnalyzerBase
@@ -508,9 +508,17 @@ class BaseStrategy(object):
         self.__barsProcessedEvent.emit(self, bars)
 
     def run(self):
-        """Call once (**and only once**) to run the strategy."""
+        """Call once (**and only once**) to run the strategy.
+
+        If dispatcher metrics were enabled, using getDispatcher().setMetricsEnabled(True), a summary is logged once
+        the strategy finishes running.
+        """
         self.__dispatcher.run()
 
+        metrics = self.__dispatcher.getMetrics()
+        if metrics is not None:
+            self.info(metrics.getSummary())
+
         if self.__barFeed.getCurrentBars() is not None:
             self.onFinish(self.__barFeed.getCurrentBars())
         else:
@@ -26,11 +26,14 @@ import numpy
 def value_ds_to_numpy(ds, count):
     ret = None
     try:
-        values = ds[count*-1:]
-        ret = numpy.array([float(value) for value in values])
+        values = ds.asarray(count*-1)
+        # None values are returned as NaN, but NaN values are passed to TA-Lib, so check which ones these are.
+        if not numpy.isnan(values).any() or None not in ds[count*-1:]:
+            # The array is copied since it may be a read-only view into the dataseries.
+            ret = numpy.array(values)
     except IndexError:
         pass
-    except TypeError:  # In case we try to convert None to float.
+    except (TypeError, ValueError):  # In case we try to convert a non numeric value to float.
         pass
     return ret
 
@@ -21,6 +21,7 @@
 import os
 
 from pyalgotrade import dispatcher
+from pyalgotrade.barfeed import binaryfeed
 from pyalgotrade.dataseries import resampled
 
 
@@ -56,17 +57,12 @@ class CSVFileWriter(object):
         self.__file.close()
 
 
-def resample_impl(barFeed, frequency, csvFile):
-    instruments = barFeed.getRegisteredInstruments()
-    if len(instruments) != 1:
-        raise Exception("Only barfeeds with 1 instrument can be resampled")
-
-    csvWriter = CSVFileWriter(csvFile)
-
+# Resamples the bars for the only instrument in barFeed and writes them using writer.
+def resample_bars(barFeed, frequency, writer):
     def on_bar(ds, dateTime, value):
-        csvWriter.writeBar(value)
+        writer.writeBar(value)
 
-    insrumentDS = barFeed[instruments[0]]
+    insrumentDS = barFeed[barFeed.getRegisteredInstruments()[0]]
     resampledDS = resampled.ResampledBarDataSeries(insrumentDS, frequency)
     resampledDS.getNewValueEvent().subscribe(on_bar)
 
@@ -77,6 +73,15 @@ def resample_impl(barFeed, frequency, csvFile):
     resampledDS.pushLast()
 
 
+def resample_impl(barFeed, frequency, csvFile):
+    instruments = barFeed.getRegisteredInstruments()
+    if len(instruments) != 1:
+        raise Exception("Only barfeeds with 1 instrument can be resampled")
+
+    csvWriter = CSVFileWriter(csvFile)
+    resample_bars(barFeed, frequency, csvWriter)
+
+
 def resample_to_csv(barFeed, frequency, csvFile):
     """Resample a BarFeed into a CSV file grouping bars by a certain frequency.
     The resulting file can be loaded using :class:`pyalgotrade.barfeed.csvfeed.GenericBarFeed`.
@@ -104,3 +109,29 @@ def resample_to_csv(barFeed, frequency, csvFile):
 
     assert frequency > 0, "Invalid frequency"
     resample_impl(barFeed, frequency, csvFile)
+
+
+def resample_to_binary(barFeed, frequency, path):
+    """Resample a BarFeed into a bar file grouping bars by a certain frequency.
+    The resulting file can be loaded using :class:`pyalgotrade.barfeed.binaryfeed.Feed`.
+
+    :param barFeed: The bar feed that will provide the bars. It should only hold bars from a single instrument.
+    :type barFeed: :class:`pyalgotrade.barfeed.BarFeed`
+    :param frequency: The grouping frequency in seconds. Must be > 0.
+    :param path: The path to the bar file to write. If the file already exists, bars are appended to it.
+    :type path: string.
+
+    .. note::
+        * Supported resampling frequencies are the same ones as in :func:`resample_to_csv`.
+    """
+
+    assert frequency > 0, "Invalid frequency"
+    instruments = barFeed.getRegisteredInstruments()
+    if len(instruments) != 1:
+        raise Exception("Only barfeeds with 1 instrument can be resampled")
+
+    writer = binaryfeed.BarFileWriter(path, instruments[0], frequency)
+    try:
+        resample_bars(barFeed, frequency, writer)
+    finally:
+        writer.close()
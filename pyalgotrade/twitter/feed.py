@@ -22,6 +22,7 @@ import Queue
 import threading
 import json
 
+from pyalgotrade import dispatcher
 from pyalgotrade import observer
 import pyalgotrade.logger
 
@@ -81,7 +82,6 @@ class TwitterFeed(observer.Subject):
         * At least **track** or **follow** have to be set.
     """
 
-    QUEUE_TIMEOUT = 0.01
     MAX_EVENTS_PER_DISPATCH = 50
 
     def __init__(self, consumerKey, consumerSecret, accessToken, accessTokenSecret, track=[], follow=[], languages=[]):
@@ -92,9 +92,10 @@ class TwitterFeed(observer.Subject):
         super(TwitterFeed, self).__init__()
 
         self.__event = observer.Event()
-        self.__queue = Queue.Queue()
+        self.__queue = dispatcher.NotifyingQueue()
         self.__thread = None
         self.__running = False
+        self.__dispatcher = None
 
         listener = Listener(self.__queue)
         auth = tweepy.OAuthHandler(consumerKey, consumerSecret)
@@ -111,11 +112,14 @@ class TwitterFeed(observer.Subject):
         finally:
             logger.info("Client finished.")
             self.__running = False
+            # Wake up the dispatcher so it notices that there are no more events.
+            if self.__dispatcher is not None:
+                self.__dispatcher.wakeUp()
 
     def __dispatchImpl(self):
         ret = False
         try:
-            nextTweet = json.loads(self.__queue.get(True, TwitterFeed.QUEUE_TIMEOUT))
+            nextTweet = json.loads(self.__queue.get(False))
             ret = True
             self.__event.emit(nextTweet)
         except Queue.Empty:
@@ -164,3 +168,10 @@ class TwitterFeed(observer.Subject):
 
     def peekDateTime(self):
         return None
+
+    def onDispatcherRegistered(self, dispatcher):
+        self.__dispatcher = dispatcher
+        self.__queue.setDispatcher(dispatcher)
+
+    def wakesUpDispatcher(self):
+        return True
@@ -44,3 +44,17 @@ def safe_max(left, right):
         return left
     else:
         return max(left, right)
+
+
+# Converts a value that may be None to a float, using NaN for None. This is used to store values in float arrays.
+def to_float(value):
+    if value is None:
+        return float("nan")
+    return float(value)
+
+
+# The inverse of to_float. NaN is the only value that is not equal to itself.
+def to_value(value):
+    if value != value:
+        return None
+    return value
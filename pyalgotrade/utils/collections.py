@@ -18,8 +18,13 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
+import tempfile
+
 import numpy as np
 
+from pyalgotrade.utils import dt
+
 
 def lt(v1, v2):
     if v1 is None:
@@ -57,47 +62,70 @@ def intersect(values1, values2, skipNone=False):
 
 
 # Like a collections.deque but using a numpy.array.
+# This is a circular buffer backed by an array twice as long as maxLen. Every value is written twice, at pos and at
+# pos + maxLen, so the last maxLen values are always contiguous and data() can return a view without copying or
+# shifting items around.
 class NumPyDeque(object):
     def __init__(self, maxLen, dtype=float):
         assert maxLen > 0, "Invalid maximum length"
 
-        self.__values = np.empty(maxLen, dtype=dtype)
+        self.__values = np.empty(maxLen * 2, dtype=dtype)
         self.__maxLen = maxLen
         self.__nextPos = 0
+        self.__writePos = 0
 
     def getMaxLen(self):
         return self.__maxLen
 
     def append(self, value):
+        writePos = self.__writePos
+        self.__values[writePos] = value
+        self.__values[writePos + self.__maxLen] = value
+
+        writePos += 1
+        if writePos == self.__maxLen:
+            writePos = 0
+        self.__writePos = writePos
+
         if self.__nextPos < self.__maxLen:
-            self.__values[self.__nextPos] = value
             self.__nextPos += 1
-        else:
-            # Shift items to the left and put the last value.
-            # I'm not using np.roll to avoid creating a new array.
-            self.__values[0:-1] = self.__values[1:]
-            self.__values[self.__nextPos - 1] = value
 
     def data(self):
         # If all values are not initialized, return a portion of the array.
         if self.__nextPos < self.__maxLen:
             ret = self.__values[0:self.__nextPos]
         else:
-            ret = self.__values
+            ret = self.__values[self.__writePos:self.__writePos + self.__maxLen]
         return ret
 
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
         # Create empty, copy last values and swap.
-        values = np.empty(maxLen, dtype=self.__values.dtype)
-        lastValues = self.__values[0:self.__nextPos]
-        values[0:min(maxLen, len(lastValues))] = lastValues[-1*min(maxLen, len(lastValues)):]
+        values = np.empty(maxLen * 2, dtype=self.__values.dtype)
+        lastValues = self.data()
+        count = min(maxLen, len(lastValues))
+        if count:
+            values[0:count] = lastValues[-1*count:]
+            values[maxLen:maxLen + count] = values[0:count]
         self.__values = values
 
         self.__maxLen = maxLen
-        if self.__nextPos >= self.__maxLen:
-            self.__nextPos = self.__maxLen
+        self.__nextPos = count
+        self.__writePos = count % maxLen
+
+    # Returns the value at a given position as a Python scalar. This is faster than indexing data() since no view
+    # gets built.
+    def item(self, pos):
+        count = self.__nextPos
+        if pos < 0:
+            pos += count
+        if pos < 0 or pos >= count:
+            raise IndexError("Index out of range")
+        # Once full, the last maxLen values start at the write position.
+        if count == self.__maxLen:
+            pos += self.__writePos
+        return self.__values.item(pos)
 
     def __len__(self):
         return self.__nextPos
@@ -106,12 +134,319 @@ class NumPyDeque(object):
         return self.data()[key]
 
 
+# Holds the values for a group of MemMapDeques (the columns of a dataseries) in a single temporary file created in a
+# given directory, with one record per position, so the open file descriptors don't grow with the number of columns.
+# The file is grown, by doubling its size, as values are appended. Recently appended values stay in memory through the OS
+# page cache while older ones can be paged out to disk.
+# Deques have to be added before any value gets appended.
+class MemMapFile(object):
+    INITIAL_CAPACITY = 4096
+
+    def __init__(self, directory):
+        self.__directory = directory
+        self.__file = None
+        self.__fields = []
+        self.__records = None
+
+    def addDeque(self, dtype):
+        if self.__records is not None:
+            raise Exception("Can't add deques once values were appended")
+        name = "f%d" % len(self.__fields)
+        self.__fields.append((name, np.dtype(dtype)))
+        return MemMapDeque(self, name, dtype)
+
+    def getCapacity(self):
+        ret = 0
+        if self.__records is not None:
+            ret = len(self.__records)
+        return ret
+
+    def grow(self, capacity):
+        if self.__file is None:
+            # The temporary file is removed once closed (or garbage collected).
+            self.__file = tempfile.TemporaryFile(dir=self.__directory)
+        else:
+            self.__records.flush()
+        # Records are laid out one after the other, so growing the file doesn't move the values already stored. Views
+        # returned by previous calls to getValues() keep a reference to the previous mapping, which is still valid.
+        self.__records = np.memmap(self.__file, dtype=self.__fields, mode="r+", shape=(capacity,))
+
+    def getValues(self, name):
+        return self.__records[name]
+
+
+# Like a NumPyDeque but unbounded, and backed by a field in a MemMapFile. Use MemMapFile.addDeque() to build one.
+# data() returns a view without copying.
+class MemMapDeque(object):
+    def __init__(self, memMapFile, name, dtype):
+        self.__file = memMapFile
+        self.__name = name
+        # Until the first value is appended.
+        self.__values = np.empty(0, dtype=dtype)
+        self.__count = 0
+
+    def getMaxLen(self):
+        return None
+
+    def append(self, value):
+        if self.__count == len(self.__values):
+            # Other deques in the same file may have grown it already.
+            if self.__file.getCapacity() <= self.__count:
+                self.__file.grow(max(self.__count * 2, MemMapFile.INITIAL_CAPACITY))
+            self.__values = self.__file.getValues(self.__name)
+        self.__values[self.__count] = value
+        self.__count += 1
+
+    def data(self):
+        return self.__values[0:self.__count]
+
+    def resize(self, maxLen):
+        raise Exception("Memory mapped deques are unbounded and can't be resized")
+
+    def item(self, pos):
+        if pos < 0:
+            pos += self.__count
+        if pos < 0 or pos >= self.__count:
+            raise IndexError("Index out of range")
+        return self.__values.item(pos)
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, key):
+        return self.data()[key]
+
+
+# Returns a NumPyDeque, or a MemMapDeque in memMapFile if set.
+def build_numpy_deque(maxLen, dtype, memMapFile=None):
+    if memMapFile is None:
+        ret = NumPyDeque(maxLen, dtype=dtype)
+    else:
+        ret = memMapFile.addDeque(dtype)
+    return ret
+
+
+# A bounded sequence of arbitrary objects, backed by a NumPyDeque, that behaves like a list when sliced.
+class ObjectDeque(object):
+    def __init__(self, maxLen):
+        self.__values = NumPyDeque(maxLen, dtype=object)
+
+    def getMaxLen(self):
+        return self.__values.getMaxLen()
+
+    def append(self, value):
+        self.__values.append(value)
+
+    def data(self):
+        return self.__values.data().tolist()
+
+    def resize(self, maxLen):
+        self.__values.resize(maxLen)
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, key):
+        ret = self.__values.data()[key]
+        if isinstance(key, slice):
+            ret = ret.tolist()
+        return ret
+
+
+# A bounded sequence of numbers, backed by a float64 NumPyDeque, that can also hold None values (stored as NaN). If
+# memMapFile is set, the sequence is unbounded and backed by a MemMapDeque in that file instead.
+# Python floats, numpy.float64 values and ints are not mixed, so items are returned with the same type they were added
+# with. Ints are only accepted if float64 can hold them exactly.
+# Use accepts() to check if a value can be stored before appending it.
+class FloatDeque(object):
+    # The largest magnitude for ints that float64 can hold exactly.
+    MAX_INT = 2**53
+
+    def __init__(self, maxLen, memMapFile=None):
+        self.__values = build_numpy_deque(maxLen, np.float64, memMapFile)
+        self.__valueType = None
+
+    def getMaxLen(self):
+        return self.__values.getMaxLen()
+
+    def accepts(self, value):
+        if value is None:
+            return True
+        valueType = type(value)
+        if valueType is float or valueType is np.float64:
+            # NaNs are not supported since they are used to represent None.
+            if value != value:
+                return False
+        elif valueType is not int or abs(value) > FloatDeque.MAX_INT:
+            return False
+        return self.__valueType is None or self.__valueType is valueType
+
+    def append(self, value):
+        if value is None:
+            self.__values.append(np.nan)
+        else:
+            self.__valueType = type(value)
+            self.__values.append(value)
+
+    def __toObject(self, value):
+        if value != value:
+            return None
+        elif self.__valueType is np.float64:
+            return np.float64(value)
+        elif self.__valueType is int:
+            return int(value)
+        return value
+
+    def data(self):
+        return [self.__toObject(value) for value in self.__values.data().tolist()]
+
+    def asarray(self):
+        # Returns the underlying numpy.array. None values are NaN.
+        return self.__values.data()
+
+    def resize(self, maxLen):
+        self.__values.resize(maxLen)
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, key):
+        if type(key) is int:
+            return self.__toObject(self.__values.item(key))
+        elif isinstance(key, slice):
+            return [self.__toObject(value) for value in self.__values.data()[key].tolist()]
+        return self.__toObject(self.__values.data().item(key))
+
+
+# A bounded sequence of datetimes stored as int64 microseconds since the epoch, backed by a NumPyDeque (or by a
+# MemMapDeque if memMapFile is set, in which case the sequence is unbounded).
+# None values are supported, and all the datetimes must share the same tzinfo instance and UTC offset so they can be
+# rebuilt exactly as they were added. Use accepts() to check if a datetime can be stored before appending it.
+class DateTimeDeque(object):
+    NONE = np.iinfo(np.int64).min
+
+    def __init__(self, maxLen, memMapFile=None):
+        self.__timestamps = build_numpy_deque(maxLen, np.int64, memMapFile)
+        self.__tzInfo = None
+        self.__utcOffset = None
+        self.__tzInfoSet = False
+        # The list of datetime.datetime returned by data() is cached until the next change.
+        self.__dateTimes = None
+
+    def getMaxLen(self):
+        return self.__timestamps.getMaxLen()
+
+    def accepts(self, dateTime):
+        if dateTime is None:
+            return True
+        if not isinstance(dateTime, datetime.datetime):
+            return False
+        if not self.__tzInfoSet:
+            return True
+        return dateTime.tzinfo is self.__tzInfo and (self.__tzInfo is None or dateTime.utcoffset() == self.__utcOffset)
+
+    def append(self, dateTime):
+        self.__dateTimes = None
+        if dateTime is None:
+            self.__timestamps.append(DateTimeDeque.NONE)
+        else:
+            if not self.__tzInfoSet:
+                self.__tzInfo = dateTime.tzinfo
+                self.__utcOffset = dateTime.utcoffset()
+                self.__tzInfoSet = True
+            self.__timestamps.append(dt.datetime_to_microseconds(dateTime))
+
+    def __toDateTime(self, timestamp):
+        if timestamp == DateTimeDeque.NONE:
+            return None
+        ret = dt.microseconds_to_datetime(timestamp)
+        if self.__tzInfo is not None:
+            ret = (ret + self.__utcOffset).replace(tzinfo=self.__tzInfo)
+        return ret
+
+    def data(self):
+        if self.__dateTimes is None:
+            self.__dateTimes = [self.__toDateTime(timestamp) for timestamp in self.__timestamps.data().tolist()]
+        return self.__dateTimes
+
+    def asarray(self):
+        # Returns the underlying numpy.array with the timestamps. None values are DateTimeDeque.NONE.
+        return self.__timestamps.data()
+
+    def resize(self, maxLen):
+        self.__dateTimes = None
+        self.__timestamps.resize(maxLen)
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def __getitem__(self, key):
+        if type(key) is int:
+            return self.__toDateTime(self.__timestamps.item(key))
+        elif isinstance(key, slice):
+            return [self.__toDateTime(timestamp) for timestamp in self.__timestamps.data()[key].tolist()]
+        return self.__toDateTime(self.__timestamps.data().item(key))
+
+
+# Moves the values from a typed deque into an ObjectDeque.
+def to_object_deque(values):
+    maxLen = values.getMaxLen()
+    # Unbounded typed deques are moved to an unbounded ListDeque.
+    if maxLen is None:
+        ret = ListDeque(None)
+    else:
+        ret = ObjectDeque(maxLen)
+    for value in values.data():
+        ret.append(value)
+    return ret
+
+
+# Holds values in a typed deque (FloatDeque or DateTimeDeque) while possible. Once a value that the typed deque doesn't
+# accept gets appended, the values are moved to an ObjectDeque.
+class AdaptiveDeque(object):
+    def __init__(self, typedDeque):
+        self.__values = typedDeque
+        self.__typed = True
+
+    def isTyped(self):
+        return self.__typed
+
+    def asarray(self):
+        # Returns the underlying numpy.array, or None if values are held as objects.
+        ret = None
+        if self.__typed:
+            ret = self.__values.asarray()
+        return ret
+
+    def getMaxLen(self):
+        return self.__values.getMaxLen()
+
+    def append(self, value):
+        if self.__typed and not self.__values.accepts(value):
+            self.__values = to_object_deque(self.__values)
+            self.__typed = False
+        self.__values.append(value)
+
+    def data(self):
+        return self.__values.data()
+
+    def resize(self, maxLen):
+        self.__values.resize(maxLen)
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __getitem__(self, key):
+        return self.__values[key]
+
+
 # I'm not using collections.deque because:
 # 1: Random access is slower.
 # 2: Slicing is not supported.
+# If maxLen is None the deque is unbounded.
 class ListDeque(object):
     def __init__(self, maxLen):
-        assert maxLen > 0, "Invalid maximum length"
+        assert maxLen is None or maxLen > 0, "Invalid maximum length"
 
         self.__values = []
         self.__maxLen = maxLen
@@ -122,12 +457,16 @@ class ListDeque(object):
     def append(self, value):
         self.__values.append(value)
         # Check bounds
-        if len(self.__values) > self.__maxLen:
+        if self.__maxLen is not None and len(self.__values) > self.__maxLen:
             self.__values.pop(0)
 
     def data(self):
         return self.__values
 
+    def asarray(self):
+        # Values are held as objects.
+        return None
+
     def resize(self, maxLen):
         assert maxLen > 0, "Invalid maximum length"
 
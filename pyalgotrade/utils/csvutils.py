@@ -53,6 +53,24 @@ class FastDictReader(object):
         return self.__dict
 
 
+def read_columns(f, fieldnames=None, dialect="excel", *args, **kwargs):
+    """Reads a whole CSV file in one pass and returns a dict that maps field names to tuples with the column values.
+    Empty rows are skipped."""
+    reader = csv.reader(f, dialect, *args, **kwargs)
+    if fieldnames is None:
+        fieldnames = reader.next()
+    rows = [row for row in reader if row != []]
+
+    # Check that every row has the right number of columns.
+    assert(set(map(len, rows)) <= set([len(fieldnames)]))
+
+    if rows:
+        columns = zip(*rows)
+    else:
+        columns = [()] * len(fieldnames)
+    return dict(zip(fieldnames, columns))
+
+
 def download_csv(url, url_params=None, content_type="text/csv"):
     response = requests.get(url, params=url_params)
 
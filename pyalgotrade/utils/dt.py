@@ -19,6 +19,10 @@
 """
 
 import datetime
+import itertools
+import re
+
+import numpy as np
 import pytz
 
 
@@ -66,6 +70,310 @@ def timestamp_to_datetime(timeStamp, localized=True):
     return ret
 
 
+# The last datetime converted by datetime_to_microseconds and the result. The same datetime instance is usually
+# converted many times in a row (once for every dataseries that a bar gets appended to), and datetimes are immutable.
+last_conversion = (None, None)
+
+
+def datetime_to_microseconds(dateTime):
+    """ Converts a datetime.datetime to the number of microseconds since the epoch.
+    Naive datetimes are considered to be in UTC."""
+    global last_conversion
+
+    lastDateTime, ret = last_conversion
+    if dateTime is not lastDateTime:
+        if dateTime.tzinfo is None:
+            diff = dateTime - epoch_naive
+        else:
+            diff = dateTime - epoch_utc
+        ret = (diff.days * 86400 + diff.seconds) * 1000000 + diff.microseconds
+        last_conversion = (dateTime, ret)
+    return ret
+
+
+def microseconds_to_datetime(microseconds, tzInfo=None):
+    """ Converts the number of microseconds since the epoch to a datetime.datetime.
+    If tzInfo is None a naive datetime is returned."""
+    ret = epoch_naive + datetime.timedelta(microseconds=microseconds)
+    if tzInfo is not None:
+        ret = tzInfo.fromutc(ret.replace(tzinfo=tzInfo))
+    return ret
+
+
+# Directives that parse_datetimes can handle without strptime, with their width and default value.
+fixed_width_directives = {
+    "Y": (4, 1900),
+    "m": (2, 1),
+    "d": (2, 1),
+    "H": (2, 0),
+    "M": (2, 0),
+    "S": (2, 0),
+}
+
+
+# Returns a list of (directive, offset) and a list of (literal, offset) for fixed width formats, or None.
+def parse_fixed_width_format(dateTimeFormat):
+    directives = []
+    literals = []
+    offset = 0
+    for token in re.findall("%.|[^%]+", dateTimeFormat):
+        if token[0] == "%":
+            width = fixed_width_directives.get(token[1], (None, None))[0]
+            if width is None:
+                return None
+            directives.append((token[1], offset))
+            offset += width
+        else:
+            literals.append((token, offset))
+            offset += len(token)
+    return directives, literals, offset
+
+
+def parse_fixed_width_datetimes(values, dateTimeFormat):
+    fixedWidthFormat = parse_fixed_width_format(dateTimeFormat)
+    if fixedWidthFormat is None or len(values) == 0:
+        return None
+    directives, literals, width = fixedWidthFormat
+    if min(map(len, values)) != width or max(map(len, values)) != width:
+        return None
+
+    try:
+        chars = np.array(values, dtype="S%d" % width).view(np.uint8).reshape(len(values), width)
+    except UnicodeEncodeError:
+        return None
+    for literal, offset in literals:
+        if not (chars[:, offset:offset+len(literal)] == np.frombuffer(literal, dtype=np.uint8)).all():
+            return None
+
+    fields = {}
+    for directive, offset in directives:
+        digits = chars[:, offset:offset+fixed_width_directives[directive][0]].astype(np.int64) - ord("0")
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+        value = np.zeros(len(values), dtype=np.int64)
+        for i in xrange(digits.shape[1]):
+            value = value * 10 + digits[:, i]
+        fields[directive] = value
+    # Fields missing from the format take their default value for every datetime.
+    for directive, (width, default) in fixed_width_directives.iteritems():
+        if directive not in fields:
+            fields[directive] = np.full(len(values), default, dtype=np.int64)
+
+    def get_field(directive):
+        return fields[directive]
+
+    months = (get_field("Y") - 1970) * 12 + get_field("m") - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]") + (get_field("d") - 1)
+    hours, minutes, seconds = get_field("H"), get_field("M"), get_field("S")
+    valid = (get_field("m") >= 1) & (get_field("m") <= 12) & (get_field("d") >= 1)
+    valid &= days.astype("datetime64[M]").astype(np.int64) == months
+    valid &= (hours < 24) & (minutes < 60) & (seconds < 60)
+    if not np.all(valid):
+        return None
+    seconds = days.astype(np.int64) * 86400 + hours * 3600 + minutes * 60 + seconds
+    return seconds * 1000000
+
+
+def parse_ymd(value):
+    # Sample: 2005-12-30
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError()
+    return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def parse_ymd_hms(value):
+    # Sample: 2005-12-30 13:59:00
+    if len(value) != 19 or value[4:17:3] != "-- ::":
+        raise ValueError()
+    return datetime.datetime(
+        int(value[0:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]), int(value[17:19])
+    )
+
+
+def parse_compact_ymd(value):
+    # Sample: 20051230
+    if len(value) != 8:
+        raise ValueError()
+    return datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+
+def parse_compact_ymd_hms(value):
+    # Sample: 20051230 135900
+    if len(value) != 15 or value[8] != " ":
+        raise ValueError()
+    return datetime.datetime(
+        int(value[0:4]), int(value[4:6]), int(value[6:8]), int(value[9:11]), int(value[11:13]), int(value[13:15])
+    )
+
+
+# Parsers for the most common formats. These work faster than datetime.datetime.strptime.
+datetime_parsers = {
+    "%Y-%m-%d": parse_ymd,
+    "%Y-%m-%d %H:%M:%S": parse_ymd_hms,
+    "%Y%m%d": parse_compact_ymd,
+    "%Y%m%d %H%M%S": parse_compact_ymd_hms,
+}
+
+
+# Returns a function that parses fixed width formats by slicing the fields.
+def build_fixed_width_parser(dateTimeFormat):
+    fixedWidthFormat = parse_fixed_width_format(dateTimeFormat)
+    if fixedWidthFormat is None:
+        return None
+    directives, literals, width = fixedWidthFormat
+    slices = [
+        (directive, offset, offset + fixed_width_directives[directive][0]) for directive, offset in directives
+    ]
+    literals = [(literal, offset, offset + len(literal)) for literal, offset in literals]
+    defaults = dict((directive, values[1]) for directive, values in fixed_width_directives.iteritems())
+
+    def parse(value):
+        if len(value) != width:
+            raise ValueError()
+        for literal, begin, end in literals:
+            if value[begin:end] != literal:
+                raise ValueError()
+        fields = dict(defaults)
+        for directive, begin, end in slices:
+            fields[directive] = int(value[begin:end])
+        return datetime.datetime(fields["Y"], fields["m"], fields["d"], fields["H"], fields["M"], fields["S"])
+    return parse
+
+
+def get_datetime_parser(dateTimeFormat):
+    """Returns a function that parses strings like datetime.datetime.strptime(value, dateTimeFormat) does.
+    Common formats, and formats made of fixed width %Y, %m, %d, %H, %M and %S only, are parsed by slicing the fields
+    and datetime.datetime.strptime is used for the rest, and for values that don't match."""
+    parser = datetime_parsers.get(dateTimeFormat)
+    if parser is None:
+        parser = build_fixed_width_parser(dateTimeFormat)
+    if parser is None:
+        return lambda value: datetime.datetime.strptime(value, dateTimeFormat)
+
+    def parse(value):
+        try:
+            return parser(value)
+        except ValueError:
+            # Let strptime either parse it or raise the appropriate error.
+            return datetime.datetime.strptime(value, dateTimeFormat)
+    return parse
+
+
+class Localizer(object):
+    """Localizes datetimes like :func:`localize` does, but remembers the timezone offset for every hour so pytz runs
+    only twice per hour instead of once per datetime. Datetimes in hours where the offset changes, like the ones with
+    half-hour transitions, are localized one at a time.
+
+    :param timeZone: The timezone to localize datetimes to.
+    :type timeZone: A pytz timezone.
+    """
+
+    def __init__(self, timeZone):
+        self.__timeZone = timeZone
+        # The local tzinfo for naive datetimes, and the (UTC offset, tzinfo) for UTC datetimes, by hour. These are None
+        # for hours where the offset changes.
+        self.__localTzInfos = {}
+        self.__utcOffsets = {}
+
+    def __getLocalTzInfo(self, dateTime):
+        key = (dateTime.year, dateTime.month, dateTime.day, dateTime.hour)
+        if key not in self.__localTzInfos:
+            hourBegin = dateTime.replace(minute=0, second=0, microsecond=0)
+            tzInfo = self.__timeZone.localize(hourBegin).tzinfo
+            if self.__timeZone.localize(hourBegin + hour_len - one_microsecond).tzinfo is not tzInfo:
+                tzInfo = None
+            self.__localTzInfos[key] = tzInfo
+        return self.__localTzInfos[key]
+
+    def __getUTCOffset(self, dateTime):
+        key = (dateTime.year, dateTime.month, dateTime.day, dateTime.hour)
+        if key not in self.__utcOffsets:
+            hourBegin = dateTime.replace(minute=0, second=0, microsecond=0)
+            first = hourBegin.astimezone(self.__timeZone)
+            last = (hourBegin + hour_len - one_microsecond).astimezone(self.__timeZone)
+            offset = None
+            if first.tzinfo is last.tzinfo:
+                offset = (first.utcoffset(), first.tzinfo)
+            self.__utcOffsets[key] = offset
+        return self.__utcOffsets[key]
+
+    def localize(self, dateTime):
+        if dateTime.tzinfo is None:
+            tzInfo = self.__getLocalTzInfo(dateTime)
+            if tzInfo is None:
+                ret = self.__timeZone.localize(dateTime)
+            else:
+                ret = dateTime.replace(tzinfo=tzInfo)
+        elif dateTime.tzinfo is pytz.utc:
+            offset = self.__getUTCOffset(dateTime)
+            if offset is None:
+                ret = dateTime.astimezone(self.__timeZone)
+            else:
+                ret = (dateTime + offset[0]).replace(tzinfo=offset[1])
+        else:
+            ret = localize(dateTime, self.__timeZone)
+        return ret
+
+
+def parse_datetimes(values, dateTimeFormat):
+    """Parses a sequence of strings with the same format and returns a numpy array with the number of microseconds
+    since the epoch for each one. Formats made of %Y, %m, %d, %H, %M and %S only are parsed in bulk, and the rest
+    using datetime.datetime.strptime."""
+    ret = parse_fixed_width_datetimes(values, dateTimeFormat)
+    if ret is None:
+        ret = np.fromiter(
+            (datetime_to_microseconds(datetime.datetime.strptime(value, dateTimeFormat)) for value in values),
+            dtype=np.int64, count=len(values)
+        )
+    return ret
+
+
+def localize_microseconds(microseconds, timeZone):
+    """Takes a numpy array with the number of microseconds since the epoch for local datetimes in a timezone and
+    returns it adjusted to UTC. The offset is looked up once per hour, at the beginning and at the end of it, and values
+    in hours where the offset changes are adjusted one at a time."""
+    hourLen = 3600 * 1000000
+
+    def get_offset(value):
+        return datetime_to_microseconds(localize(microseconds_to_datetime(value), timeZone)) - value
+
+    hours, inverse = np.unique(microseconds // hourLen, return_inverse=True)
+    hourBegins = hours * hourLen
+    firstOffsets = np.fromiter(itertools.imap(get_offset, hourBegins.tolist()), dtype=np.int64, count=len(hours))
+    lastOffsets = np.fromiter(
+        itertools.imap(get_offset, (hourBegins + hourLen - 1).tolist()), dtype=np.int64, count=len(hours)
+    )
+    offsets = firstOffsets[inverse]
+    for pos in np.flatnonzero((firstOffsets != lastOffsets)[inverse]).tolist():
+        offsets[pos] = get_offset(microseconds.item(pos))
+    return microseconds + offsets
+
+
+def microseconds_to_datetimes(microseconds, tzInfo=None):
+    """Takes a numpy array with the number of microseconds since the epoch and returns a list with the datetimes, like
+    microseconds_to_datetime does for a single value. If tzInfo is not None, the offset is looked up once per hour, at
+    the beginning and at the end of it, and values in hours where the offset changes are converted one at a time."""
+    if tzInfo is None:
+        return [epoch_naive + datetime.timedelta(microseconds=value) for value in microseconds.tolist()]
+
+    hourLen = 3600 * 1000000
+    hours, inverse = np.unique(microseconds // hourLen, return_inverse=True)
+    # The datetime at the beginning of every hour, or None if the offset changes within the hour.
+    hourDateTimes = []
+    for hour in hours.tolist():
+        hourBegin = microseconds_to_datetime(hour * hourLen, tzInfo)
+        if microseconds_to_datetime((hour + 1) * hourLen - 1, tzInfo).tzinfo is not hourBegin.tzinfo:
+            hourBegin = None
+        hourDateTimes.append(hourBegin)
+    return [
+        microseconds_to_datetime(value, tzInfo) if hourDateTimes[hour] is None else
+        hourDateTimes[hour] + datetime.timedelta(microseconds=valueInHour)
+        for hour, value, valueInHour in itertools.izip(
+            inverse.tolist(), microseconds.tolist(), (microseconds % hourLen).tolist()
+        )
+    ]
+
+
 def get_first_monday(year):
     ret = datetime.date(year, 1, 1)
     if ret.weekday() != 0:
@@ -82,4 +390,7 @@ def get_last_monday(year):
     return ret
 
 
-epoch_utc = as_utc(datetime.datetime(1970, 1, 1))
+hour_len = datetime.timedelta(hours=1)
+one_microsecond = datetime.timedelta(microseconds=1)
+epoch_naive = datetime.datetime(1970, 1, 1)
+epoch_utc = as_utc(epoch_naive)
@@ -0,0 +1,203 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import pytz
+
+import common
+import barfeed_test
+import feed_test
+
+from pyalgotrade.barfeed import binaryfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+from pyalgotrade.utils import dt
+
+
+def get_bar_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        for instrument in sorted(bars.getInstruments()):
+            bar_ = bars[instrument]
+            ret.append((
+                instrument, str(bar_.getDateTime()), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(),
+                bar_.getVolume(), bar_.getAdjClose(), bar_.getFrequency()
+            ))
+    return ret
+
+
+def build_yahoo_feed(files):
+    ret = yahoofeed.Feed()
+    for instrument, fileName in files:
+        ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+    return ret
+
+
+def build_ninjatrader_feed(timezone=None):
+    ret = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, timezone)
+    ret.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+    return ret
+
+
+class BinaryFeedTestCase(common.TestCase):
+    # Writes the bars from a feed into bar files and returns the database.
+    def __writeBars(self, tmpPath, barFeed):
+        ret = binaryfeed.Database(tmpPath)
+        ret.addBarsFromFeed(barFeed)
+        ret.disconnect()
+        return ret
+
+    def __buildFeed(self, db, instruments, frequency, timezone=None, **kwargs):
+        ret = binaryfeed.Feed(frequency, timezone)
+        for instrument in instruments:
+            ret.addBarsFromFile(db.getFilePath(instrument, frequency), **kwargs)
+        return ret
+
+    def testSameBarsAsCSV(self):
+        files = [("spy", "spy-2010-yahoofinance.csv"), ("nikkei", "nikkei-2010-yahoofinance.csv")]
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed(files))
+            barFeed = self.__buildFeed(db, ["spy", "nikkei"], bar.Frequency.DAY)
+            self.assertTrue(barFeed.barsHaveAdjClose())
+            self.assertEqual(get_bar_values(barFeed), get_bar_values(build_yahoo_feed(files)))
+
+    def testTimezoneAwareBars(self):
+        timezone = marketsession.USEquities.timezone
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_ninjatrader_feed(timezone))
+            self.assertEqual(
+                get_bar_values(self.__buildFeed(db, ["spy"], bar.Frequency.MINUTE, timezone)),
+                get_bar_values(build_ninjatrader_feed(timezone))
+            )
+            # Bars are loaded in UTC if no timezone is set.
+            barFeed = self.__buildFeed(db, ["spy"], bar.Frequency.MINUTE)
+            self.assertFalse(barFeed.barsHaveAdjClose())
+            expected = build_ninjatrader_feed(timezone)
+            for (dateTime, bars), (expectedDateTime, expectedBars) in zip(barFeed, expected):
+                self.assertEqual(dateTime, expectedDateTime)
+                self.assertEqual(str(dateTime), str(dt.localize(expectedDateTime, pytz.utc)))
+
+    def testLocalizeNaiveBars(self):
+        timezone = marketsession.USEquities.timezone
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            barFeed = self.__buildFeed(db, ["orcl"], bar.Frequency.DAY, timezone)
+            for dateTime, bars in barFeed:
+                self.assertEqual(dateTime, dt.localize(datetime.datetime(2000, 1, 3), timezone))
+                break
+
+    def testFilterRange(self):
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            barFeed = self.__buildFeed(
+                db, ["orcl"], bar.Frequency.DAY,
+                fromDateTime=datetime.datetime(2000, 3, 1), toDateTime=datetime.datetime(2000, 3, 31)
+            )
+            values = get_bar_values(barFeed)
+            self.assertEqual(len(values), 23)
+            self.assertEqual(values[0][1], "2000-03-01 00:00:00")
+            self.assertEqual(values[-1][1], "2000-03-31 00:00:00")
+
+            bars = db.getBars("orcl", bar.Frequency.DAY, fromDateTime=datetime.datetime(2000, 12, 29))
+            self.assertEqual(len(bars), 1)
+            self.assertEqual(bars[0].getClose(), 29.06)
+            self.assertEqual(db.getBars("spy", bar.Frequency.DAY), [])
+
+    def testAppend(self):
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2001-yahoofinance.csv")]))
+            self.assertEqual(
+                get_bar_values(self.__buildFeed(db, ["orcl"], bar.Frequency.DAY)),
+                get_bar_values(build_yahoo_feed([
+                    ("orcl", "orcl-2000-yahoofinance.csv"), ("orcl", "orcl-2001-yahoofinance.csv")
+                ]))
+            )
+
+            with self.assertRaisesRegexp(Exception, "Bars must be written in ascending order.*"):
+                self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+
+    def testInvalidFiles(self):
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            path = db.getFilePath("orcl", bar.Frequency.DAY)
+            with self.assertRaisesRegexp(Exception, ".* has bars with frequency 86400"):
+                binaryfeed.Feed(bar.Frequency.MINUTE).addBarsFromFile(path)
+            with self.assertRaisesRegexp(Exception, ".* has bars for orcl with frequency 86400"):
+                binaryfeed.BarFileWriter(path, "spy", bar.Frequency.DAY)
+
+            invalidPath = os.path.join(tmpPath, "invalid.bars")
+            with open(invalidPath, "w") as f:
+                f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n" * 2)
+            with self.assertRaisesRegexp(Exception, "Invalid bar file header"):
+                binaryfeed.Feed(bar.Frequency.DAY).addBarsFromFile(invalidPath)
+
+    def testReset(self):
+        files = [("spy", "spy-2010-yahoofinance.csv"), ("nikkei", "nikkei-2010-yahoofinance.csv")]
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed(files))
+            barFeed = self.__buildFeed(db, ["spy", "nikkei"], bar.Frequency.DAY)
+            expected = get_bar_values(barFeed)
+            barFeed.reset()
+            self.assertEqual(get_bar_values(barFeed), expected)
+
+    def testAddBarSequenceWithoutDisconnect(self):
+        bars = [bars["orcl"] for dateTime, bars in build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")])]
+        with common.TmpDir() as tmpPath:
+            db = binaryfeed.Database(tmpPath)
+            db.addBarSequence("orcl", bars, bar.Frequency.DAY)
+            # Bars are written once addBarSequence returns.
+            values = get_bar_values(self.__buildFeed(db, ["orcl"], bar.Frequency.DAY))
+            self.assertEqual(len(values), len(bars))
+            self.assertEqual(values[-1][1], str(bars[-1].getDateTime()))
+            db.disconnect()
+
+    def testStopUnmapsFiles(self):
+        # Memory mapped files are listed in /proc/self/maps on Linux only.
+        if not os.path.exists("/proc/self/maps"):
+            return
+
+        def is_mapped(path):
+            with open("/proc/self/maps") as f:
+                return os.path.realpath(path) in f.read()
+
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            path = db.getFilePath("orcl", bar.Frequency.DAY)
+            barFeed = self.__buildFeed(db, ["orcl"], bar.Frequency.DAY)
+            barFeed.start()
+            barFeed.getNextBars()
+            self.assertTrue(is_mapped(path))
+            barFeed.stop()
+            self.assertFalse(is_mapped(path))
+
+    def testBaseBarFeed(self):
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            barfeed_test.check_base_barfeed(self, self.__buildFeed(db, ["orcl"], bar.Frequency.DAY), True)
+
+    def testBaseFeedInterface(self):
+        with common.TmpDir() as tmpPath:
+            db = self.__writeBars(tmpPath, build_yahoo_feed([("orcl", "orcl-2000-yahoofinance.csv")]))
+            feed_test.tstBaseFeedInterface(self, self.__buildFeed(db, ["orcl"], bar.Frequency.DAY))
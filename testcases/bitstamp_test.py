@@ -62,11 +62,36 @@ class WebSocketClientThreadMock(threading.Thread):
         self.__stop = True
 
 
+# Pushes events from the thread, like the real client does, to a queue that wakes up the dispatcher.
+class NotifyingWebSocketClientThreadMock(threading.Thread):
+    def __init__(self, events):
+        threading.Thread.__init__(self)
+        self.__queue = dispatcher.NotifyingQueue()
+        self.__events = events
+        self.__stop = False
+
+    def getQueue(self):
+        return self.__queue
+
+    def run(self):
+        self.__queue.put((wsclient.WebSocketClient.ON_CONNECTED, None))
+        for event in self.__events:
+            if self.__stop:
+                break
+            time.sleep(0.05)
+            self.__queue.put(event)
+        self.__queue.put((wsclient.WebSocketClient.ON_DISCONNECTED, None))
+
+    def stop(self):
+        self.__stop = True
+
+
 class TestingLiveTradeFeed(barfeed.LiveTradeFeed):
-    def __init__(self):
+    def __init__(self, threadClass=WebSocketClientThreadMock):
         barfeed.LiveTradeFeed.__init__(self)
         # Disable reconnections so the test finishes when ON_DISCONNECTED is pushed.
         self.enableReconection(False)
+        self.__threadClass = threadClass
         self.__events = []
 
     def addTrade(self, dateTime, tid, price, amount):
@@ -81,7 +106,7 @@ class TestingLiveTradeFeed(barfeed.LiveTradeFeed):
         self.__events.append((wsclient.WebSocketClient.ON_TRADE, wsclient.Trade(dateTime, eventDict)))
 
     def buildWebSocketClientThread(self):
-        return WebSocketClientThreadMock(self.__events)
+        return self.__threadClass(self.__events)
 
 
 class HTTPClientMock(object):
@@ -282,6 +307,30 @@ class PaperTradingTestCase(tc_common.TestCase):
         self.assertEquals(len(strat.posExecutionInfo), 1)
         self.assertEquals(strat.pos.getEntryOrder().getSubmitDateTime().date(), wsclient.get_current_datetime().date())
 
+    def testDispatcherSleepsWhileIdle(self):
+        # The paper trading broker doesn't wake up the dispatcher, but it shouldn't keep it from sleeping while waiting
+        # for trades.
+        class Strategy(TestStrategy):
+            def __init__(self, feed, brk):
+                TestStrategy.__init__(self, feed, brk)
+                self.pos = None
+
+            def onBars(self, bars):
+                if self.pos is None:
+                    self.pos = self.enterLongLimit("BTC", 100, 1, True)
+
+        barFeed = TestingLiveTradeFeed(NotifyingWebSocketClientThreadMock)
+        for i in xrange(5):
+            barFeed.addTrade(datetime.datetime(2000, 1, 1 + i), 1, 100, 0.1)
+
+        brk = broker.PaperTradingBroker(1000, barFeed)
+        strat = Strategy(barFeed, brk)
+        strat.getDispatcher().setMetricsEnabled(True)
+        strat.run()
+
+        self.assertEquals(round(strat.pos.getShares(), 3), 0.4)
+        self.assertTrue(strat.getDispatcher().getMetrics().getIdleIterations() < 50)
+
     def testBuyAndSellWithPartialFill1(self):
 
         class Strategy(TestStrategy):
@@ -81,3 +81,34 @@ class TestCase(common.TestCase):
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getDateTime(), dt.as_utc(datetime.datetime(2012, 5, 30, 23, 49, 21)))
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getClose(), 5.14)
         self.assertEquals(loaded[-1][1]["bitstampUSD"].getVolume(), 20)
+
+
+class StreamingTestCase(common.TestCase):
+    def __getBarValues(self, feed):
+        return [
+            (dateTime, instrument, bars[instrument].getPrice(), bars[instrument].getVolume())
+            for dateTime, bars in feed for instrument in sorted(bars.getInstruments())
+        ]
+
+    def testSameBarsAsCSVTradeFeed(self):
+        fromDateTime = dt.as_utc(datetime.datetime(2012, 5, 29))
+        toDateTime = datetime.datetime(2012, 5, 31)
+        expected = barfeed.CSVTradeFeed()
+        expected.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), fromDateTime=fromDateTime, toDateTime=toDateTime)
+        feed = barfeed.StreamingCSVTradeFeed(bufferSize=10)
+        feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), fromDateTime=fromDateTime, toDateTime=toDateTime)
+        self.assertEquals(self.__getBarValues(feed), self.__getBarValues(expected))
+
+    def testMultipleInstruments(self):
+        feed = barfeed.StreamingCSVTradeFeed()
+        feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), "A")
+        feed.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"), "B")
+        loaded = self.__getBarValues(feed)
+        self.assertEquals(len(loaded), 9999 * 2)
+        self.assertEquals(loaded[0][:2], (dt.as_utc(datetime.datetime(2011, 9, 13, 13, 53, 36)), "A"))
+        self.assertEquals(loaded[1][:2], (dt.as_utc(datetime.datetime(2011, 9, 13, 13, 53, 36)), "B"))
+        self.assertEquals(loaded[-1][:2], (dt.as_utc(datetime.datetime(2012, 5, 31, 8, 41, 18, 5)), "B"))
+
+        # Trades with the same unixtime have to get the same fixes after a reset.
+        feed.reset()
+        self.assertEquals(self.__getBarValues(feed), loaded)
@@ -0,0 +1,154 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import threading
+
+import common
+import csvcache_test
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.bitcoincharts import barfeed as btcbarfeed
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+
+
+class BulkLoadTestCase(common.TestCase):
+    # Loads files one after the other and in parallel, and checks that bars are the same.
+    def __testBulkLoad(self, buildFeed, files, processes=2):
+        expected = buildFeed()
+        for instrument, path in files:
+            expected.addBarsFromCSV(instrument=instrument, path=path)
+        barFeed = buildFeed()
+        barFeed.addBarsFromCSVFiles(files, processes=processes)
+        self.assertEqual(barFeed.getRegisteredInstruments(), expected.getRegisteredInstruments())
+        self.assertEqual(barFeed.barsHaveAdjClose(), expected.barsHaveAdjClose())
+        values = csvcache_test.get_bar_values(barFeed)
+        self.assertTrue(len(values) > 0)
+        self.assertEqual(values, csvcache_test.get_bar_values(expected))
+
+    def testGenericBarFeed(self):
+        files = {
+            "spy": common.get_data_file_path("spy-2010-yahoofinance.csv"),
+            "nikkei": common.get_data_file_path("nikkei-2010-yahoofinance.csv"),
+            "orcl": common.get_data_file_path("orcl-2000-yahoofinance.csv"),
+        }
+
+        def buildFeed():
+            ret = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            ret.setDateTimeFormat("%Y-%m-%d")
+            ret.setColumnName("datetime", "Date")
+            return ret
+        self.__testBulkLoad(buildFeed, sorted(files.items()))
+
+        # Dicts are loaded in instrument order.
+        barFeed = buildFeed()
+        barFeed.addBarsFromCSVFiles(files)
+        self.assertEqual(barFeed.getDefaultInstrument(), "spy")
+
+    def testYahooFeedWithManyFilesPerInstrument(self):
+        def buildFeed():
+            ret = yahoofeed.Feed()
+            ret.setBarFilter(csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2001, 3, 1)))
+            return ret
+        self.__testBulkLoad(buildFeed, [
+            ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+        ])
+
+    def testNinjaTraderFeed(self):
+        def buildFeed():
+            return ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.timezone)
+        self.__testBulkLoad(buildFeed, [
+            ("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv")),
+            ("spy-2", common.get_data_file_path("nt-spy-minute-2011-03.csv")),
+        ])
+
+    def testSingleProcess(self):
+        self.__testBulkLoad(yahoofeed.Feed, [
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+        ], 1)
+
+    def testFeedWithoutRowParserFactory(self):
+        # Trade files are parsed one after the other since datetimes depend on the previous files.
+        self.__testBulkLoad(btcbarfeed.CSVTradeFeed, [
+            ("A", common.get_data_file_path("bitstampUSD.csv")),
+            ("B", common.get_data_file_path("bitstampUSD.csv")),
+        ])
+
+    def testConcurrentLoads(self):
+        # Every pool gets its own files to parse.
+        files = [
+            [
+                ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+                ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+            ],
+            [
+                ("nikkei", common.get_data_file_path("nikkei-2010-yahoofinance.csv")),
+                ("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv")),
+            ],
+        ]
+        feeds = [yahoofeed.Feed() for i in xrange(len(files))]
+        threads = [
+            threading.Thread(target=barFeed.addBarsFromCSVFiles, args=(feedFiles, None, 2))
+            for barFeed, feedFiles in zip(feeds, files)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for barFeed, feedFiles in zip(feeds, files):
+            expected = yahoofeed.Feed()
+            for instrument, path in feedFiles:
+                expected.addBarsFromCSV(instrument, path)
+            self.assertEqual(csvcache_test.get_bar_values(barFeed), csvcache_test.get_bar_values(expected))
+
+    def testCache(self):
+        files = [
+            ("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv")),
+            ("spy", common.get_data_file_path("spy-2010-yahoofinance.csv")),
+        ]
+        with common.TmpDir() as cacheDir:
+            def buildFeed():
+                ret = yahoofeed.Feed()
+                ret.setCacheDir(cacheDir)
+                return ret
+            self.__testBulkLoad(buildFeed, files)
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
+            self.__testBulkLoad(buildFeed, files)
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
+
+    def testAdjCloseMismatch(self):
+        with common.TmpDir() as tmpPath:
+            paths = []
+            for fileName, adjClose in [("adjclose.csv", "10"), ("noadjclose.csv", "")]:
+                paths.append(os.path.join(tmpPath, fileName))
+                with open(paths[-1], "w") as f:
+                    f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+                    f.write("2001-01-01 00:00:00,10,11,9,10,1,%s\n" % (adjClose))
+            barFeed = csvfeed.GenericBarFeed(bar.Frequency.DAY)
+            with self.assertRaisesRegexp(Exception, "Previous bars had adjusted close and these ones don't have."):
+                barFeed.addBarsFromCSVFiles([("orcl", paths[0]), ("spy", paths[1])])
@@ -0,0 +1,214 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+import shutil
+
+import numpy as np
+
+import common
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import ninjatraderfeed
+from pyalgotrade.bitcoincharts import barfeed as btcbarfeed
+from pyalgotrade import bar
+from pyalgotrade import marketsession
+
+
+def get_bar_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        for instrument in sorted(bars.getInstruments()):
+            bar_ = bars[instrument]
+            ret.append((
+                instrument, type(bar_), str(bar_.getDateTime()), bar_.getOpen(), bar_.getHigh(), bar_.getLow(),
+                bar_.getClose(), bar_.getVolume(), bar_.getAdjClose(), bar_.getFrequency(), bar_.getExtraColumns()
+            ))
+    return ret
+
+
+class BarFilter(csvfeed.BarFilter):
+    def includeBar(self, bar_):
+        return bar_.getDateTime().month == 3
+
+
+class MarchFilter(csvfeed.DateRangeFilter):
+    def includeBar(self, bar_):
+        return bar_.getDateTime().month == 3
+
+
+class RowParser(csvfeed.GenericRowParser):
+    def parseBar(self, csvRowDict):
+        ret = super(RowParser, self).parseBar(csvRowDict)
+        if ret.getDateTime().minute != 0:
+            ret = None
+        return ret
+
+
+class GenericBarFeed(csvfeed.GenericBarFeed):
+    def _createRowParser(self, timezone=None):
+        return RowParser(
+            {"datetime": "Date Time", "open": "Open", "high": "High", "low": "Low", "close": "Close",
+             "volume": "Volume", "adj_close": "Adj Close"},
+            "%Y-%m-%d %H:%M:%S", None, self.getFrequency(), timezone
+        )
+
+
+class CacheTestCase(common.TestCase):
+    # Loads the feed twice with a cache and once without it, and checks that bars are the same.
+    def __testCache(self, buildFeed, cacheFiles=1):
+        expected = get_bar_values(buildFeed(None))
+        self.assertTrue(len(expected) > 0)
+        with common.TmpDir() as cacheDir:
+            self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+            self.assertEqual(len(os.listdir(cacheDir)), cacheFiles)
+            self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+            self.assertEqual(len(os.listdir(cacheDir)), cacheFiles)
+
+    def testGenericBarFeed(self):
+        def buildFeed(cacheDir):
+            ret = csvfeed.GenericBarFeed(bar.Frequency.MINUTE * 30, timezone=marketsession.USEquities.timezone)
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV("btc", common.get_data_file_path("30min-bitstampUSD-2.csv"))
+            self.assertFalse(ret.barsHaveAdjClose())
+            return ret
+        self.__testCache(buildFeed)
+
+    def testYahooFeed(self):
+        def buildFeed(cacheDir):
+            ret = yahoofeed.Feed()
+            ret.setCacheDir(cacheDir)
+            ret.setBarFilter(csvfeed.DateRangeFilter(datetime.datetime(2000, 3, 1), datetime.datetime(2001, 3, 1)))
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2001-yahoofinance.csv"))
+            self.assertTrue(ret.barsHaveAdjClose())
+            return ret
+        self.__testCache(buildFeed, 2)
+
+    def testNinjaTraderFeed(self):
+        def buildFeed(cacheDir):
+            ret = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.timezone)
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+            return ret
+        self.__testCache(buildFeed)
+
+    def testTradeFeed(self):
+        def buildFeed(cacheDir):
+            ret = btcbarfeed.CSVTradeFeed()
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV(common.get_data_file_path("bitstampUSD.csv"))
+            return ret
+        self.__testCache(buildFeed)
+
+    def testFilterWithoutCacheKey(self):
+        def buildFeed(cacheDir):
+            ret = yahoofeed.Feed()
+            ret.setCacheDir(cacheDir)
+            ret.setBarFilter(BarFilter())
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            return ret
+        self.__testCache(buildFeed, 0)
+
+    def testSubclassesWithoutCacheKey(self):
+        def buildFeed(cacheDir):
+            ret = yahoofeed.Feed()
+            ret.setCacheDir(cacheDir)
+            ret.setBarFilter(MarchFilter())
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            return ret
+        self.__testCache(buildFeed, 0)
+
+        def buildGenericFeed(cacheDir):
+            ret = GenericBarFeed(bar.Frequency.MINUTE * 30)
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV("btc", common.get_data_file_path("30min-bitstampUSD-2.csv"))
+            return ret
+        self.__testCache(buildGenericFeed, 0)
+
+    def testUSEquitiesRTH(self):
+        def buildFeed(cacheDir):
+            ret = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE, marketsession.USEquities.timezone)
+            ret.setCacheDir(cacheDir)
+            ret.setBarFilter(csvfeed.USEquitiesRTH())
+            ret.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011-03.csv"))
+            return ret
+        self.__testCache(buildFeed)
+
+    def testCorruptCacheFile(self):
+        def buildFeed(cacheDir):
+            ret = yahoofeed.Feed()
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            return ret
+
+        expected = get_bar_values(buildFeed(None))
+        with common.TmpDir() as cacheDir:
+            self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+            cachePath = os.path.join(cacheDir, os.listdir(cacheDir)[0])
+            for size in [os.path.getsize(cachePath) / 2, 0]:
+                # Truncate the cache file.
+                with open(cachePath, "r+b") as f:
+                    f.truncate(size)
+                self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+                self.assertEqual(os.listdir(cacheDir), [os.path.basename(cachePath)])
+                self.assertTrue(os.path.getsize(cachePath) > size)
+
+    def testPickledCacheFile(self):
+        def buildFeed(cacheDir):
+            ret = yahoofeed.Feed()
+            ret.setCacheDir(cacheDir)
+            ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            return ret
+
+        expected = get_bar_values(buildFeed(None))
+        with common.TmpDir() as cacheDir:
+            self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+            cachePath = os.path.join(cacheDir, os.listdir(cacheDir)[0])
+            # Replace the cache file with one that has pickled objects, which should never be loaded.
+            with np.load(cachePath) as columns:
+                columns = dict(columns)
+            columns["metadata"] = np.array([{"timezone": None, "extra": [], "state": True}], dtype=object)
+            with open(cachePath, "wb") as f:
+                np.savez(f, **columns)
+            self.assertEqual(get_bar_values(buildFeed(cacheDir)), expected)
+            with np.load(cachePath, allow_pickle=False) as columns:
+                self.assertEqual(columns["metadata"].dtype, np.uint8)
+
+    def testFileChanges(self):
+        with common.TmpDir() as tmpDir:
+            path = os.path.join(tmpDir, "orcl.csv")
+            cacheDir = os.path.join(tmpDir, "cache")
+            os.mkdir(cacheDir)
+
+            def load(fileName):
+                shutil.copyfile(common.get_data_file_path(fileName), path)
+                ret = yahoofeed.Feed()
+                ret.setCacheDir(cacheDir)
+                ret.addBarsFromCSV("orcl", path)
+                return get_bar_values(ret)
+
+            bars2000 = load("orcl-2000-yahoofinance.csv")
+            bars2001 = load("orcl-2001-yahoofinance.csv")
+            self.assertEqual(bars2000[0][2], "2000-01-03 00:00:00")
+            self.assertEqual(bars2001[0][2], "2001-01-02 00:00:00")
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
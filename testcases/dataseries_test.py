@@ -20,6 +20,9 @@
 
 import datetime
 
+import numpy as np
+import pytz
+
 import common
 
 from pyalgotrade import dataseries
@@ -140,6 +143,189 @@ class TestSequenceDataSeries(common.TestCase):
         self.assertEqual(ds[0], 90)
         self.assertEqual(ds[-1], 99)
 
+    def testFloatValues(self):
+        ds = dataseries.SequenceDataSeries(maxLen=10)
+        values = []
+        for i in xrange(25):
+            value = None if i % 3 == 0 else i / 2.0
+            ds.append(value)
+            values.append(value)
+            self.assertEqual(ds[-1], value)
+            self.assertEqual(ds[:], values[-10:])
+        self.assertEqual(len(ds), 10)
+        self.assertEqual(ds.getValueAbsolute(0), values[-10])
+        self.assertEqual(ds.getDateTimes(), [None] * 10)
+        self.assertIs(type(ds[-2]), float)
+
+    def testNumPyFloatValues(self):
+        ds = dataseries.SequenceDataSeries()
+        for i in xrange(10):
+            ds.append(np.float64(i) / 3)
+        self.assertIs(type(ds[-1]), np.float64)
+        self.assertEqual(str(ds[-1]), str(np.float64(9) / 3))
+
+    def testMixedValues(self):
+        ds = dataseries.SequenceDataSeries(maxLen=3)
+        ds.append(1.5)
+        ds.append(None)
+        ds.append(float("nan"))
+        ds.append("a")
+        self.assertEqual(len(ds), 3)
+        self.assertEqual(ds[0], None)
+        self.assertTrue(ds[1] != ds[1])
+        self.assertEqual(ds[2], "a")
+
+    def testTypedDateTimes(self):
+        for tzInfo in [None, pytz.utc, pytz.timezone("US/Eastern")]:
+            ds = dataseries.SequenceDataSeries(maxLen=5)
+            dateTimes = []
+            dateTime = datetime.datetime(2015, 3, 7, 23, 59, 59, 999)
+            if tzInfo is not None:
+                dateTime = tzInfo.localize(dateTime)
+            for i in xrange(12):
+                dateTimes.append(dateTime)
+                ds.appendWithDateTime(dateTime, i * 1.5)
+                dateTime = dateTime + datetime.timedelta(hours=1)
+
+            self.assertEqual(ds.getDateTimes(), dateTimes[-5:])
+            for expected, actual in zip(dateTimes[-5:], ds.getDateTimes()):
+                self.assertEqual(expected.tzinfo, actual.tzinfo)
+
+    def testMixedDateTimes(self):
+        ds = dataseries.SequenceDataSeries()
+        dateTimes = [
+            pytz.utc.localize(datetime.datetime(2000, 1, 1)),
+            pytz.utc.localize(datetime.datetime(2000, 1, 2)),
+            pytz.timezone("US/Eastern").localize(datetime.datetime(2000, 1, 3)),
+            pytz.utc.localize(datetime.datetime(2000, 1, 4)),
+        ]
+        for i, dateTime in enumerate(dateTimes):
+            ds.appendWithDateTime(dateTime, i)
+        self.assertEqual(ds.getDateTimes(), dateTimes)
+        self.assertEqual(ds[:], [0, 1, 2, 3])
+
+    def testAsArray(self):
+        ds = dataseries.SequenceDataSeries(maxLen=4)
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in xrange(6):
+            ds.appendWithDateTime(firstDt + datetime.timedelta(days=i), None if i == 3 else float(i))
+
+        values = ds.asarray()
+        self.assertEqual(values.dtype, np.float64)
+        self.assertFalse(values.flags.writeable)
+        self.assertEqual(values[[0, 2, 3]].tolist(), [2, 4, 5])
+        self.assertTrue(np.isnan(values[1]))
+        self.assertEqual(ds.asarray(-2).tolist(), [4, 5])
+        self.assertEqual(ds.asarray(0, 1).tolist(), [2])
+        self.assertEqual(len(ds.asarray(10)), 0)
+        with self.assertRaises(ValueError):
+            ds.asarray()[0] = 1
+
+        dateTimes = ds.getDateTimesAsArray()
+        self.assertFalse(dateTimes.flags.writeable)
+        self.assertEqual(dateTimes.tolist(), ds.getDateTimes())
+        self.assertEqual(ds.getDateTimesAsArray(-1).tolist(), [firstDt + datetime.timedelta(days=5)])
+
+    def testAsArrayView(self):
+        maxLen = dataseries.TYPED_STORAGE_MIN_LEN
+        ds = dataseries.SequenceDataSeries(maxLen=maxLen)
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in xrange(maxLen + 2):
+            ds.appendWithDateTime(firstDt + datetime.timedelta(minutes=i), i)
+
+        # Long dataseries hold values in numpy arrays, so they are not copied.
+        values = ds.asarray()
+        self.assertFalse(values.flags.owndata)
+        self.assertEqual(values[[0, -1]].tolist(), [2, maxLen + 1])
+        self.assertFalse(ds.getDateTimesAsArray().flags.owndata)
+        self.assertEqual(ds[-1], maxLen + 1)
+        self.assertEqual(type(ds[-1]), int)
+        self.assertEqual(ds.getDateTimes()[-1], firstDt + datetime.timedelta(minutes=maxLen + 1))
+
+    def testAsArrayWithObjects(self):
+        ds = dataseries.SequenceDataSeries()
+        dateTimes = [
+            pytz.utc.localize(datetime.datetime(2000, 1, 1)),
+            pytz.timezone("US/Eastern").localize(datetime.datetime(2000, 1, 1, 12)),
+        ]
+        ds.appendWithDateTime(dateTimes[0], 1)
+        ds.appendWithDateTime(dateTimes[1], None)
+        self.assertEqual(ds.asarray()[0], 1)
+        self.assertTrue(np.isnan(ds.asarray()[1]))
+        self.assertEqual(
+            ds.getDateTimesAsArray().tolist(),
+            [dateTime.astimezone(pytz.utc).replace(tzinfo=None) for dateTime in dateTimes]
+        )
+
+        ds = dataseries.SequenceDataSeries()
+        ds.append("a")
+        with self.assertRaises(ValueError):
+            ds.asarray()
+        self.assertTrue(np.isnat(ds.getDateTimesAsArray()[0]))
+
+    def __testDateTimeLookup(self, ds, dateTimes):
+        self.assertEqual(ds.getIndexAt(dateTimes[0]), 0)
+        self.assertEqual(ds.getIndexAt(dateTimes[0], "right"), 1)
+        self.assertEqual(ds.getIndexAt(dateTimes[0] - datetime.timedelta(hours=1), "right"), 0)
+        self.assertEqual(ds.getIndexAt(dateTimes[1] + datetime.timedelta(hours=1)), 2)
+        self.assertEqual(ds.getIndexAt(dateTimes[-1] + datetime.timedelta(hours=1)), len(ds))
+        with self.assertRaises(Exception):
+            ds.getIndexAt(dateTimes[0], "middle")
+
+        self.assertEqual(ds.valueAt(dateTimes[1]), ds[1])
+        self.assertEqual(ds.valueAt(dateTimes[1] + datetime.timedelta(hours=1)), ds[1])
+        self.assertEqual(ds.valueAt(dateTimes[1] + datetime.timedelta(hours=1), asof=False), None)
+        self.assertEqual(ds.valueAt(dateTimes[1], asof=False), ds[1])
+        self.assertEqual(ds.valueAt(dateTimes[0] - datetime.timedelta(hours=1)), None)
+
+        self.assertEqual(ds.sliceByDate(), ds[:])
+        self.assertEqual(ds.sliceByDate(dateTimes[1], dateTimes[2]), ds[1:3])
+        self.assertEqual(ds.sliceByDate(dateTimes[1] + datetime.timedelta(hours=1)), ds[2:])
+        self.assertEqual(ds.sliceByDate(toDateTime=dateTimes[1] + datetime.timedelta(hours=1)), ds[:2])
+        self.assertEqual(ds.sliceByDate(dateTimes[-1] + datetime.timedelta(hours=1)), [])
+
+    def testDateTimeLookup(self):
+        ds = dataseries.SequenceDataSeries(maxLen=4)
+        firstDt = datetime.datetime(2000, 1, 1)
+        dateTimes = [firstDt + datetime.timedelta(days=i) for i in range(6)]
+        for i, dateTime in enumerate(dateTimes):
+            ds.appendWithDateTime(dateTime, float(i))
+        self.__testDateTimeLookup(ds, dateTimes[2:])
+
+    def testDateTimeLookupWithObjects(self):
+        ds = dataseries.SequenceDataSeries(maxLen=4)
+        firstDt = pytz.utc.localize(datetime.datetime(2000, 1, 1))
+        dateTimes = [firstDt + datetime.timedelta(days=i) for i in range(5)]
+        for i, dateTime in enumerate(dateTimes):
+            ds.appendWithDateTime(dateTime, float(i))
+        # A different timezone switches the datetimes to objects.
+        dateTime = pytz.timezone("US/Eastern").localize(datetime.datetime(2000, 1, 6))
+        ds.appendWithDateTime(dateTime, "a")
+        self.__testDateTimeLookup(ds, dateTimes[2:] + [dateTime])
+
+    def testStorageDir(self):
+        with common.TmpDir() as tmpPath:
+            ds = dataseries.SequenceDataSeries(maxLen=2, storageDir=tmpPath)
+            self.assertEqual(ds.getMaxLen(), None)
+            firstDt = datetime.datetime(2000, 1, 1)
+            count = 10000
+            for i in xrange(count):
+                ds.appendWithDateTime(firstDt + datetime.timedelta(minutes=i), float(i))
+            self.assertEqual(len(ds), count)
+            self.assertEqual(ds[0], 0)
+            self.assertEqual(ds[-1], count - 1)
+            self.assertEqual(ds.getDateTimes()[-1], firstDt + datetime.timedelta(minutes=count - 1))
+            self.assertEqual(ds.asarray().sum(), sum(range(count)))
+            self.assertEqual(ds.valueAt(firstDt + datetime.timedelta(minutes=10)), 10)
+            with self.assertRaises(Exception):
+                ds.setMaxLen(10)
+
+            # Values that can't be stored in files are moved to memory.
+            ds.appendWithDateTime(firstDt + datetime.timedelta(minutes=count), "a")
+            self.assertEqual(len(ds), count + 1)
+            self.assertEqual(ds[0], 0)
+            self.assertEqual(ds[-1], "a")
+
 
 class TestBarDataSeries(common.TestCase):
     def testEmpty(self):
@@ -213,6 +399,177 @@ class TestBarDataSeries(common.TestCase):
             self.assertEqual(ds.getDateTimes()[i], firstDt + datetime.timedelta(seconds=i))
 
 
+class TestColumnarBarDataSeries(common.TestCase):
+    def __buildBar(self, dateTime, i, extra={}):
+        return bar.BasicBar(dateTime, 2.0 + i, 4.0 + i, 1.0 + i, 3.0 + i, 10.5 + i, 3.0 + i, bar.Frequency.SECOND, extra)
+
+    def testEmpty(self):
+        ds = bards.ColumnarBarDataSeries()
+        with self.assertRaises(IndexError):
+            ds[-1]
+        with self.assertRaises(IndexError):
+            ds[0]
+        self.assertEqual(len(ds.getCloseDataSeries()), 0)
+        self.assertEqual(ds.getDateTimes(), [])
+
+    def testAppendInvalidDatetime(self):
+        ds = bards.ColumnarBarDataSeries()
+        now = datetime.datetime(2000, 1, 1)
+        ds.append(self.__buildBar(now, 0))
+        with self.assertRaises(Exception):
+            ds.append(self.__buildBar(now, 0))
+        with self.assertRaises(Exception):
+            ds.append(self.__buildBar(now - datetime.timedelta(seconds=1), 0))
+        self.assertEqual(len(ds), 1)
+
+    def testBarsAndColumns(self):
+        ds = bards.ColumnarBarDataSeries(maxLen=5)
+        self.assertTrue(isinstance(ds, bards.BarDataSeries))
+        firstDt = datetime.datetime(2000, 1, 1)
+        seq = []
+        for i in range(8):
+            bar_ = self.__buildBar(firstDt + datetime.timedelta(seconds=i), i)
+            ds.append(bar_)
+            seq.append(bar_)
+        seq = seq[-5:]
+
+        self.assertEqual(len(ds), 5)
+        self.assertEqual(ds.getDateTimes(), [item.getDateTime() for item in seq])
+        # The last bar is kept as is.
+        self.assertEqual(ds[-1], seq[-1])
+        for i in range(5):
+            self.assertEqual(ds[i].getDateTime(), seq[i].getDateTime())
+            self.assertEqual(ds[i].getOpen(), seq[i].getOpen())
+            self.assertEqual(ds[i].getHigh(), seq[i].getHigh())
+            self.assertEqual(ds[i].getLow(), seq[i].getLow())
+            self.assertEqual(ds[i].getClose(), seq[i].getClose())
+            self.assertEqual(ds[i].getVolume(), seq[i].getVolume())
+            self.assertEqual(ds[i].getAdjClose(), seq[i].getAdjClose())
+            self.assertEqual(ds[i].getFrequency(), seq[i].getFrequency())
+        self.assertEqual([item.getClose() for item in ds[-3:]], [item.getClose() for item in seq[-3:]])
+
+        self.assertEqual(ds.getOpenDataSeries()[:], [item.getOpen() for item in seq])
+        self.assertEqual(ds.getHighDataSeries()[:], [item.getHigh() for item in seq])
+        self.assertEqual(ds.getLowDataSeries()[:], [item.getLow() for item in seq])
+        self.assertEqual(ds.getCloseDataSeries()[:], [item.getClose() for item in seq])
+        self.assertEqual(ds.getVolumeDataSeries()[:], [item.getVolume() for item in seq])
+        self.assertEqual(ds.getAdjCloseDataSeries()[:], [item.getAdjClose() for item in seq])
+        self.assertEqual(ds.getCloseDataSeries().getDateTimes(), ds.getDateTimes())
+
+        ds.setMaxLen(2)
+        self.assertEqual(len(ds), 2)
+        self.assertEqual(len(ds.getCloseDataSeries()), 2)
+        self.assertEqual(ds[0].getClose(), seq[-2].getClose())
+
+    def testColumnEvents(self):
+        ds = bards.ColumnarBarDataSeries()
+        values = []
+        ds.getCloseDataSeries().getNewValueEvent().subscribe(
+            lambda dataSeries, dateTime, value: values.append((dateTime, value, dataSeries[-1]))
+        )
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in range(3):
+            ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i))
+        self.assertEqual(values, [(firstDt + datetime.timedelta(seconds=i), 3 + i, 3 + i) for i in range(3)])
+
+    def testExtraColumns(self):
+        ds = bards.ColumnarBarDataSeries()
+        firstDt = datetime.datetime(2000, 1, 1)
+        ds.append(self.__buildBar(firstDt, 0))
+        ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=1), 1, {"spread": 0.5}))
+        ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=2), 2, {"spread": 0.25, "open": "x"}))
+
+        self.assertEqual(ds.getExtraDataSeries("spread")[:], [None, 0.5, 0.25])
+        self.assertEqual(ds.getExtraDataSeries("open")[:], [None, None, "x"])
+        self.assertEqual(ds.getExtraDataSeries("missing")[:], [None, None, None])
+        self.assertEqual(ds[0].getExtraColumns(), {})
+        self.assertEqual(ds[1].getExtraColumns(), {"spread": 0.5})
+        self.assertEqual(ds.getOpenDataSeries()[-1], 4)
+
+    def testAsArray(self):
+        ds = bards.ColumnarBarDataSeries()
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in range(3):
+            ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i))
+        closes = ds.getCloseDataSeries().asarray()
+        self.assertFalse(closes.flags.owndata)
+        self.assertEqual(closes.tolist(), [3, 4, 5])
+        self.assertEqual(ds.getCloseDataSeries().getDateTimesAsArray().tolist(), ds.getDateTimes())
+        self.assertEqual(ds.getDateTimesAsArray(1).tolist(), ds.getDateTimes()[1:])
+        # Bars are not numeric, just like with BarDataSeries.
+        self.assertEqual(ds.asarray(3).tolist(), [])
+        for barDS in [ds, bards.BarDataSeries()]:
+            barDS.append(self.__buildBar(firstDt + datetime.timedelta(seconds=3), 3))
+            with self.assertRaises(TypeError):
+                barDS.asarray()
+
+    def testEventOrder(self):
+        def subscribe(ds, events):
+            for name, dataSeries in [
+                ("bar", ds), ("open", ds.getOpenDataSeries()), ("high", ds.getHighDataSeries()),
+                ("low", ds.getLowDataSeries()), ("close", ds.getCloseDataSeries()),
+                ("volume", ds.getVolumeDataSeries()), ("adjClose", ds.getAdjCloseDataSeries()),
+                ("spread", ds.getExtraDataSeries("spread"))
+            ]:
+                dataSeries.getNewValueEvent().subscribe(
+                    lambda dataSeries, dateTime, value, name=name: events.append((name, dateTime))
+                )
+
+        expected = []
+        events = []
+        barDS = bards.BarDataSeries()
+        ds = bards.ColumnarBarDataSeries()
+        subscribe(barDS, expected)
+        subscribe(ds, events)
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i, extra in enumerate([{"spread": 0.5}, {}, {"spread": 0.25}]):
+            bar_ = self.__buildBar(firstDt + datetime.timedelta(seconds=i), i, extra)
+            barDS.append(bar_)
+            ds.append(bar_)
+        self.assertEqual(len(expected), 23)
+        self.assertEqual(events, expected)
+
+    def testFrequencyColumn(self):
+        ds = bards.ColumnarBarDataSeries()
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in range(3):
+            ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i))
+        self.assertTrue(ds._ColumnarBarDataSeries__frequency.isTyped())
+        self.assertEqual(ds[0].getFrequency(), bar.Frequency.SECOND)
+        self.assertEqual(type(ds[0].getFrequency()), int)
+
+    def testDateTimeLookup(self):
+        ds = bards.ColumnarBarDataSeries()
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in range(3):
+            ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i))
+        self.assertEqual(ds.getIndexAt(firstDt + datetime.timedelta(seconds=1)), 1)
+        self.assertEqual(ds.valueAt(firstDt + datetime.timedelta(seconds=10)).getDateTime(), ds[-1].getDateTime())
+        self.assertEqual(len(ds.sliceByDate(firstDt + datetime.timedelta(seconds=1))), 2)
+
+    def testStorageDir(self):
+        with common.TmpDir() as tmpPath:
+            ds = bards.ColumnarBarDataSeries(maxLen=2, storageDir=tmpPath)
+            firstDt = datetime.datetime(2000, 1, 1)
+            for i in range(5):
+                ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i, {"spread": float(i)}))
+            self.assertEqual(ds.getMaxLen(), None)
+            self.assertEqual(len(ds), 5)
+            self.assertEqual(ds[0].getOpen(), 2)
+            self.assertEqual(ds[0].getFrequency(), bar.Frequency.SECOND)
+            self.assertEqual(ds.getCloseDataSeries()[:], [3, 4, 5, 6, 7])
+            self.assertEqual(ds.getExtraDataSeries("spread")[-1], 4)
+
+    def testAdjustedValues(self):
+        ds = bards.ColumnarBarDataSeries()
+        ds.setUseAdjustedValues(True)
+        firstDt = datetime.datetime(2000, 1, 1)
+        for i in range(2):
+            ds.append(self.__buildBar(firstDt + datetime.timedelta(seconds=i), i))
+        self.assertTrue(ds[0].getUseAdjValue())
+        self.assertEqual(ds.getPriceDataSeries(), ds.getAdjCloseDataSeries())
+
+
 class TestDateAlignedDataSeries(common.TestCase):
     def testNotAligned(self):
         size = 20
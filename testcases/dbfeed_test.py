@@ -18,7 +18,10 @@
 .. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
 """
 
+import datetime
 import os
+import shutil
+import sqlite3
 
 import common
 import feed_test
@@ -125,3 +128,154 @@ class SQLiteFeedTestCase(common.TestCase):
             self.assertEqual(len(barDS.getHighDataSeries()), 2)
             self.assertEqual(len(barDS.getLowDataSeries()), 2)
             self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
+
+    def testAddBarSequence(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            yahooBars = [bars["orcl"] for dateTime, bars in yahooFeed]
+
+            # Add the bars in small transactions, and then add them again to replace them.
+            db = tmpFeed.getFeed().getDatabase()
+            db.setBatchSize(100)
+            db.addBarSequence("orcl", yahooBars[:150], bar.Frequency.DAY)
+            db.addBarSequence("orcl", yahooBars, bar.Frequency.DAY)
+
+            sqliteBars = db.getBars("orcl", bar.Frequency.DAY)
+            self.assertEqual(len(sqliteBars), len(yahooBars))
+            for yahooBar, sqliteBar in zip(yahooBars, sqliteBars):
+                self.assertEqual(yahooBar.getDateTime(), sqliteBar.getDateTime().replace(tzinfo=None))
+                self.assertEqual(yahooBar.getClose(), sqliteBar.getClose())
+                self.assertEqual(yahooBar.getAdjClose(), sqliteBar.getAdjClose())
+
+    def testAddBarSequenceRollback(self):
+        tmpFeed = TemporarySQLiteFeed(SQLiteFeedTestCase.dbName, bar.Frequency.DAY)
+        with tmpFeed:
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            yahooBars = [bars["orcl"] for dateTime, bars in yahooFeed]
+            # Volume can't be NULL.
+            invalidBar = bar.BasicBar(datetime.datetime(2001, 1, 2), 1, 1, 1, 1, None, None, bar.Frequency.DAY)
+
+            db = tmpFeed.getFeed().getDatabase()
+            with self.assertRaises(sqlite3.IntegrityError):
+                db.addBarSequence("orcl", yahooBars + [invalidBar], bar.Frequency.DAY)
+            self.assertEqual(db.getBars("orcl", bar.Frequency.DAY), [])
+
+            db.addBarSequence("orcl", yahooBars, bar.Frequency.DAY)
+            self.assertEqual(len(db.getBars("orcl", bar.Frequency.DAY)), len(yahooBars))
+
+
+def get_bar_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        for instrument in sorted(bars.getInstruments()):
+            bar_ = bars[instrument]
+            ret.append((
+                instrument, str(bar_.getDateTime()), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(),
+                bar_.getVolume(), bar_.getAdjClose(), bar_.getFrequency()
+            ))
+    return ret
+
+
+class SQLiteStreamingFeedTestCase(common.TestCase):
+    dbPath = common.get_data_file_path("multiinstrument.sqlite")
+
+    def __buildFeed(self, *args, **kwargs):
+        ret = sqlitefeed.Feed(SQLiteStreamingFeedTestCase.dbPath, bar.Frequency.DAY)
+        for instrument in ["^n225", "spy"]:
+            ret.loadBars(instrument, *args, **kwargs)
+        return ret
+
+    def __buildStreamingFeed(self, *args, **kwargs):
+        ret = sqlitefeed.StreamingFeed(SQLiteStreamingFeedTestCase.dbPath, bar.Frequency.DAY, fetchSize=7)
+        ret.loadBars(["^n225", "spy"], *args, **kwargs)
+        return ret
+
+    def testSameBarsAsFeed(self):
+        expected = get_bar_values(self.__buildFeed())
+        self.assertEqual(len(expected), 504 + 489)
+        self.assertEqual(get_bar_values(self.__buildStreamingFeed()), expected)
+
+    def testTimezoneAndRange(self):
+        timezone = marketsession.USEquities.getTimezone()
+        fromDateTime = datetime.datetime(2010, 3, 1)
+        toDateTime = datetime.datetime(2010, 6, 1)
+        expected = get_bar_values(self.__buildFeed(timezone, fromDateTime, toDateTime))
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(get_bar_values(self.__buildStreamingFeed(timezone, fromDateTime, toDateTime)), expected)
+
+    def testReset(self):
+        barFeed = self.__buildStreamingFeed()
+        expected = get_bar_values(barFeed)
+        barFeed.reset()
+        self.assertEqual(get_bar_values(barFeed), expected)
+
+    def testLoadTwice(self):
+        barFeed = self.__buildStreamingFeed()
+        with self.assertRaisesRegexp(Exception, "Bars were already loaded"):
+            barFeed.loadBars(["spy"])
+
+    def testBaseFeedInterface(self):
+        feed_test.tstBaseFeedInterface(self, self.__buildStreamingFeed())
+
+
+class SQLiteSchemaTestCase(common.TestCase):
+    def __getBarValues(self, db):
+        ret = []
+        for instrument in ["spy", "^n225"]:
+            for bar_ in db.getBars(instrument, bar.Frequency.DAY):
+                ret.append((instrument, bar_.getDateTime(), bar_.getOpen(), bar_.getClose(), bar_.getAdjClose()))
+        return ret
+
+    def testUpgradeSchema(self):
+        with common.TmpDir() as tmpPath:
+            dbPath = os.path.join(tmpPath, "multiinstrument.sqlite")
+            shutil.copyfile(common.get_data_file_path("multiinstrument.sqlite"), dbPath)
+
+            db = sqlitefeed.Database(dbPath)
+            self.assertEqual(db.getSchemaVersion(), 0)
+            expected = self.__getBarValues(db)
+            db.upgradeSchema()
+            self.assertEqual(db.getSchemaVersion(), sqlitefeed.SCHEMA_VERSION)
+            db.disconnect()
+
+            db = sqlitefeed.Database(dbPath)
+            self.assertEqual(db.getSchemaVersion(), sqlitefeed.SCHEMA_VERSION)
+            self.assertEqual(self.__getBarValues(db), expected)
+            # Upgrading again does nothing.
+            db.upgradeSchema()
+            db.disconnect()
+
+    def testNewDatabase(self):
+        with common.TmpDir() as tmpPath:
+            dbPath = os.path.join(tmpPath, "new.sqlite")
+            reader = sqlitefeed.Database(dbPath)
+            reader.enableReadOptimizations()
+            self.assertEqual(reader.getSchemaVersion(), sqlitefeed.SCHEMA_VERSION)
+            self.assertEqual(reader.getBars("orcl", bar.Frequency.DAY), [])
+
+            # Instruments added using a different connection are found.
+            yahooFeed = yahoofeed.Feed()
+            yahooFeed.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+            writer = sqlitefeed.Database(dbPath)
+            writer.addBarsFromFeed(yahooFeed)
+            writer.disconnect()
+            self.assertEqual(len(reader.getBars("orcl", bar.Frequency.DAY)), 252)
+            reader.disconnect()
+
+    def testMergeQueryPlan(self):
+        with common.TmpDir() as tmpPath:
+            dbPath = os.path.join(tmpPath, "new.sqlite")
+            sqlitefeed.Database(dbPath).disconnect()
+            connection = sqlite3.connect(dbPath)
+            # Instruments are merged reading the index in order, instead of sorting every row.
+            plan = " ".join(row[-1] for row in connection.execute(
+                "explain query plan select timestamp, instrument_id, open, high, low, close, volume, adj_close"
+                " from bar where instrument_id in (1, 2) and frequency = ? and timestamp >= ?"
+                " order by timestamp asc, instrument_id asc", [bar.Frequency.DAY, 0]
+            ))
+            connection.close()
+            self.assertTrue("bar_by_timestamp" in plan)
+            self.assertFalse("TEMP B-TREE" in plan)
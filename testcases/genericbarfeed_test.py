@@ -0,0 +1,265 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import os
+
+import pytz
+
+import common
+import barfeed_test
+import feed_test
+
+from pyalgotrade.barfeed import csvfeed
+from pyalgotrade import bar
+
+
+def build_feed(feedClass, frequency, files, dateTimeFormat=None, barFilter=None, timezone=None):
+    ret = feedClass(frequency, timezone=timezone)
+    if dateTimeFormat is not None:
+        ret.setDateTimeFormat(dateTimeFormat)
+        ret.setColumnName("datetime", "Date")
+    if barFilter is not None:
+        ret.setBarFilter(barFilter)
+    for instrument, fileName in files:
+        ret.addBarsFromCSV(instrument, common.get_data_file_path(fileName))
+    return ret
+
+
+def get_bar_values(barFeed):
+    ret = []
+    for dateTime, bars in barFeed:
+        for instrument in sorted(bars.getInstruments()):
+            bar_ = bars[instrument]
+            ret.append((
+                dateTime, instrument, bar_.getDateTime(), bar_.getOpen(), bar_.getHigh(), bar_.getLow(),
+                bar_.getClose(), bar_.getVolume(), bar_.getAdjClose(), bar_.getFrequency()
+            ))
+    return ret
+
+
+# A small buffer to check that bars are read in chunks.
+def GenericStreamingBarFeed(frequency, timezone=None):
+    return csvfeed.GenericStreamingBarFeed(frequency, timezone=timezone, bufferSize=7)
+
+
+def write_csv(path, lines):
+    with open(path, "w") as f:
+        f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+        for line in lines:
+            f.write(line + "\n")
+
+
+class ColumnarFeedTestCase(common.TestCase):
+    def __assertSameBars(self, *args, **kwargs):
+        expected = get_bar_values(build_feed(csvfeed.GenericBarFeed, *args, **kwargs))
+        bars = get_bar_values(build_feed(csvfeed.GenericColumnarBarFeed, *args, **kwargs))
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(bars, expected)
+
+    def testSameBarsAsGenericBarFeed(self):
+        self.__assertSameBars(
+            bar.Frequency.DAY, [("spy", "spy-2010-yahoofinance.csv"), ("nikkei", "nikkei-2010-yahoofinance.csv")],
+            "%Y-%m-%d"
+        )
+
+    def testSameBarsInChunks(self):
+        self.__assertSameBars(
+            bar.Frequency.DAY, [("orcl", "orcl-2001-yahoofinance.csv"), ("orcl", "orcl-2000-yahoofinance.csv")],
+            "%Y-%m-%d"
+        )
+
+    def testSameBarsWithTimezone(self):
+        self.__assertSameBars(
+            bar.Frequency.MINUTE * 30, [("btc", "30min-bitstampUSD-2.csv")], timezone=pytz.timezone("US/Eastern")
+        )
+
+    def testSameBarsWithBarFilter(self):
+        self.__assertSameBars(
+            bar.Frequency.DAY, [("spy", "spy-2010-yahoofinance.csv")], "%Y-%m-%d",
+            csvfeed.DateRangeFilter(datetime.datetime(2010, 3, 1), datetime.datetime(2010, 4, 1))
+        )
+
+    def testBaseBarFeed(self):
+        barFeed = build_feed(
+            csvfeed.GenericColumnarBarFeed, bar.Frequency.DAY, [("orcl", "orcl-2000-yahoofinance.csv")], "%Y-%m-%d"
+        )
+        barfeed_test.check_base_barfeed(self, barFeed, True)
+
+    def testBaseFeedInterface(self):
+        barFeed = build_feed(
+            csvfeed.GenericColumnarBarFeed, bar.Frequency.DAY, [("orcl", "orcl-2000-yahoofinance.csv")], "%Y-%m-%d"
+        )
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testDuplicateBars(self):
+        barFeed = build_feed(
+            csvfeed.GenericColumnarBarFeed, bar.Frequency.DAY,
+            [("orcl", "orcl-2000-yahoofinance.csv"), ("orcl", "orcl-2000-yahoofinance.csv")], "%Y-%m-%d"
+        )
+        with self.assertRaisesRegexp(Exception, r"Duplicate bars found for \['orcl'\] on 2000-01-03 00:00:00"):
+            barFeed.start()
+
+    def testAdjCloseMismatch(self):
+        barFeed = build_feed(
+            csvfeed.GenericColumnarBarFeed, bar.Frequency.DAY, [("orcl", "orcl-2000-yahoofinance.csv")], "%Y-%m-%d"
+        )
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "noadjclose.csv")
+            with open(path, "w") as f:
+                f.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2001-01-01,10,11,9,10,1,\n")
+            with self.assertRaisesRegexp(Exception, "Previous bars had adjusted close and these ones don't have."):
+                barFeed.addBarsFromCSV("spy", path)
+
+    def testAddAfterStart(self):
+        barFeed = build_feed(
+            csvfeed.GenericColumnarBarFeed, bar.Frequency.DAY, [("orcl", "orcl-2000-yahoofinance.csv")], "%Y-%m-%d"
+        )
+        barFeed.start()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            barFeed.addBarsFromCSV("spy", common.get_data_file_path("spy-2010-yahoofinance.csv"))
+
+    def testInvalidBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "invalid.csv")
+            write_csv(path, [
+                "2000-01-01 00:00:00,10,11,9,10,1,",
+                "2000-01-02 00:00:00,10,11,9,12,1,",
+            ])
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            with self.assertRaisesRegexp(Exception, "high < close on 2000-01-02 00:00:00"):
+                barFeed.addBarsFromCSV("orcl", path)
+
+    def testExtraColumns(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "extra.csv")
+            with open(path, "w") as f:
+                f.write("Date Time,Open,High,Low,Close,Volume,Adj Close,Trades\n")
+                f.write("2000-01-01 00:00:00,10,11,9,10,1,,5\n")
+            barFeed = csvfeed.GenericColumnarBarFeed(bar.Frequency.DAY)
+            barFeed.addBarsFromCSV("orcl", path)
+            for dateTime, bars in barFeed:
+                self.assertEqual(bars["orcl"].getExtraColumns(), {"Trades": 5})
+
+
+class StreamingFeedTestCase(common.TestCase):
+    def __assertSameBars(self, *args, **kwargs):
+        expected = get_bar_values(build_feed(csvfeed.GenericBarFeed, *args, **kwargs))
+        bars = get_bar_values(build_feed(GenericStreamingBarFeed, *args, **kwargs))
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(bars, expected)
+
+    # Splits a data file in two, and returns the paths to both halves.
+    def __splitFile(self, tmpPath, fileName):
+        with open(common.get_data_file_path(fileName)) as f:
+            lines = f.readlines()
+        half = len(lines) / 2
+        ret = []
+        for i, chunk in enumerate([lines[1:half], lines[half:]]):
+            path = os.path.join(tmpPath, "%d-%s" % (i, fileName))
+            with open(path, "w") as f:
+                f.writelines([lines[0]] + chunk)
+            ret.append(path)
+        return ret
+
+    def testSameBarsAsGenericBarFeed(self):
+        self.__assertSameBars(
+            bar.Frequency.DAY, [("spy", "sharpe-ratio-test-spy.csv"), ("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+
+    def testSameBarsInChunks(self):
+        with common.TmpDir() as tmpPath:
+            paths = self.__splitFile(tmpPath, "30min-bitstampUSD-2.csv")
+            self.__assertSameBars(bar.Frequency.MINUTE * 30, [("btc", path) for path in paths])
+
+    def testSameBarsWithTimezone(self):
+        self.__assertSameBars(
+            bar.Frequency.MINUTE * 30, [("btc", "30min-bitstampUSD-2.csv")], timezone=pytz.timezone("US/Eastern")
+        )
+
+    def testSameBarsWithBarFilter(self):
+        self.__assertSameBars(
+            bar.Frequency.DAY, [("spy", "sharpe-ratio-test-spy.csv")], "%Y-%m-%d",
+            csvfeed.DateRangeFilter(datetime.datetime(2003, 3, 1), datetime.datetime(2003, 4, 1))
+        )
+
+    def testReset(self):
+        barFeed = build_feed(
+            GenericStreamingBarFeed, bar.Frequency.DAY,
+            [("spy", "sharpe-ratio-test-spy.csv"), ("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+        expected = get_bar_values(barFeed)
+        barFeed.reset()
+        self.assertEqual(get_bar_values(barFeed), expected)
+
+    def testBaseBarFeed(self):
+        barFeed = build_feed(
+            GenericStreamingBarFeed, bar.Frequency.DAY, [("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+        barfeed_test.check_base_barfeed(self, barFeed, True)
+
+    def testBaseFeedInterface(self):
+        barFeed = build_feed(
+            GenericStreamingBarFeed, bar.Frequency.DAY, [("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+        feed_test.tstBaseFeedInterface(self, barFeed)
+
+    def testUnsortedFiles(self):
+        with common.TmpDir() as tmpPath:
+            paths = self.__splitFile(tmpPath, "30min-bitstampUSD-2.csv")
+            barFeed = build_feed(
+                GenericStreamingBarFeed, bar.Frequency.MINUTE * 30, [("btc", path) for path in reversed(paths)]
+            )
+            with self.assertRaisesRegexp(Exception, "Bars for btc are not sorted. 2014-06-23 22:00:00 comes after .*"):
+                [bars for bars in barFeed]
+
+    def testDuplicateBars(self):
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "duplicate.csv")
+            write_csv(path, [
+                "2000-01-01 00:00:00,10,11,9,10,1,",
+                "2000-01-02 00:00:00,10,11,9,10,1,",
+                "2000-01-02 00:00:00,10,11,9,10,1,",
+            ])
+            barFeed = build_feed(GenericStreamingBarFeed, bar.Frequency.DAY, [("orcl", path)])
+            with self.assertRaisesRegexp(Exception, r"Duplicate bars found for \['orcl'\] on 2000-01-02 00:00:00"):
+                [bars for bars in barFeed]
+
+    def testAdjCloseMismatch(self):
+        barFeed = build_feed(
+            GenericStreamingBarFeed, bar.Frequency.DAY, [("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+        self.assertTrue(barFeed.barsHaveAdjClose())
+        with common.TmpDir() as tmpPath:
+            path = os.path.join(tmpPath, "noadjclose.csv")
+            with open(path, "w") as f:
+                f.write("Date,Open,High,Low,Close,Volume,Adj Close\n")
+                f.write("2001-01-01,10,11,9,10,1,\n")
+            with self.assertRaisesRegexp(Exception, "Previous bars had adjusted close and these ones don't have."):
+                barFeed.addBarsFromCSV("spy", path)
+
+    def testAddAfterStart(self):
+        barFeed = build_feed(
+            GenericStreamingBarFeed, bar.Frequency.DAY, [("ige", "sharpe-ratio-test-ige.csv")], "%Y-%m-%d"
+        )
+        barFeed.start()
+        with self.assertRaisesRegexp(Exception, "Can't add more bars once you started consuming bars"):
+            barFeed.addBarsFromCSV("spy", common.get_data_file_path("sharpe-ratio-test-spy.csv"))
@@ -0,0 +1,130 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+
+import common
+
+from pyalgotrade.barfeed import membf
+from pyalgotrade import bar
+
+
+class TestBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return False
+
+
+def build_bars(dateTimes):
+    return [bar.BasicBar(dateTime, 1, 1, 1, 1, 1, None, bar.Frequency.DAY) for dateTime in dateTimes]
+
+
+class BarFeedTestCase(common.TestCase):
+    def testMergeInstruments(self):
+        self.__testMergeInstruments(False)
+
+    def testMergeInstrumentsCompiled(self):
+        self.__testMergeInstruments(True)
+
+    def __testMergeInstruments(self, useCompiledTimeline):
+        now = datetime.datetime(2000, 1, 1)
+        expected = {}
+        barFeed = TestBarFeed(bar.Frequency.DAY)
+        barFeed.setUseCompiledTimeline(useCompiledTimeline)
+        # Instruments with different and partially overlapping datetimes.
+        for i in xrange(20):
+            dateTimes = [now + datetime.timedelta(days=j) for j in xrange(i, 100, i % 3 + 1)]
+            barFeed.addBarsFromSequence("instrument_%d" % i, build_bars(dateTimes))
+            for dateTime in dateTimes:
+                expected.setdefault(dateTime, set()).add("instrument_%d" % i)
+
+        for i in xrange(2):
+            values = []
+            self.assertEqual(barFeed.peekDateTime(), min(expected.keys()))
+            for dateTime, bars in barFeed:
+                values.append((dateTime, set(bars.getInstruments())))
+            self.assertTrue(barFeed.eof())
+            self.assertEqual(barFeed.peekDateTime(), None)
+            self.assertEqual(values, sorted(expected.items()))
+            # Bars are available again after a reset.
+            barFeed.reset()
+
+    def testDuplicateBars(self):
+        now = datetime.datetime(2000, 1, 1)
+        barFeed = TestBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", build_bars([now, now + datetime.timedelta(days=1)]))
+        barFeed.addBarsFromSequence("ibm", build_bars([now + datetime.timedelta(days=1)] * 2))
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.loadAll()
+
+    def testDuplicateBarsCompiled(self):
+        now = datetime.datetime(2000, 1, 1)
+        barFeed = TestBarFeed(bar.Frequency.DAY)
+        barFeed.setUseCompiledTimeline(True)
+        barFeed.addBarsFromSequence("orcl", build_bars([now, now + datetime.timedelta(days=1)]))
+        barFeed.addBarsFromSequence("ibm", build_bars([now + datetime.timedelta(days=1)] * 2))
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.start()
+
+    def testCompiledTimeline(self):
+        now = datetime.datetime(2000, 1, 1)
+        barFeed = TestBarFeed(bar.Frequency.DAY)
+        barFeed.setUseCompiledTimeline(True)
+        barFeed.addBarsFromSequence("orcl", build_bars([now + datetime.timedelta(days=i) for i in xrange(10)]))
+        self.assertEqual(barFeed.getCompiledTimelineMemoryUsage(), None)
+
+        barFeed.start()
+        self.assertTrue(barFeed.getCompiledTimelineMemoryUsage() > 0)
+        with self.assertRaisesRegexp(Exception, "Can't change the timeline mode once you started consuming bars"):
+            barFeed.setUseCompiledTimeline(False)
+
+        # The same Bars instances are replayed after a reset.
+        firstRun = [bars for dateTime, bars in barFeed]
+        barFeed.reset()
+        secondRun = [bars for dateTime, bars in barFeed]
+        self.assertEqual(len(firstRun), 10)
+        self.assertEqual(len(barFeed["orcl"]), 10)
+        for bars1, bars2 in zip(firstRun, secondRun):
+            self.assertTrue(bars1 is bars2)
+
+    def testAddBarsInChunks(self):
+        now = datetime.datetime(2000, 1, 1)
+        dateTimes = [now + datetime.timedelta(minutes=i) for i in xrange(100)]
+        barFeed = TestBarFeed(bar.Frequency.MINUTE)
+        # In order, unsorted, and before the bars already added.
+        barFeed.addBarsFromSequence("orcl", build_bars(dateTimes[50:70]))
+        barFeed.addBarsFromSequence("orcl", build_bars(dateTimes[70:]))
+        barFeed.addBarsFromSequence("orcl", build_bars(reversed(dateTimes[20:50])))
+        barFeed.addBarsFromSequence("orcl", build_bars(dateTimes[:20]))
+        barFeed.addBarsFromSequence("orcl", [])
+        self.assertEqual([dateTime for dateTime, bars in barFeed], dateTimes)
+
+    def testAddBarsKeepsOrderForSameDateTimes(self):
+        now = datetime.datetime(2000, 1, 1)
+        bars1 = build_bars([now, now + datetime.timedelta(days=2)])
+        bars2 = build_bars([now + datetime.timedelta(days=2), now + datetime.timedelta(days=1)])
+        barFeed = TestBarFeed(bar.Frequency.DAY)
+        barFeed.addBarsFromSequence("orcl", bars1)
+        barFeed.addBarsFromSequence("orcl", bars2)
+        barFeed.start()
+        self.assertTrue(barFeed.getNextBars()["orcl"] is bars1[0])
+        self.assertTrue(barFeed.getNextBars()["orcl"] is bars2[1])
+        self.assertTrue(barFeed.getNextBars()["orcl"] is bars1[1])
+        with self.assertRaisesRegexp(Exception, "Duplicate bars found for.*"):
+            barFeed.getNextBars()
@@ -97,3 +97,8 @@ class TestCase(common.TestCase):
         feed.loadBars("^n225", marketsession.TSE.getTimezone())
         feed.loadBars("spy", marketsession.USEquities.getTimezone())
         self.__testDifferentTimezonesImpl(feed)
+
+    def testDifferentTimezones_StreamingDBFeed(self):
+        feed = sqlitefeed.StreamingFeed(common.get_data_file_path("multiinstrument.sqlite"), bar.Frequency.DAY)
+        feed.loadBars(["^n225", "spy"])
+        self.__testDifferentTimezonesImpl(feed)
@@ -20,6 +20,11 @@
 
 import datetime
 import copy
+import threading
+import time
+import Queue
+
+import pytz
 
 import common
 
@@ -95,6 +100,83 @@ class RealtimeFeed(observer.Subject):
         return self.__priority
 
 
+class PassiveSubject(observer.Subject):
+    def __init__(self, subject):
+        super(PassiveSubject, self).__init__()
+        self.__subject = subject
+        self.dispatchCalls = 0
+
+    def start(self):
+        super(PassiveSubject, self).start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__subject.eof()
+
+    def dispatch(self):
+        self.dispatchCalls += 1
+
+    def peekDateTime(self):
+        return None
+
+    def isPassive(self):
+        return True
+
+
+# A realtime subject that gets values from another thread and wakes up the dispatcher when they arrive.
+class QueueFeed(observer.Subject):
+    def __init__(self):
+        super(QueueFeed, self).__init__()
+        self.__queue = dispatcher.NotifyingQueue()
+        self.__event = observer.Event()
+        self.__eof = False
+
+    def getQueue(self):
+        return self.__queue
+
+    def getEvent(self):
+        return self.__event
+
+    def start(self):
+        super(QueueFeed, self).start()
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def eof(self):
+        return self.__eof
+
+    def dispatch(self):
+        ret = False
+        try:
+            value = self.__queue.get(False)
+            if value is None:
+                self.__eof = True
+            else:
+                self.__event.emit(value)
+                ret = True
+        except Queue.Empty:
+            pass
+        return ret
+
+    def peekDateTime(self):
+        return None
+
+    def onDispatcherRegistered(self, dispatcher):
+        self.__queue.setDispatcher(dispatcher)
+
+    def wakesUpDispatcher(self):
+        return True
+
+
 class DispatcherTestCase(common.TestCase):
     def test1NrtFeed(self):
         values = []
@@ -222,6 +304,177 @@ class DispatcherTestCase(common.TestCase):
         # Check that although feed2 is realtime, feed1 was dispatched before.
         self.assertTrue(values[0] < values[1])
 
+    def testDifferentTimezones(self):
+        values = []
+        utcDateTime = pytz.utc.localize(datetime.datetime(2000, 1, 1, 15))
+        easternDateTime = utcDateTime.astimezone(pytz.timezone("US/Eastern"))
+        nrtFeed1 = NonRealtimeFeed([utcDateTime, utcDateTime + datetime.timedelta(hours=1)])
+        nrtFeed2 = NonRealtimeFeed([easternDateTime])
+        self.assertEqual(nrtFeed2.peekTimestamp(), nrtFeed1.peekTimestamp())
+
+        disp = dispatcher.Dispatcher()
+        nrtFeed1.getEvent().subscribe(lambda x: values.append((x, disp.getCurrentDateTime())))
+        nrtFeed2.getEvent().subscribe(lambda x: values.append((x, disp.getCurrentDateTime())))
+        disp.addSubject(nrtFeed1)
+        disp.addSubject(nrtFeed2)
+        disp.run()
+
+        # Events for the same instant are dispatched together, even if the datetimes are in different timezones.
+        self.assertEqual(values[0], (utcDateTime, utcDateTime))
+        self.assertEqual(values[1], (easternDateTime, utcDateTime))
+        self.assertEqual(values[2][0], utcDateTime + datetime.timedelta(hours=1))
+
+    def testManySubjects(self):
+        values = []
+        now = datetime.datetime(2000, 1, 1)
+        disp = dispatcher.Dispatcher()
+        # Subjects with interleaved datetimes, some of them sharing datetimes with others.
+        for i in xrange(50):
+            datetimes = [now + datetime.timedelta(seconds=j) for j in xrange(i % 7, 100, i % 5 + 1)]
+            nrtFeed = NonRealtimeFeed(datetimes)
+            nrtFeed.getEvent().subscribe(lambda x, i=i: values.append((x, disp.getCurrentDateTime(), i)))
+            disp.addSubject(nrtFeed)
+        rtValues = []
+        rtFeed = RealtimeFeed([now + datetime.timedelta(seconds=i) for i in xrange(10)])
+        rtFeed.getEvent().subscribe(lambda x: rtValues.append(x))
+        disp.addSubject(rtFeed)
+        disp.run()
+
+        expected = []
+        for i in xrange(50):
+            expected.extend([(now + datetime.timedelta(seconds=j), i) for j in xrange(i % 7, 100, i % 5 + 1)])
+        # Events are dispatched in datetime order, and subjects with the same datetime in the order they were added.
+        expected.sort(key=lambda value: value[0])
+        self.assertEqual([(value[0], value[2]) for value in values], expected)
+        self.assertEqual([value[0] for value in values], [value[1] for value in values])
+        self.assertEqual(len(rtValues), 10)
+
+    def testSingleSubject(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes = [now + datetime.timedelta(seconds=i) for i in xrange(10)]
+        nrtFeed = NonRealtimeFeed(copy.copy(datetimes))
+        passiveSubject = PassiveSubject(nrtFeed)
+
+        disp = dispatcher.Dispatcher()
+        nrtFeed.getEvent().subscribe(lambda x: values.append((x, disp.getCurrentDateTime())))
+        disp.addSubject(passiveSubject)
+        disp.addSubject(nrtFeed)
+        disp.run()
+
+        self.assertEqual(values, zip(datetimes, datetimes))
+        # Passive subjects are not dispatched when there is a single non-realtime subject.
+        self.assertEqual(passiveSubject.dispatchCalls, 0)
+
+    def testSingleSubjectAddingSubjects(self):
+        values = []
+        now = datetime.datetime.now()
+        datetimes1 = [now + datetime.timedelta(seconds=i) for i in xrange(0, 10, 2)]
+        datetimes2 = [now + datetime.timedelta(seconds=i) for i in xrange(1, 10, 2)]
+        nrtFeed1 = NonRealtimeFeed(copy.copy(datetimes1))
+        nrtFeed2 = NonRealtimeFeed(copy.copy(datetimes2))
+        nrtFeed2.getEvent().subscribe(lambda x: values.append(x))
+
+        disp = dispatcher.Dispatcher()
+
+        # Add the second subject while the first one is being dispatched on its own.
+        def onEvent(dateTime):
+            values.append(dateTime)
+            disp.addSubject(nrtFeed2)
+
+        nrtFeed1.getEvent().subscribe(onEvent)
+        disp.addSubject(nrtFeed1)
+        disp.run()
+
+        self.assertEqual(values, sorted(datetimes1 + datetimes2))
+
+    def testWakeUp(self):
+        values = []
+        idleCalls = []
+        queueFeed = QueueFeed()
+        queueFeed.getEvent().subscribe(lambda x: values.append(x))
+
+        disp = dispatcher.Dispatcher()
+        disp.getIdleEvent().subscribe(lambda: idleCalls.append(1))
+        disp.addSubject(queueFeed)
+
+        def produce():
+            for i in xrange(5):
+                time.sleep(0.05)
+                queueFeed.getQueue().put(i)
+            queueFeed.getQueue().put(None)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        disp.run()
+        producer.join()
+
+        self.assertEqual(values, range(5))
+        # The dispatcher should have been sleeping instead of polling.
+        self.assertTrue(len(idleCalls) < 50)
+
+    def testWakeUpWithPassiveSubject(self):
+        # Like a live feed and a paper trading broker. The passive subject doesn't wake up the dispatcher, but it
+        # shouldn't keep it from sleeping.
+        values = []
+        queueFeed = QueueFeed()
+        queueFeed.getEvent().subscribe(lambda x: values.append(x))
+        passiveSubject = PassiveSubject(queueFeed)
+
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(queueFeed)
+        disp.addSubject(passiveSubject)
+        disp.setMetricsEnabled(True)
+
+        def produce():
+            for i in xrange(5):
+                time.sleep(0.05)
+                queueFeed.getQueue().put(i)
+            queueFeed.getQueue().put(None)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        disp.run()
+        producer.join()
+
+        self.assertEqual(values, range(5))
+        self.assertTrue(disp.getMetrics().getIdleIterations() < 50)
+        self.assertTrue(passiveSubject.dispatchCalls < 50)
+
+    def testStopWhileWaiting(self):
+        queueFeed = QueueFeed()
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(queueFeed)
+
+        timer = threading.Timer(0.05, disp.stop)
+        timer.start()
+        begin = time.time()
+        disp.run()
+        timer.join()
+        self.assertTrue(time.time() - begin < 1)
+
+    def testMetrics(self):
+        now = datetime.datetime.now()
+        nrtFeed = NonRealtimeFeed([now + datetime.timedelta(seconds=i) for i in xrange(10)])
+        rtFeed = RealtimeFeed([now + datetime.timedelta(seconds=i) for i in xrange(5)])
+
+        disp = dispatcher.Dispatcher()
+        disp.addSubject(nrtFeed)
+        disp.addSubject(rtFeed)
+        disp.setMetricsEnabled(True)
+        disp.run()
+
+        metrics = disp.getMetrics()
+        self.assertEqual(metrics.getSubjects(), [nrtFeed, rtFeed])
+        self.assertEqual(metrics.getIterations(), 10)
+        self.assertEqual(metrics.getIdleIterations(), 0)
+        self.assertEqual(metrics.getSubjectMetrics(nrtFeed).getDispatchCount(), 10)
+        self.assertEqual(metrics.getSubjectMetrics(nrtFeed).getEventCount(), 10)
+        self.assertEqual(metrics.getSubjectMetrics(rtFeed).getDispatchCount(), 5)
+        self.assertEqual(metrics.getSubjectMetrics(nrtFeed).getName(), "NonRealtimeFeed_1")
+        self.assertEqual(metrics.getSubjectMetrics(rtFeed).getName(), "RealtimeFeed_2")
+        self.assertEqual(len(str(metrics).split("\n")), 3)
+
 
 class EventTestCase(common.TestCase):
     def testEmitOrder(self):
@@ -285,3 +538,35 @@ class EventTestCase(common.TestCase):
         event.unsubscribe(handler2)
         event.emit()
         self.assertTrue(handlersData == [1, 1, 2, 2])
+
+    def testHasSubscribers(self):
+        def handler():
+            pass
+
+        event = observer.Event()
+        self.assertFalse(event.hasSubscribers())
+        event.subscribe(handler)
+        self.assertTrue(event.hasSubscribers())
+        event.unsubscribe(handler)
+        self.assertFalse(event.hasSubscribers())
+
+    def testUnsubscribeWhileEmitting(self):
+        handlersData = []
+        event = observer.Event()
+
+        def handler2():
+            handlersData.append(2)
+
+        def handler1():
+            handlersData.append(1)
+            event.unsubscribe(handler2)
+
+        event.subscribe(handler1)
+        event.subscribe(handler2)
+        # handler2 is unsubscribed after this emission.
+        event.emit()
+        self.assertEqual(handlersData, [1, 2])
+        event.unsubscribe(handler1)
+        event.emit()
+        self.assertEqual(handlersData, [1, 2])
+        self.assertFalse(event.hasSubscribers())
@@ -25,6 +25,7 @@ import common
 
 from pyalgotrade.optimizer import local
 from pyalgotrade import strategy
+from pyalgotrade import bar
 from pyalgotrade.barfeed import yahoofeed
 
 sys.path.append("samples")
@@ -55,6 +56,39 @@ class OptimizerTestCase(common.TestCase):
         self.assertEquals(round(res.getResult(), 2), 1295462.6)
         self.assertEquals(res.getParameters()[1], 20)
 
+    def testLocalWithSharedMemory(self):
+        barFeed = yahoofeed.Feed()
+        instrument = "orcl"
+        barFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        res = local.run(
+            sma_crossover.SMACrossOver, barFeed, parameters_generator(instrument, 5, 100), logLevel=logging.DEBUG,
+            useSharedMemory=True
+        )
+        self.assertEquals(round(res.getResult(), 2), 1295462.6)
+        self.assertEquals(res.getParameters()[1], 20)
+
+    def testSharedMemoryFallback(self):
+        # Bars with non numeric extra columns can't be shared, so they get sent to the workers.
+        instrument = "orcl"
+        csvFeed = yahoofeed.Feed()
+        csvFeed.addBarsFromCSV(instrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        bars = []
+        for dateTime, currentBars in csvFeed:
+            bar_ = currentBars[instrument]
+            bars.append(bar.BasicBar(
+                bar_.getDateTime(), bar_.getOpen(), bar_.getHigh(), bar_.getLow(), bar_.getClose(), bar_.getVolume(),
+                bar_.getAdjClose(), bar_.getFrequency(), {"source": "yahoo"}
+            ))
+        barFeed = yahoofeed.Feed()
+        barFeed.addBarsFromSequence(instrument, bars)
+        self.assertIsNone(local.build_shared_bar_store(barFeed))
+        res = local.run(
+            sma_crossover.SMACrossOver, barFeed, parameters_generator(instrument, 18, 22), logLevel=logging.DEBUG,
+            useSharedMemory=True
+        )
+        self.assertEquals(round(res.getResult(), 2), 1295462.6)
+        self.assertEquals(res.getParameters()[1], 20)
+
     def testFailingStrategy(self):
         barFeed = yahoofeed.Feed()
         instrument = "orcl"
@@ -26,6 +26,7 @@ import common
 from pyalgotrade.barfeed import ninjatraderfeed
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.barfeed import binaryfeed
 from pyalgotrade.tools import resample
 from pyalgotrade import marketsession
 from pyalgotrade.utils import dt
@@ -247,6 +248,31 @@ class DataSeriesTestCase(common.TestCase):
         self.assertEqual(resampledBarDS[0].getDateTime(), dt.as_utc(datetime.datetime(2011, 1, 3)))
         self.assertEqual(resampledBarDS[-1].getDateTime(), dt.as_utc(datetime.datetime(2011, 2, 1)))
 
+    def testResampleNinjaTraderHourToBinary(self):
+        with common.TmpDir() as tmp_path:
+            feed = ninjatraderfeed.Feed(ninjatraderfeed.Frequency.MINUTE)
+            feed.addBarsFromCSV("spy", common.get_data_file_path("nt-spy-minute-2011.csv"))
+            resampledBarDS = resampled_ds.ResampledBarDataSeries(feed["spy"], bar.Frequency.HOUR)
+            resampledFile = os.path.join(tmp_path, "hour-nt-spy-minute-2011.bars")
+            resample.resample_to_binary(feed, bar.Frequency.HOUR, resampledFile)
+            resampledBarDS.pushLast()
+
+            # Load the resampled file.
+            feed = binaryfeed.Feed(bar.Frequency.HOUR)
+            feed.addBarsFromFile(resampledFile)
+            feed.loadAll()
+
+        self.assertEqual(feed.getRegisteredInstruments(), ["spy"])
+        self.assertEqual(len(feed["spy"]), len(resampledBarDS))
+        for resampledBar, loadedBar in zip(resampledBarDS, feed["spy"]):
+            self.assertEqual(loadedBar.getDateTime(), resampledBar.getDateTime())
+            self.assertEqual(loadedBar.getOpen(), resampledBar.getOpen())
+            self.assertEqual(loadedBar.getHigh(), resampledBar.getHigh())
+            self.assertEqual(loadedBar.getLow(), resampledBar.getLow())
+            self.assertEqual(loadedBar.getClose(), resampledBar.getClose())
+            self.assertEqual(loadedBar.getVolume(), resampledBar.getVolume())
+            self.assertEqual(loadedBar.getAdjClose(), None)
+
     def testCheckNow(self):
         barDs = bards.BarDataSeries()
         resampledBarDS = resampled_ds.ResampledBarDataSeries(barDs, bar.Frequency.MINUTE)
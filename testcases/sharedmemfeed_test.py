@@ -0,0 +1,115 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+import datetime
+import multiprocessing
+
+import pytz
+
+import common
+import barfeed_test
+
+from pyalgotrade.barfeed import sharedmembf
+from pyalgotrade.barfeed import yahoofeed
+from pyalgotrade.barfeed import membf
+from pyalgotrade import bar
+
+
+class TestBarFeed(membf.BarFeed):
+    def barsHaveAdjClose(self):
+        return False
+
+
+def load_yahoo_feed():
+    ret = yahoofeed.Feed()
+    ret.addBarsFromCSV("orcl", common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+    return ret
+
+
+def sum_closes(store, queue):
+    total = 0
+    for dateTime, bars in sharedmembf.BarFeed(store):
+        total += bars["orcl"].getClose()
+    queue.put(total)
+
+
+class SharedBarStoreTestCase(common.TestCase):
+    def testSameBars(self):
+        store = sharedmembf.SharedBarStore(load_yahoo_feed())
+        self.assertEqual(store.getInstruments(), ["orcl"])
+        self.assertEqual(store.getFrequency(), bar.Frequency.DAY)
+        self.assertEqual(len(store), 252)
+
+        sharedFeed = sharedmembf.BarFeed(store)
+        expected = [bars["orcl"] for dateTime, bars in load_yahoo_feed()]
+        for i, (dateTime, bars) in enumerate(sharedFeed):
+            self.assertEqual(dateTime, expected[i].getDateTime())
+            self.assertEqual(bars["orcl"].getOpen(), expected[i].getOpen())
+            self.assertEqual(bars["orcl"].getHigh(), expected[i].getHigh())
+            self.assertEqual(bars["orcl"].getLow(), expected[i].getLow())
+            self.assertEqual(bars["orcl"].getClose(), expected[i].getClose())
+            self.assertEqual(bars["orcl"].getVolume(), expected[i].getVolume())
+            self.assertEqual(bars["orcl"].getAdjClose(), expected[i].getAdjClose())
+            self.assertEqual(bars["orcl"].getFrequency(), expected[i].getFrequency())
+        self.assertEqual(sharedFeed["orcl"][-1].getClose(), expected[-1].getClose())
+
+    def testBaseBarFeed(self):
+        store = sharedmembf.SharedBarStore(load_yahoo_feed())
+        barfeed_test.check_base_barfeed(self, sharedmembf.BarFeed(store), True)
+
+    def testMissingBarsAndExtraColumns(self):
+        feed = TestBarFeed(bar.Frequency.DAY)
+        dateTimes = [pytz.utc.localize(datetime.datetime(2001, 1, i)) for i in range(1, 4)]
+        feed.addBarsFromSequence("orcl", [
+            bar.BasicBar(dateTimes[0], 1, 2, 1, 2, 10, None, bar.Frequency.DAY),
+            bar.BasicBar(dateTimes[2], 1, 2, 1, 2, 10, None, bar.Frequency.DAY, {"spread": 0.5}),
+        ])
+        feed.addBarsFromSequence("ibm", [
+            bar.BasicBar(dateTimes[1], 1, 3, 1, 3, 10, None, bar.Frequency.DAY),
+        ])
+        store = sharedmembf.SharedBarStore(feed)
+        self.assertFalse(store.barsHaveAdjClose())
+        self.assertEqual(store.getInstruments(), ["ibm", "orcl"])
+
+        allBars = [bars for dateTime, bars in sharedmembf.BarFeed(store)]
+        self.assertEqual([bars.getDateTime() for bars in allBars], dateTimes)
+        self.assertEqual(allBars[0].getInstruments(), ["orcl"])
+        self.assertEqual(allBars[1].getInstruments(), ["ibm"])
+        self.assertEqual(allBars[1]["ibm"].getClose(), 3)
+        self.assertEqual(allBars[0]["orcl"].getAdjClose(), None)
+        self.assertEqual(allBars[0]["orcl"].getExtraColumns(), {})
+        self.assertEqual(allBars[2]["orcl"].getExtraColumns(), {"spread": 0.5})
+
+    def testNonNumericExtraColumns(self):
+        feed = TestBarFeed(bar.Frequency.DAY)
+        feed.addBarsFromSequence("orcl", [
+            bar.BasicBar(datetime.datetime(2001, 1, 1), 1, 2, 1, 2, 10, None, bar.Frequency.DAY, {"name": "abc"}),
+        ])
+        with self.assertRaisesRegexp(Exception, "Only numeric extra columns can be shared.*"):
+            sharedmembf.SharedBarStore(feed)
+
+    def testForkedProcess(self):
+        store = sharedmembf.SharedBarStore(load_yahoo_feed())
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=sum_closes, args=(store, queue))
+        process.start()
+        total = queue.get()
+        process.join()
+        self.assertEqual(total, sum(bars["orcl"].getClose() for dateTime, bars in load_yahoo_feed()))
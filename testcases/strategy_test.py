@@ -223,3 +223,21 @@ class OptionalOverridesTestCase(StrategyTestCase):
         self.assertTrue(strat.onStartCalled)
         self.assertTrue(strat.onFinishCalled)
         self.assertFalse(strat.onIdleCalled)
+
+
+class DispatcherMetricsTestCase(StrategyTestCase):
+    def testMetrics(self):
+        strat = self.createStrategy()
+        self.assertEqual(strat.getDispatcher().getMetrics(), None)
+        strat.getDispatcher().setMetricsEnabled(True)
+        strat.run()
+
+        metrics = strat.getDispatcher().getMetrics()
+        barFeedMetrics = metrics.getSubjectMetrics(strat.getFeed())
+        self.assertEqual(barFeedMetrics.getEventCount(), 252)
+        self.assertEqual(barFeedMetrics.getIdleCount(), 0)
+        self.assertTrue(barFeedMetrics.getMaxTime() <= barFeedMetrics.getTotalTime())
+        self.assertEqual(metrics.getIterations(), 252)
+        self.assertEqual(metrics.getIdleIterations(), 0)
+        self.assertTrue(metrics.getEventsPerSecond() > 0)
+        self.assertTrue(metrics.getSummary().find(barFeedMetrics.getName()) != -1)
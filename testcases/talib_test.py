@@ -19,6 +19,7 @@
 """
 
 import datetime
+import numpy
 import talib
 
 import common
@@ -209,6 +210,26 @@ class TestCase(common.TestCase):
             seconds += 1
         return ret
 
+    def testValuesToNumpy(self):
+        for maxLen in [None, dataseries.TYPED_STORAGE_MIN_LEN]:
+            ds = dataseries.SequenceDataSeries(maxLen)
+            for value in [1, 2, None, 3.5, 4]:
+                ds.append(value)
+            self.assertEqual(indicator.value_ds_to_numpy(ds, 2).tolist(), [3.5, 4])
+            self.assertEqual(indicator.value_ds_to_numpy(ds, 3), None)
+
+        # NaN values are passed to TA-Lib.
+        ds = dataseries.SequenceDataSeries()
+        for value in [1, float("nan"), 2]:
+            ds.append(value)
+        values = indicator.value_ds_to_numpy(ds, 3)
+        self.assertEqual(values[0], 1)
+        self.assertTrue(numpy.isnan(values[1]))
+        self.assertEqual(values[2], 2)
+
+        ds.append("abc")
+        self.assertEqual(indicator.value_ds_to_numpy(ds, 2), None)
+
     def testAD(self):
         barDs = self.__loadBarDS()
         self.assertTrue(compare(indicator.AD(barDs, 252)[0], -1631000.00))
@@ -20,6 +20,9 @@
 
 import datetime
 
+import numpy as np
+import pytz
+
 import common
 
 from pyalgotrade import utils
@@ -62,6 +65,15 @@ class UtilsTestCase(common.TestCase):
         self.assertEqual(utils.safe_max(-1, 1.1), 1.1)
         self.assertEqual(utils.safe_max(2, 1.1), 2)
 
+    def testFloatConversion(self):
+        self.assertTrue(np.isnan(utils.to_float(None)))
+        self.assertEqual(utils.to_float(1), 1.0)
+        self.assertEqual(type(utils.to_float(1)), float)
+        self.assertEqual(utils.to_value(utils.to_float(None)), None)
+        self.assertEqual(utils.to_value(np.nan), None)
+        self.assertEqual(utils.to_value(utils.to_float(1.5)), 1.5)
+        self.assertEqual(utils.to_value(0), 0)
+
 
 class IntersectTestCase(common.TestCase):
     def testEmptyIntersection(self):
@@ -299,6 +311,42 @@ class NumPyDequeTestCase(CollectionTestCaseBase):
             d.append(i)
         self.assertEqual(d[0:3].sum(), 3)
 
+    def testWrapAround(self):
+        maxLen = 7
+        d = collections.NumPyDeque(maxLen)
+        values = []
+
+        for i in range(maxLen * 5):
+            d.append(i)
+            values.append(i)
+            self.assertEqual(d.data().tolist(), values[-1*maxLen:])
+            self.assertEqual(d[-1], i)
+            self.assertEqual(d[0], values[-1*maxLen:][0])
+            self.assertEqual([d.item(pos) for pos in range(-len(d), len(d))], values[-1*maxLen:] * 2)
+        with self.assertRaises(IndexError):
+            d.item(maxLen)
+        with self.assertRaises(IndexError):
+            d.item(-maxLen - 1)
+
+        # The window should always be a view into the underlying array.
+        self.assertFalse(d.data().flags["OWNDATA"])
+
+    def testResizeAfterWrapAround(self):
+        d = collections.NumPyDeque(4)
+        for i in range(10):
+            d.append(i)
+        self.assertEqual(d.data().tolist(), [6, 7, 8, 9])
+
+        d.resize(4)
+        self.assertEqual(d.data().tolist(), [6, 7, 8, 9])
+        d.append(10)
+        self.assertEqual(d.data().tolist(), [7, 8, 9, 10])
+
+        d.resize(2)
+        self.assertEqual(d.data().tolist(), [9, 10])
+        d.append(11)
+        self.assertEqual(d.data().tolist(), [10, 11])
+
 
 class ListDequeTestCase(CollectionTestCaseBase):
     def buildCollection(self, maxLen):
@@ -314,6 +362,106 @@ class ListDequeTestCase(CollectionTestCaseBase):
         CollectionTestCaseBase._testResizeEmptyImpl(self)
 
 
+class ObjectDequeTestCase(CollectionTestCaseBase):
+    def buildCollection(self, maxLen):
+        return collections.ObjectDeque(maxLen)
+
+    def testBasicOps(self):
+        CollectionTestCaseBase._testBasicOpsImpl(self)
+
+    def testResize(self):
+        CollectionTestCaseBase._testResizeImpl(self)
+
+    def testResizeEmpty(self):
+        CollectionTestCaseBase._testResizeEmptyImpl(self)
+
+    def testSlicing(self):
+        d = collections.ObjectDeque(3)
+        for value in ["a", None, (1, 2), [3]]:
+            d.append(value)
+        self.assertEqual(d[:], [None, (1, 2), [3]])
+        self.assertEqual(d[-2:], [(1, 2), [3]])
+        self.assertEqual(d.data(), [None, (1, 2), [3]])
+
+
+class FloatDequeTestCase(common.TestCase):
+    def testValueTypes(self):
+        for values in [[1.5, None, 2.5], [np.float64(1.5), None, np.float64(2.5)], [-1, None, 2**53]]:
+            d = collections.FloatDeque(2)
+            for value in values:
+                self.assertTrue(d.accepts(value))
+                d.append(value)
+            self.assertEqual(d[:], values[1:])
+            self.assertEqual(d.data(), values[1:])
+            self.assertEqual(type(d[-1]), type(values[-1]))
+            self.assertEqual(d[0], None)
+            with self.assertRaises(IndexError):
+                d[2]
+
+    def testRejectedValues(self):
+        d = collections.FloatDeque(2)
+        for value in [np.nan, "a", True, 2**53 + 1, long(1)]:
+            self.assertFalse(d.accepts(value))
+        d.append(1)
+        # Types are not mixed.
+        self.assertFalse(d.accepts(1.0))
+        self.assertTrue(d.accepts(2))
+
+    def testAdaptiveDeque(self):
+        d = collections.AdaptiveDeque(collections.FloatDeque(3))
+        for value in [1, 2, 3]:
+            d.append(value)
+        self.assertTrue(d.isTyped())
+        self.assertEqual(d.asarray().tolist(), [1, 2, 3])
+        d.append(4.5)
+        self.assertFalse(d.isTyped())
+        self.assertEqual(d.asarray(), None)
+        self.assertEqual(d[:], [2, 3, 4.5])
+        self.assertEqual(d[-1], 4.5)
+
+
+class MemMapDequeTestCase(common.TestCase):
+    def testGrow(self):
+        with common.TmpDir() as tmpPath:
+            d = collections.MemMapFile(tmpPath).addDeque(float)
+            self.assertEqual(d.getMaxLen(), None)
+            self.assertEqual(len(d.data()), 0)
+            count = collections.MemMapFile.INITIAL_CAPACITY * 2 + 1
+            for i in range(count):
+                d.append(i)
+            self.assertEqual(len(d), count)
+            self.assertEqual(d[0], 0)
+            self.assertEqual(d[-1], count - 1)
+            self.assertEqual(d.item(-1), count - 1)
+            self.assertEqual(d.data().sum(), sum(range(count)))
+            with self.assertRaises(Exception):
+                d.resize(10)
+
+    def testSharedFile(self):
+        with common.TmpDir() as tmpPath:
+            memMapFile = collections.MemMapFile(tmpPath)
+            values = memMapFile.addDeque(float)
+            timestamps = memMapFile.addDeque(np.int64)
+            count = collections.MemMapFile.INITIAL_CAPACITY * 2 + 1
+            for i in range(count):
+                values.append(i * 0.5)
+                if i == 10:
+                    # Views over the previous mapping are still valid after the file grows.
+                    view = values.data()
+                timestamps.append(i)
+            self.assertEqual(values.data().tolist(), [i * 0.5 for i in range(count)])
+            self.assertEqual(timestamps.data().tolist(), range(count))
+            self.assertEqual(view.tolist(), [i * 0.5 for i in range(11)])
+            with self.assertRaises(Exception):
+                memMapFile.addDeque(float)
+
+    def testUnboundedListDeque(self):
+        d = collections.ListDeque(None)
+        for i in range(10):
+            d.append(i)
+        self.assertEqual(d[:], range(10))
+
+
 class DateTimeTestCase(common.TestCase):
     def testTimeStampConversions(self):
         dateTime = datetime.datetime(2000, 1, 1)
@@ -329,6 +477,123 @@ class DateTimeTestCase(common.TestCase):
         dateTime = dt.as_utc(datetime.datetime(2000, 1, 1, 1, 1, 1, microsecond=10))
         self.assertEqual(dt.timestamp_to_datetime(dt.datetime_to_timestamp(dateTime), True), dateTime)
 
+    def testMicrosecondsConversions(self):
+        dateTime = datetime.datetime(2000, 1, 1, 1, 1, 1, microsecond=10)
+        microseconds = dt.datetime_to_microseconds(dateTime)
+        self.assertEqual(microseconds, dt.datetime_to_timestamp(dateTime) * 1000000)
+        self.assertEqual(dt.datetime_to_microseconds(dateTime), microseconds)
+        self.assertEqual(dt.datetime_to_microseconds(dt.as_utc(dateTime)), microseconds)
+        self.assertEqual(dt.microseconds_to_datetime(microseconds), dateTime)
+
+    def testParseDateTimes(self):
+        for values, dateTimeFormat in [
+            (["2000-01-01 00:00:00", "1969-12-31 23:59:59", "2012-02-29 13:14:15"], "%Y-%m-%d %H:%M:%S"),
+            (["20000101", "19691231", "20120229"], "%Y%m%d"),
+            (["1/2/2000", "12/31/1969", "2/29/2012"], "%m/%d/%Y"),
+            # Fields missing from the format take their default values.
+            (["10:11:12", "00:00:00", "23:59:59"], "%H:%M:%S"),
+            (["2000-01", "1969-12"], "%Y-%m"),
+            (["12"], "%m"),
+        ]:
+            expected = [
+                dt.datetime_to_microseconds(datetime.datetime.strptime(value, dateTimeFormat)) for value in values
+            ]
+            self.assertEqual(dt.parse_datetimes(values, dateTimeFormat).tolist(), expected)
+
+    def testParseInvalidDateTimes(self):
+        with self.assertRaisesRegexp(ValueError, "day is out of range for month"):
+            dt.parse_datetimes(["2000-01-01", "2001-02-29"], "%Y-%m-%d")
+        with self.assertRaisesRegexp(ValueError, "does not match format"):
+            dt.parse_datetimes(["2000-01-01", "2001/02/01"], "%Y-%m-%d")
+
+    def testDateTimeParsers(self):
+        for dateTimeFormat, value in [
+            ("%Y-%m-%d", "2005-12-30"),
+            ("%Y-%m-%d %H:%M:%S", "2005-12-30 13:59:01"),
+            ("%Y%m%d", "20051230"),
+            ("%Y%m%d %H%M%S", "20051230 135901"),
+            ("%d/%m/%Y %H:%M", "30/12/2005 13:59"),
+            ("%d-%b-%y", "30-Dec-05"),
+            ("%Y-%m-%d", "2005-1-3"),
+        ]:
+            parser = dt.get_datetime_parser(dateTimeFormat)
+            self.assertEqual(parser(value), datetime.datetime.strptime(value, dateTimeFormat))
+
+    def testDateTimeParsersWithInvalidValues(self):
+        for dateTimeFormat, value in [
+            ("%Y-%m-%d", "2005/12/30"),
+            ("%Y-%m-%d", "2005-02-30"),
+            ("%Y%m%d %H%M%S", "20051230 135960"),
+            ("%d/%m/%Y %H:%M", "30/13/2005 13:59"),
+        ]:
+            parser = dt.get_datetime_parser(dateTimeFormat)
+            with self.assertRaises(ValueError):
+                parser(value)
+
+    def testLocalizer(self):
+        timeZone = pytz.timezone("US/Eastern")
+        localizer = dt.Localizer(timeZone)
+        dateTimes = []
+        for day in [datetime.datetime(2013, 3, 10), datetime.datetime(2013, 11, 3)]:
+            for minutes in xrange(0, 6 * 60, 15):
+                dateTimes.append(day + datetime.timedelta(minutes=minutes))
+        for dateTime in dateTimes * 2:
+            expected = dt.localize(dateTime, timeZone)
+            self.assertEqual(localizer.localize(dateTime), expected)
+            self.assertEqual(str(localizer.localize(dateTime)), str(expected))
+            expected = dt.localize(dt.as_utc(dateTime), timeZone)
+            self.assertEqual(str(localizer.localize(dt.as_utc(dateTime))), str(expected))
+
+    def testLocalizerWithHalfHourTransitions(self):
+        timeZone = pytz.timezone("Australia/Lord_Howe")
+        localizer = dt.Localizer(timeZone)
+        dateTimes = []
+        for day in [datetime.datetime(2013, 4, 7), datetime.datetime(2013, 10, 6)]:
+            for minutes in xrange(0, 4 * 60, 10):
+                dateTimes.append(day + datetime.timedelta(minutes=minutes))
+        for dateTime in dateTimes:
+            expected = dt.localize(dateTime, timeZone)
+            self.assertEqual(str(localizer.localize(dateTime)), str(expected))
+            utcDateTime = dt.as_utc(dateTime - datetime.timedelta(hours=12))
+            expected = dt.localize(utcDateTime, timeZone)
+            self.assertEqual(str(localizer.localize(utcDateTime)), str(expected))
+
+    def testLocalizeMicrosecondsWithHalfHourTransitions(self):
+        timeZone = pytz.timezone("Australia/Lord_Howe")
+        dateTimes = []
+        for day in [datetime.datetime(2013, 4, 7), datetime.datetime(2013, 10, 6)]:
+            for minutes in xrange(0, 4 * 60, 10):
+                dateTimes.append(day + datetime.timedelta(minutes=minutes))
+        microseconds = np.array([dt.datetime_to_microseconds(dateTime) for dateTime in dateTimes])
+        expected = [dt.datetime_to_microseconds(dt.localize(dateTime, timeZone)) for dateTime in dateTimes]
+        self.assertEqual(dt.localize_microseconds(microseconds, timeZone).tolist(), expected)
+
+        utcMicroseconds = microseconds - 12 * 3600 * 1000000
+        dateTimes = dt.microseconds_to_datetimes(utcMicroseconds, timeZone)
+        expected = [dt.microseconds_to_datetime(value, timeZone) for value in utcMicroseconds.tolist()]
+        self.assertEqual(map(str, dateTimes), map(str, expected))
+
+    def testLocalizeMicroseconds(self):
+        timeZone = pytz.timezone("US/Eastern")
+        dateTimes = [datetime.datetime(2013, 3, 10, hour, 30) for hour in [0, 1, 3, 4]]
+        dateTimes += [datetime.datetime(2013, 11, 3, hour, 30) for hour in [0, 2, 3]]
+        microseconds = np.array([dt.datetime_to_microseconds(dateTime) for dateTime in dateTimes])
+        expected = [dt.datetime_to_microseconds(dt.localize(dateTime, timeZone)) for dateTime in dateTimes]
+        self.assertEqual(dt.localize_microseconds(microseconds, timeZone).tolist(), expected)
+
+    def testMicrosecondsToDateTimes(self):
+        # Every 20 minutes around both DST transitions, and before the epoch.
+        start = dt.datetime_to_microseconds(dt.as_utc(datetime.datetime(2013, 3, 10, 5)))
+        microseconds = [start + i * 20 * 60 * 1000000 + 5 for i in xrange(12)]
+        start = dt.datetime_to_microseconds(dt.as_utc(datetime.datetime(2013, 11, 3, 4)))
+        microseconds += [start + i * 20 * 60 * 1000000 for i in xrange(12)]
+        microseconds += [-1, -3600 * 1000000 * 30]
+        for tzInfo in [None, pytz.utc, pytz.timezone("US/Eastern")]:
+            dateTimes = dt.microseconds_to_datetimes(np.array(microseconds, dtype=np.int64), tzInfo)
+            expected = [dt.microseconds_to_datetime(value, tzInfo) for value in microseconds]
+            self.assertEqual(dateTimes, expected)
+            self.assertEqual(map(str, dateTimes), map(str, expected))
+
     def testGetFirstMonday(self):
         self.assertEquals(dt.get_first_monday(2010), datetime.date(2010, 1, 4))
         self.assertEquals(dt.get_first_monday(2011), datetime.date(2011, 1, 3))
@@ -27,6 +27,7 @@ import feed_test
 from pyalgotrade.utils import dt
 from pyalgotrade.barfeed import yahoofeed
 from pyalgotrade.barfeed import csvfeed
+from pyalgotrade.dataseries import bards
 from pyalgotrade import bar
 from pyalgotrade import marketsession
 
@@ -241,6 +242,26 @@ class FeedTestCase(common.TestCase):
         self.assertEqual(len(barDS.getLowDataSeries()), 2)
         self.assertEqual(len(barDS.getAdjCloseDataSeries()), 2)
 
+    def testColumnarDataSeries(self):
+        barFeed = yahoofeed.Feed()
+        barFeed.setUseColumnarDataSeries(True)
+        barFeed.addBarsFromCSV(FeedTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        self.assertTrue(isinstance(barFeed[FeedTestCase.TestInstrument], bards.ColumnarBarDataSeries))
+        barFeed.loadAll()
+
+        expectedFeed = yahoofeed.Feed()
+        expectedFeed.addBarsFromCSV(FeedTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"))
+        expectedFeed.loadAll()
+
+        ds = barFeed[FeedTestCase.TestInstrument]
+        expectedDs = expectedFeed[FeedTestCase.TestInstrument]
+        self.assertEqual(len(ds), len(expectedDs))
+        self.assertEqual(ds.getDateTimes(), expectedDs.getDateTimes())
+        self.assertEqual(ds.getCloseDataSeries()[:], expectedDs.getCloseDataSeries()[:])
+        for i in range(len(ds)):
+            self.assertEqual(ds[i].getDateTime(), expectedDs[i].getDateTime())
+            self.assertEqual(ds[i].getAdjClose(), expectedDs[i].getAdjClose())
+
     def testReset(self):
         barFeed = yahoofeed.Feed()
         barFeed.addBarsFromCSV(FeedTestCase.TestInstrument, common.get_data_file_path("orcl-2000-yahoofinance.csv"), marketsession.USEquities.getTimezone())
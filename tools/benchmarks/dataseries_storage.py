@@ -0,0 +1,87 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+# Compares SequenceDataSeries backed by lists and by typed ring buffers for different maximum lengths. This is used
+# to pick dataseries.TYPED_STORAGE_MIN_LEN.
+
+import sys
+import os
+import datetime
+import time
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade import dataseries  # noqa: E402
+from pyalgotrade.technical import ma  # noqa: E402
+
+
+COUNT = 200000
+MAX_LENS = [1024, 4096, 8192, 16384, 32768, 65536]
+
+
+def timed(function):
+    begin = time.time()
+    function()
+    return time.time() - begin
+
+
+def append_values(ds, dateTimes):
+    for i in xrange(len(dateTimes)):
+        ds.appendWithDateTime(dateTimes[i], float(i))
+
+
+def get_last_value(ds, count):
+    for i in xrange(count):
+        ds[-1]
+
+
+def run(maxLen, typed, dateTimes):
+    # build_deques checks this every time a dataseries is built.
+    if typed:
+        dataseries.TYPED_STORAGE_MIN_LEN = 1
+    else:
+        dataseries.TYPED_STORAGE_MIN_LEN = maxLen + 1
+
+    ds = dataseries.SequenceDataSeries(maxLen)
+    append = timed(lambda: append_values(ds, dateTimes))
+    getItem = timed(lambda: get_last_value(ds, len(dateTimes)))
+    asArray = timed(lambda: ds.asarray())
+    smaDS = dataseries.SequenceDataSeries(maxLen)
+    ma.SMA(smaDS, 20)
+    sma = timed(lambda: append_values(smaDS, dateTimes))
+    print "%6d %-5s append: %.2fs ds[-1]: %.2fs SMA(20): %.2fs asarray: %.3fms" % (
+        maxLen, "typed" if typed else "list", append, getItem, sma, asArray * 1000
+    )
+
+
+def main():
+    begin = datetime.datetime(2000, 1, 1)
+    dateTimes = [begin + datetime.timedelta(minutes=i) for i in xrange(COUNT)]
+    minLen = dataseries.TYPED_STORAGE_MIN_LEN
+    try:
+        for maxLen in MAX_LENS:
+            for typed in [False, True]:
+                run(maxLen, typed, dateTimes)
+    finally:
+        dataseries.TYPED_STORAGE_MIN_LEN = minLen
+
+
+if __name__ == "__main__":
+    main()
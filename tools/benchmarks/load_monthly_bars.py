@@ -0,0 +1,108 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+# Loads a year of 1 minute bars, one CSV file per month, and reports how long it takes.
+
+import sys
+import os
+import datetime
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade import bar  # noqa: E402
+from pyalgotrade.barfeed import csvfeed  # noqa: E402
+
+
+YEAR = 2013
+INSTRUMENT = "spy"
+
+
+def write_month(path, month):
+    price = 100
+    with open(path, "w") as f:
+        f.write("Date Time,Open,High,Low,Close,Volume,Adj Close\n")
+        day = datetime.datetime(YEAR, month, 1)
+        while day.month == month:
+            if day.weekday() < 5:
+                dateTime = day.replace(hour=9, minute=30)
+                while dateTime.hour < 16:
+                    price += 0.01 if dateTime.minute % 2 else -0.01
+                    f.write("%s,%.2f,%.2f,%.2f,%.2f,1000,\n" % (dateTime, price, price + 0.05, price - 0.05, price))
+                    dateTime += datetime.timedelta(minutes=1)
+            day += datetime.timedelta(days=1)
+
+
+def timed(function):
+    begin = time.time()
+    ret = function()
+    return ret, time.time() - begin
+
+
+def load_csv_files(paths, feedClass=csvfeed.GenericBarFeed):
+    ret = feedClass(bar.Frequency.MINUTE)
+    for path in paths:
+        ret.addBarsFromCSV(INSTRUMENT, path)
+    return ret
+
+
+def load_sequences(sequences):
+    ret = csvfeed.GenericBarFeed(bar.Frequency.MINUTE)
+    for bars in sequences:
+        ret.addBarsFromSequence(INSTRUMENT, bars)
+    return ret
+
+
+def main():
+    tmpDir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for month in xrange(1, 13):
+            path = os.path.join(tmpDir, "%s-%d-%02d.csv" % (INSTRUMENT, YEAR, month))
+            write_month(path, month)
+            paths.append(path)
+
+        barFeed, elapsed = timed(lambda: load_csv_files(paths))
+        print "Loading 12 monthly CSV files: %.3f seconds" % (elapsed)
+        columnarFeed, elapsed = timed(lambda: load_csv_files(paths, csvfeed.GenericColumnarBarFeed))
+        print "Loading 12 monthly CSV files in columns: %.3f seconds" % (elapsed)
+        unused, elapsed = timed(columnarFeed.start)
+        print "Building the columnar store: %.3f seconds" % (elapsed)
+
+        # Load the same bars again but skip CSV parsing to time addBarsFromSequence only.
+        sequences = []
+        for month in xrange(1, 13):
+            sequences.append([
+                bars[INSTRUMENT] for dateTime, bars in barFeed if dateTime.month == month
+            ])
+            barFeed.reset()
+        barCount = sum([len(bars) for bars in sequences])
+        barFeed, elapsed = timed(lambda: load_sequences(sequences))
+        print "Adding %d bars in 12 sequences: %.3f seconds" % (barCount, elapsed)
+        barFeed, elapsed = timed(lambda: load_sequences(reversed(sequences)))
+        print "Adding %d bars in 12 sequences in reverse order: %.3f seconds" % (barCount, elapsed)
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# PyAlgoTrade
+#
+# Copyright 2011-2015 Gabriel Martin Becedillas Ruiz
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+.. moduleauthor:: Gabriel Martin Becedillas Ruiz <gabriel.becedillas@gmail.com>
+"""
+
+# Adds 1 minute bars to a SQLite database one bar at a time and in bulk, and reports rows per second.
+
+import sys
+import os
+import datetime
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.join("..", ".."))  # For pyalgotrade
+
+from pyalgotrade import bar  # noqa: E402
+from pyalgotrade.barfeed import sqlitefeed  # noqa: E402
+
+
+INSTRUMENT = "spy"
+
+
+def build_bars(count):
+    ret = []
+    price = 100
+    dateTime = datetime.datetime(2013, 1, 2, 9, 30)
+    for i in xrange(count):
+        price += 0.01 if i % 2 else -0.01
+        ret.append(bar.BasicBar(dateTime, price, price + 0.05, price - 0.05, price, 1000, None, bar.Frequency.MINUTE))
+        dateTime += datetime.timedelta(minutes=1)
+    return ret
+
+
+def timed(function):
+    begin = time.time()
+    function()
+    return time.time() - begin
+
+
+def add_bars_one_by_one(db, bars):
+    for bar_ in bars:
+        db.addBar(INSTRUMENT, bar_, bar.Frequency.MINUTE)
+
+
+def run(tmpDir, name, bars, function):
+    db = sqlitefeed.Database(os.path.join(tmpDir, "%s.sqlite" % (name)))
+    try:
+        elapsed = timed(lambda: function(db, bars))
+    finally:
+        db.disconnect()
+    print "%s: %d bars in %.3f seconds (%d rows/second)" % (name, len(bars), elapsed, len(bars) / elapsed)
+
+
+def main():
+    tmpDir = tempfile.mkdtemp()
+    try:
+        # Bars are committed one at a time in addBar, so keep this one small.
+        run(tmpDir, "addBar", build_bars(5000), add_bars_one_by_one)
+        bars = build_bars(500000)
+        run(tmpDir, "addBarSequence", bars, lambda db, bars: db.addBarSequence(INSTRUMENT, bars, bar.Frequency.MINUTE))
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == "__main__":
+    main()